@@ -0,0 +1,209 @@
+"""
+Cached, concurrent AI insight generation
+
+Insights are keyed by a hash of the backend name and the prompt (which
+holds the run config and metrics), and stored one file per entry in a
+size-bounded disk cache with least-recently-used eviction. Cache misses go
+through a bounded pool of worker threads with retries and exponential
+backoff, so several prompts are in flight at once and a re-export of
+unchanged runs makes no LLM calls at all.
+
+Backends are pluggable: 'openai' (default) calls gpt-4o-mini, 'stub'
+returns a deterministic local answer for tests and offline work. Only a
+backend's transient_errors (timeouts, connection errors, rate limits,
+5xx) are retried; anything else, like a bad key, fails at once.
+
+    export AI_INSIGHTS_BACKEND=stub
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tracing import span
+
+CACHE_DIR = os.getenv('AI_INSIGHTS_CACHE_DIR', '.ai_insights_cache')
+CACHE_MAX_BYTES = int(os.getenv('AI_INSIGHTS_CACHE_MAX_BYTES', str(5 * 1024 * 1024)))
+MAX_CONCURRENCY = int(os.getenv('AI_INSIGHTS_CONCURRENCY', '4'))
+MAX_RETRIES = 3
+
+
+class OpenAIBackend:
+    """gpt-4o-mini through the OpenAI SDK"""
+
+    def __init__(self, model='gpt-4o-mini'):
+        from openai import OpenAI, APIConnectionError, RateLimitError, InternalServerError
+        self.model = model
+        self.name = f'openai:{model}'
+        self.client = OpenAI()
+        # APITimeoutError is an APIConnectionError
+        self.transient_errors = (APIConnectionError, RateLimitError, InternalServerError)
+
+    def complete(self, prompt):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=200
+        )
+        return response.choices[0].message.content.strip()
+
+
+class StubBackend:
+    """Deterministic local stand-in: same prompt, same answer, no network"""
+
+    name = 'stub'
+    transient_errors = ()
+
+    def complete(self, prompt):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        rating = ('Excellent', 'Good', 'Fair', 'Poor')[int(digest[:2], 16) % 4]
+        return (f"1. Performance rating: {rating}\n"
+                f"2. Cost-efficiency: stub assessment {digest[:8]}\n"
+                f"3. Recommendation: stub backend, no model was called")
+
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'stub': StubBackend
+}
+
+
+def get_backend(name=None):
+    """Backend by name (AI_INSIGHTS_BACKEND), None if it cannot be used"""
+    name = name or os.getenv('AI_INSIGHTS_BACKEND', 'openai')
+    if name == 'openai' and not os.getenv('OPENAI_API_KEY'):
+        return None
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI insights backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+class InsightsCache:
+    """One JSON file per entry; mtime is the LRU clock"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(backend_name, prompt):
+        return hashlib.sha256(f'{backend_name}\n{prompt}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry['insights']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key, insights):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'insights': insights, 'created_at': time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+
+
+class InsightsGenerator:
+    """Cache in front of a bounded, retrying request pool"""
+
+    def __init__(self, backend, cache=None, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES):
+        self.backend = backend
+        self.cache = cache if cache is not None else InsightsCache()
+        self.max_retries = max_retries
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.transient_errors = getattr(backend, 'transient_errors', (TimeoutError, ConnectionError))
+        self.calls = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def _complete_with_retries(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._lock:
+                    self.calls += 1
+                with span('ai.complete', key=self.backend.name):
+                    return self.backend.complete(prompt)
+            except Exception as e:
+                if not isinstance(e, self.transient_errors):
+                    print(f'      ⚠️  AI analysis failed: {e}')
+                    return None
+                if attempt == self.max_retries:
+                    print(f'      ⚠️  AI analysis failed after {attempt + 1} attempts: {e}')
+                    return None
+                time.sleep(min(2 ** attempt, 30) * (0.5 + random.random()))
+
+    def _generate(self, key, prompt):
+        insights = self._complete_with_retries(prompt)
+        if insights:
+            self.cache.set(key, insights)
+        return insights
+
+    def submit(self, prompt):
+        """Future resolving to the insights (immediately when cached)"""
+        key = InsightsCache.key(self.backend.name, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            future = self.pool.submit(lambda: cached)
+        else:
+            future = self.pool.submit(self._generate, key, prompt)
+        return future
+
+    def generate_many(self, prompts):
+        """Insights for many prompts, cache misses requested in parallel"""
+        futures = [self.submit(p) for p in prompts]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+_default_generator = None
+
+
+def default_generator():
+    """Process-wide generator for the configured backend (None without one)"""
+    global _default_generator
+    if _default_generator is None:
+        backend = get_backend()
+        if backend is None:
+            return None
+        _default_generator = InsightsGenerator(backend)
+    return _default_generator
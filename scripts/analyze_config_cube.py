@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Pivot / group-by cube over test run configuration dimensions
+
+Results of all completed runs are read once into columns, aggregated into
+the finest-grained (base) cuboid and then rolled up into every combination
+of dimensions. Any marginal question is afterwards a dictionary lookup.
+
+Usage:
+    python3 scripts/analyze_config_cube.py
+    python3 scripts/analyze_config_cube.py --where embedding_model=oai3l --where difficulty_mode=hard
+    python3 scripts/analyze_config_cube.py --where embedding_model=oai3l --by enrichment_model
+    python3 scripts/analyze_config_cube.py --load config_cube.json --by query_intent
+"""
+
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+
+OUTPUT_FILE = 'config_cube.json'
+
+DIMENSIONS = (
+    'embedding_model',
+    'enrichment_model',
+    'tester_model',
+    'difficulty_mode',
+    'use_dynamic_weights',
+    'weights',
+    'query_intent'
+)
+
+ALL = '*'
+
+# Aggregate layout: one flat list per cell so roll-ups are plain additions
+N, SUCCESSFUL, HIT1, HIT5, HIT10, RR_SUM, RANK_SUM, SEARCH_TOKENS, TESTER_TOKENS = range(9)
+AGG_SIZE = 9
+
+
+def run_dimensions(run):
+    """Run-level dimension values (everything except query_intent)"""
+    return (
+        run.get('embedding_model') or 'unknown',
+        run.get('enrichment_model') or 'none',
+        run.get('tester_model') or 'unknown',
+        run.get('difficulty_mode') or 'medium',
+        'true' if run.get('use_dynamic_weights') else 'false',
+        f"{run.get('mvs_weight_identity', 0) or 0:g}/"
+        f"{run.get('mvs_weight_physical', 0) or 0:g}/"
+        f"{run.get('mvs_weight_context', 0) or 0:g}"
+    )
+
+
+def agg_metrics(agg):
+    """Same definitions as calculate_metrics, computed from a cell"""
+    total = agg[N]
+    successful = agg[SUCCESSFUL]
+    return {
+        'accuracy_at_1': agg[HIT1] / total if total else 0,
+        'accuracy_at_5': agg[HIT5] / total if total else 0,
+        'accuracy_at_10': agg[HIT10] / total if total else 0,
+        'mean_reciprocal_rank': agg[RR_SUM] / total if total else 0,
+        'average_rank': agg[RANK_SUM] / successful if successful else 0,
+        'total_queries': total,
+        'successful_queries': successful,
+        'tokens_per_query': (agg[SEARCH_TOKENS] + agg[TESTER_TOKENS]) / total if total else 0
+    }
+
+
+class ConfigCube:
+    """All group-by cuboids over DIMENSIONS, keyed by a bit mask of kept dims"""
+
+    def __init__(self, cuboids=None):
+        self.cuboids = cuboids or {}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build the base cuboid in one pass over the columns, then roll up"""
+        base = {}
+        dim_columns = [columns[d] for d in DIMENSIONS]
+        for i, key in enumerate(zip(*dim_columns)):
+            agg = base.get(key)
+            if agg is None:
+                agg = base[key] = [0] * AGG_SIZE
+            rank = columns['correct_rank'][i]
+            agg[N] += 1
+            if rank and rank > 0:
+                agg[SUCCESSFUL] += 1
+                agg[HIT1] += rank == 1
+                agg[HIT5] += rank <= 5
+                agg[HIT10] += rank <= 10
+                agg[RR_SUM] += 1 / rank
+                agg[RANK_SUM] += rank
+            agg[SEARCH_TOKENS] += columns['search_tokens'][i]
+            agg[TESTER_TOKENS] += columns['tester_tokens'][i]
+
+        full_mask = (1 << len(DIMENSIONS)) - 1
+        cuboids = {}
+        for mask in range(full_mask + 1):
+            cuboid = {}
+            for key, agg in base.items():
+                projected = tuple(key[j] if mask & (1 << j) else ALL for j in range(len(DIMENSIONS)))
+                target = cuboid.get(projected)
+                if target is None:
+                    cuboid[projected] = list(agg)
+                else:
+                    for k in range(AGG_SIZE):
+                        target[k] += agg[k]
+            cuboids[mask] = cuboid
+        return cls(cuboids)
+
+    @staticmethod
+    def _mask(dims):
+        mask = 0
+        for dim in dims:
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dim}' (expected one of {', '.join(DIMENSIONS)})")
+            mask |= 1 << DIMENSIONS.index(dim)
+        return mask
+
+    def query(self, **where):
+        """Metrics for one slice, e.g. query(embedding_model='oai3l', difficulty_mode='hard')"""
+        mask = self._mask(where)
+        key = tuple(str(where[d]) if d in where else ALL for d in DIMENSIONS)
+        agg = self.cuboids.get(mask, {}).get(key)
+        return agg_metrics(agg) if agg else None
+
+    def group_by(self, by, **where):
+        """Metrics per value combination of `by` within the `where` slice"""
+        mask = self._mask(list(by) + list(where))
+        rows = []
+        for key, agg in self.cuboids.get(mask, {}).items():
+            if any(key[DIMENSIONS.index(d)] != str(v) for d, v in where.items()):
+                continue
+            group = {d: key[DIMENSIONS.index(d)] for d in by}
+            rows.append((group, agg_metrics(agg)))
+        rows.sort(key=lambda r: r[1]['mean_reciprocal_rank'], reverse=True)
+        return rows
+
+    def save(self, path):
+        data = {
+            'dimensions': list(DIMENSIONS),
+            'cuboids': {
+                str(mask): [[list(key), agg] for key, agg in cuboid.items()]
+                for mask, cuboid in self.cuboids.items()
+            }
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if tuple(data['dimensions']) != DIMENSIONS:
+            raise ValueError(f"{path} was built with different dimensions, rebuild it")
+        return cls({
+            int(mask): {tuple(key): agg for key, agg in cells}
+            for mask, cells in data['cuboids'].items()
+        })
+
+
+def fetch_columns(pb):
+    """Read every result of every completed run into columns"""
+    columns = {name: [] for name in DIMENSIONS + ('correct_rank', 'search_tokens', 'tester_tokens')}
+
+    runs = pb.get_test_runs(limit=500)
+    completed_runs = [r for r in runs if r.get('status') == 'completed']
+    print(f"✅ Found {len(completed_runs)} completed tests\n")
+
+    for i, run in enumerate(completed_runs, 1):
+        print(f"[{i}/{len(completed_runs)}] {run['name']}")
+        run_values = run_dimensions(run)
+        for result in pb.iter_records(
+            'embedding_test_results',
+            filter=f'run_id="{run["id"]}"',
+            fields='correct_rank,query_intent,search_tokens,tester_tokens'
+        ):
+            for dim, value in zip(DIMENSIONS, run_values):
+                columns[dim].append(value)
+            columns['query_intent'].append(result.get('query_intent') or 'unknown')
+            columns['correct_rank'].append(result.get('correct_rank') or 0)
+            columns['search_tokens'].append(result.get('search_tokens') or 0)
+            columns['tester_tokens'].append(result.get('tester_tokens') or 0)
+
+    return columns
+
+
+def parse_where(items):
+    where = {}
+    for item in items or []:
+        if '=' not in item:
+            raise ValueError(f"--where expects dim=value, got '{item}'")
+        dim, value = item.split('=', 1)
+        where[dim.strip()] = value.strip()
+    return where
+
+
+def format_metrics(metrics):
+    return (f"Acc@1 {metrics['accuracy_at_1']*100:5.1f}%  "
+            f"Acc@5 {metrics['accuracy_at_5']*100:5.1f}%  "
+            f"MRR {metrics['mean_reciprocal_rank']:.3f}  "
+            f"n={metrics['total_queries']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregation cube over run configuration dimensions')
+    parser.add_argument('--load', help='Load a saved cube instead of fetching from PocketBase')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='Where to save the built cube')
+    parser.add_argument('--where', action='append', help='Slice filter dim=value (repeatable)')
+    parser.add_argument('--by', action='append', default=[], help='Group-by dimension (repeatable)')
+    args = parser.parse_args()
+
+    if args.load:
+        cube = ConfigCube.load(args.load)
+        print(f"✅ Loaded cube from {args.load}")
+    else:
+        print("🧊 Building configuration cube...\n")
+        pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+        cube = ConfigCube.from_columns(fetch_columns(pb))
+        cube.save(args.output)
+        print(f"\n💾 Cube saved to: {args.output}")
+
+    where = parse_where(args.where)
+    label = ', '.join(f"{k}={v}" for k, v in where.items()) or 'all results'
+
+    if args.by:
+        print(f"\n📊 {label} by {', '.join(args.by)}:\n")
+        for group, metrics in cube.group_by(args.by, **where):
+            name = ' / '.join(group.values())
+            print(f"   {name[:40]:<40} {format_metrics(metrics)}")
+    else:
+        metrics = cube.query(**where)
+        if metrics is None:
+            print(f"\n❌ No results for {label}")
+        else:
+            print(f"\n📊 {label}:\n   {format_metrics(metrics)}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Build a sparse confusion index: which group keeps stealing queries from which
+
+For every result of every completed run the pair
+(source_group_id -> top_results[0].id) is counted, separately for each
+(embedding, enrichment, difficulty) slice. Each slice is stored as a CSR
+matrix (indptr / indices / counts) with rows pre-sorted by count, so the
+top-N stealers of a group are a plain slice of one row.
+
+Usage:
+    python3 scripts/analyze_confusions.py
+    python3 scripts/analyze_confusions.py --embedding oai3l --difficulty hard
+    python3 scripts/analyze_confusions.py --group <group_id> --top 10
+    python3 scripts/analyze_confusions.py --load confusion_index.json.gz
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+from array import array
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+
+OUTPUT_FILE = 'confusion_index.json.gz'
+
+
+def slice_key(run):
+    """(embedding, enrichment, difficulty) key of a run"""
+    return (
+        run.get('embedding_model') or 'unknown',
+        run.get('enrichment_model') or 'none',
+        run.get('difficulty_mode') or 'medium'
+    )
+
+
+class CSRSlice:
+    """Compressed sparse row matrix of counts, rows sorted by count (desc)"""
+
+    def __init__(self, indptr, indices, counts):
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+
+    @classmethod
+    def from_pairs(cls, pair_counts, n_rows):
+        """Compress a {(row, col): count} dict"""
+        rows = defaultdict(list)
+        for (row, col), count in pair_counts.items():
+            rows[row].append((count, col))
+
+        indptr = array('l', [0])
+        indices = array('l')
+        counts = array('l')
+        for row in range(n_rows):
+            entries = sorted(rows.get(row, ()), key=lambda e: (-e[0], e[1]))
+            for count, col in entries:
+                indices.append(col)
+                counts.append(count)
+            indptr.append(len(indices))
+        return cls(indptr, indices, counts)
+
+    def pad(self, n_rows):
+        """Extend indptr after new groups were interned"""
+        while len(self.indptr) <= n_rows:
+            self.indptr.append(self.indptr[-1])
+
+    def row(self, row):
+        """(col, count) entries of a row, most frequent first"""
+        if row + 1 >= len(self.indptr):
+            return []
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return list(zip(self.indices[start:end], self.counts[start:end]))
+
+    def nnz(self):
+        return len(self.indices)
+
+    def to_dict(self):
+        return {
+            'indptr': self.indptr.tolist(),
+            'indices': self.indices.tolist(),
+            'counts': self.counts.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(array('l', data['indptr']), array('l', data['indices']), array('l', data['counts']))
+
+
+class ConfusionIndex:
+    """Per-slice sparse confusion matrices over interned group ids"""
+
+    def __init__(self):
+        self.group_ids = []
+        self.group_names = {}
+        self._group_index = {}
+        self.slices = {}
+
+    def _intern(self, group_id, name=None):
+        if group_id not in self._group_index:
+            self._group_index[group_id] = len(self.group_ids)
+            self.group_ids.append(group_id)
+        if name and group_id not in self.group_names:
+            self.group_names[group_id] = name
+        return self._group_index[group_id]
+
+    @classmethod
+    def build(cls, rows):
+        """Build from (slice_key, result) tuples"""
+        index = cls()
+        pair_counts = defaultdict(Counter)
+
+        for key, result in rows:
+            source = result.get('source_group_id')
+            top_results = result.get('top_results') or []
+            if not source or not top_results or not top_results[0].get('id'):
+                continue
+            top = top_results[0]
+            src = index._intern(source, result.get('source_group_name'))
+            dst = index._intern(top['id'], top.get('name'))
+            pair_counts[key][(src, dst)] += 1
+
+        n_rows = len(index.group_ids)
+        for key, counts in pair_counts.items():
+            index.slices[key] = CSRSlice.from_pairs(counts, n_rows)
+        for csr in index.slices.values():
+            csr.pad(n_rows)
+        return index
+
+    def name(self, group_id):
+        return self.group_names.get(group_id, group_id)
+
+    def _matching(self, embedding=None, enrichment=None, difficulty=None):
+        for (emb, enr, diff), csr in self.slices.items():
+            if embedding and emb != embedding:
+                continue
+            if enrichment and enr != enrichment:
+                continue
+            if difficulty and diff != difficulty:
+                continue
+            yield csr
+
+    def stealers(self, group_id, n=5, include_correct=False, **filters):
+        """Top-N groups retrieved at rank 1 for queries about group_id"""
+        row = self._group_index.get(group_id)
+        if row is None:
+            return []
+
+        matching = list(self._matching(**filters))
+        if len(matching) == 1:
+            entries = matching[0].row(row)
+        else:
+            merged = Counter()
+            for csr in matching:
+                for col, count in csr.row(row):
+                    merged[col] += count
+            entries = sorted(merged.items(), key=lambda e: (-e[1], e[0]))
+
+        if not include_correct:
+            entries = [(col, count) for col, count in entries if col != row]
+        return [(self.group_ids[col], count) for col, count in entries[:n]]
+
+    def worst_pairs(self, n=20, **filters):
+        """Most frequent (source, stolen_by, count, source_total) confusions"""
+        merged = Counter()
+        totals = Counter()
+        for csr in self._matching(**filters):
+            for row in range(len(csr.indptr) - 1):
+                for col, count in csr.row(row):
+                    totals[row] += count
+                    if col != row:
+                        merged[(row, col)] += count
+
+        return [
+            (self.group_ids[src], self.group_ids[dst], count, totals[src])
+            for (src, dst), count in merged.most_common(n)
+        ]
+
+    def save(self, path):
+        data = {
+            'group_ids': self.group_ids,
+            'group_names': self.group_names,
+            'slices': [
+                {'key': list(key), **csr.to_dict()}
+                for key, csr in self.slices.items()
+            ]
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls()
+        for group_id in data['group_ids']:
+            index._intern(group_id)
+        index.group_names = data['group_names']
+        for entry in data['slices']:
+            index.slices[tuple(entry['key'])] = CSRSlice.from_dict(entry)
+        return index
+
+
+def fetch_rows(pb):
+    """Stream (slice_key, result) for every completed run"""
+    runs = pb.get_test_runs(limit=500)
+    completed_runs = [r for r in runs if r.get('status') == 'completed']
+    print(f"✅ Found {len(completed_runs)} completed tests\n")
+
+    for i, run in enumerate(completed_runs, 1):
+        print(f"[{i}/{len(completed_runs)}] {run['name']}")
+        key = slice_key(run)
+        for result in pb.iter_records(
+            'embedding_test_results',
+            filter=f'run_id="{run["id"]}"',
+            fields='source_group_id,source_group_name,top_results'
+        ):
+            yield key, result
+
+
+def print_report(index, args):
+    filters = {
+        'embedding': args.embedding,
+        'enrichment': args.enrichment,
+        'difficulty': args.difficulty
+    }
+
+    if args.group:
+        print(f"\n🎯 Top {args.top} stealers of '{index.name(args.group)}':\n")
+        for group_id, count in index.stealers(args.group, n=args.top, **filters):
+            print(f"   {count:>5}  {index.name(group_id)} ({group_id})")
+        return
+
+    print(f"\n📊 Worst {args.top} confusions:\n")
+    print(f"{'Expected':<30} {'Retrieved instead':<30} {'Count':>6} {'Rate':>7}")
+    print("-" * 76)
+    for src, dst, count, total in index.worst_pairs(n=args.top, **filters):
+        rate = count / total * 100 if total else 0
+        print(f"{index.name(src)[:29]:<30} {index.name(dst)[:29]:<30} {count:>6} {rate:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sparse confusion index across test runs')
+    parser.add_argument('--load', help='Load a saved index instead of fetching from PocketBase')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='Where to save the built index')
+    parser.add_argument('--embedding', help='Embedding model code filter (e.g. oai3l)')
+    parser.add_argument('--enrichment', help='Enrichment model code filter (e.g. g25f)')
+    parser.add_argument('--difficulty', help='Difficulty mode filter (e.g. hard)')
+    parser.add_argument('--group', help='Show top stealers for this source group id')
+    parser.add_argument('--top', type=int, default=20, help='Number of entries to show')
+    args = parser.parse_args()
+
+    if args.load:
+        index = ConfusionIndex.load(args.load)
+        print(f"✅ Loaded index from {args.load}")
+    else:
+        print("🔍 Building confusion index...\n")
+        pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+        index = ConfusionIndex.build(fetch_rows(pb))
+        index.save(args.output)
+        print(f"\n💾 Index saved to: {args.output}")
+
+    nnz = sum(csr.nnz() for csr in index.slices.values())
+    print(f"   Groups: {len(index.group_ids)}, slices: {len(index.slices)}, non-zero cells: {nnz}")
+
+    print_report(index, args)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
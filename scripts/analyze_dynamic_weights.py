@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Per-intent effectiveness of dynamic weights (dw*) vs manual weights (mw*)
+
+For every dynamic-weight run the matching manual-weight runs (same
+embedding, enrichment, tester and difficulty) are located and results are
+paired on shared queries. Reports, per query_intent and per applied-weight
+vector:
+  - MRR / Acc@1 of dw vs mw on the same queries, wins / losses
+  - extra tokens spent per query by the dw runs
+  - the weight vector per intent that would have maximized MRR
+
+The best mapping is picked from recorded ranks across all observed weight
+vectors. When results carry a stored `query_embedding`, queries are also
+re-scored offline against the group vectors over a grid of weights
+(candidates = recorded top_results + the source group).
+
+Usage:
+    python3 scripts/analyze_dynamic_weights.py
+    python3 scripts/analyze_dynamic_weights.py --grid-step 0.05 --min-support 20
+"""
+
+import os
+import sys
+import json
+import math
+import argparse
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+
+OUTPUT_FILE = 'dynamic_weights_analysis.json'
+ASPECTS = ('identity', 'physical', 'context')
+RESULT_FIELDS = 'source_group_id,generated_query,correct_rank,query_intent,applied_weights,search_tokens,tester_tokens,top_results,query_embedding'
+
+
+def config_key(run):
+    """Configuration shared by a dw run and its mw counterparts"""
+    return (
+        run.get('embedding_model') or 'unknown',
+        run.get('enrichment_model') or 'none',
+        run.get('tester_model') or 'unknown',
+        run.get('difficulty_mode') or 'medium'
+    )
+
+
+def query_key(result):
+    return (result.get('source_group_id'), (result.get('generated_query') or '').strip().lower())
+
+
+def weight_vector(weights):
+    """Hashable, rounded weight vector"""
+    if not weights:
+        return None
+    return tuple(round(float(weights.get(a, 0) or 0), 2) for a in ASPECTS)
+
+
+def run_weights(run):
+    return weight_vector({
+        'identity': run.get('mvs_weight_identity'),
+        'physical': run.get('mvs_weight_physical'),
+        'context': run.get('mvs_weight_context')
+    })
+
+
+def reciprocal_rank(rank):
+    return 1 / rank if rank and rank > 0 else 0
+
+
+class Stat:
+    """Running sums for MRR / Acc@1 / tokens"""
+
+    def __init__(self):
+        self.n = 0
+        self.rr = 0.0
+        self.hit1 = 0
+        self.tokens = 0
+
+    def add(self, rank, tokens=0):
+        self.n += 1
+        self.rr += reciprocal_rank(rank)
+        self.hit1 += rank == 1
+        self.tokens += tokens
+
+    def to_dict(self):
+        return {
+            'queries': self.n,
+            'mrr': self.rr / self.n if self.n else 0,
+            'accuracy_at_1': self.hit1 / self.n if self.n else 0,
+            'tokens_per_query': self.tokens / self.n if self.n else 0
+        }
+
+
+def result_tokens(result):
+    return (result.get('search_tokens') or 0) + (result.get('tester_tokens') or 0)
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def weight_grid(step):
+    """All (identity, physical, context) with non-negative weights summing to 1"""
+    n = round(1 / step)
+    return [
+        (round(i * step, 4), round(j * step, 4), round((n - i - j) * step, 4))
+        for i in range(n + 1)
+        for j in range(n + 1 - i)
+    ]
+
+
+def aspect_similarities(query_vec, candidates, group_vectors):
+    """{group_id: (sim_identity, sim_physical, sim_context)} for the candidate set"""
+    sims = {}
+    for group_id in candidates:
+        vectors = group_vectors.get(group_id) or {}
+        sims[group_id] = tuple(
+            cosine(query_vec, vectors[a]) if vectors.get(a) else 0.0
+            for a in ASPECTS
+        )
+    return sims
+
+
+def rescored_rank(sims, source_id, weights):
+    """Rank of the source group when candidates are scored with `weights`"""
+    scores = {gid: sum(w * s for w, s in zip(weights, sim)) for gid, sim in sims.items()}
+    target = scores.get(source_id)
+    if target is None:
+        return 0
+    return 1 + sum(1 for gid, score in scores.items() if gid != source_id and score > target)
+
+
+def fetch_group_vectors(pb, embedding_key):
+    """{group_id: {aspect: vector}} for one embedding key"""
+    vectors = {}
+    for group in pb.iter_records('groups', filter='embeddings != null', fields='id,embeddings'):
+        entry = (group.get('embeddings') or {}).get(embedding_key)
+        if entry:
+            vectors[group['id']] = entry
+    return vectors
+
+
+def analyze(pb, args):
+    runs = [r for r in pb.get_test_runs(limit=500) if r.get('status') == 'completed']
+    dw_runs = [r for r in runs if r.get('use_dynamic_weights')]
+    mw_by_config = defaultdict(list)
+    for run in runs:
+        if not run.get('use_dynamic_weights'):
+            mw_by_config[config_key(run)].append(run)
+
+    print(f"✅ {len(dw_runs)} dynamic-weight runs, {len(runs) - len(dw_runs)} manual-weight runs\n")
+
+    by_intent_dw = defaultdict(Stat)
+    by_intent_mw = defaultdict(Stat)
+    by_intent_outcome = defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0})
+    by_applied_weights = defaultdict(Stat)
+    # (intent, weight_vector) -> Stat over every recorded query with that intent
+    candidates = defaultdict(Stat)
+    rescoring = defaultdict(lambda: defaultdict(float))
+    rescoring_counts = defaultdict(int)
+    grid = weight_grid(args.grid_step)
+    vector_cache = {}
+
+    dw_by_config = defaultdict(list)
+    for dw_run in dw_runs:
+        dw_by_config[config_key(dw_run)].append(dw_run)
+
+    i = 0
+    for key, config_dw_runs in dw_by_config.items():
+        # Every mw run of a config is read once and paired with the pooled
+        # results of all its dw runs, so it is never counted twice
+        dw_index = {}
+        for dw_run in config_dw_runs:
+            i += 1
+            print(f"[{i}/{len(dw_runs)}] {dw_run['name']}")
+            dw_results = list(pb.iter_records(
+                'embedding_test_results', filter=f'run_id="{dw_run["id"]}"', fields=RESULT_FIELDS
+            ))
+            for r in dw_results:
+                dw_index.setdefault(query_key(r), r)
+                intent = r.get('query_intent') or 'unknown'
+                applied = weight_vector(r.get('applied_weights'))
+                by_applied_weights[applied].add(r.get('correct_rank'), result_tokens(r))
+                if applied:
+                    candidates[(intent, applied)].add(r.get('correct_rank'))
+
+            embedding_key = dw_run.get('embedding_key')
+            if embedding_key and any(r.get('query_embedding') for r in dw_results):
+                if embedding_key not in vector_cache:
+                    vector_cache[embedding_key] = fetch_group_vectors(pb, embedding_key)
+                group_vectors = vector_cache[embedding_key]
+                for r in dw_results:
+                    query_vec = r.get('query_embedding')
+                    source_id = r.get('source_group_id')
+                    if not query_vec or not source_id:
+                        continue
+                    intent = r.get('query_intent') or 'unknown'
+                    pool = {t.get('id') for t in r.get('top_results') or [] if t.get('id')} | {source_id}
+                    sims = aspect_similarities(query_vec, pool, group_vectors)
+                    for weights in grid:
+                        rescoring[intent][weights] += reciprocal_rank(rescored_rank(sims, source_id, weights))
+                    rescoring_counts[intent] += 1
+
+        mw_runs = mw_by_config.get(key, [])
+        print(f"   ↔ {len(mw_runs)} manual run(s) for {len(config_dw_runs)} dynamic run(s)")
+        for mw_run in mw_runs:
+            mw_weights = run_weights(mw_run)
+            for r in pb.iter_records(
+                'embedding_test_results', filter=f'run_id="{mw_run["id"]}"', fields=RESULT_FIELDS
+            ):
+                dw_result = dw_index.get(query_key(r))
+                if dw_result is None:
+                    continue
+                intent = dw_result.get('query_intent') or 'unknown'
+                dw_rank, mw_rank = dw_result.get('correct_rank'), r.get('correct_rank')
+
+                by_intent_dw[intent].add(dw_rank, result_tokens(dw_result))
+                by_intent_mw[intent].add(mw_rank, result_tokens(r))
+                candidates[(intent, mw_weights)].add(mw_rank)
+
+                dw_rr, mw_rr = reciprocal_rank(dw_rank), reciprocal_rank(mw_rank)
+                outcome = 'wins' if dw_rr > mw_rr else 'losses' if dw_rr < mw_rr else 'ties'
+                by_intent_outcome[intent][outcome] += 1
+
+    return {
+        'by_intent': {
+            intent: {
+                'dynamic': by_intent_dw[intent].to_dict(),
+                'manual': by_intent_mw[intent].to_dict(),
+                **by_intent_outcome[intent]
+            }
+            for intent in sorted(by_intent_dw)
+        },
+        'by_applied_weights': {
+            '/'.join(f'{w:g}' for w in vec) if vec else 'none': stat.to_dict()
+            for vec, stat in sorted(by_applied_weights.items(), key=lambda x: -x[1].n)
+        },
+        'best_recorded_weights': best_recorded(candidates, args.min_support),
+        'best_rescored_weights': {
+            intent: {
+                'weights': dict(zip(ASPECTS, max(totals, key=totals.get))),
+                'mrr': max(totals.values()) / rescoring_counts[intent],
+                'queries': rescoring_counts[intent]
+            }
+            for intent, totals in rescoring.items()
+        }
+    }
+
+
+def best_recorded(candidates, min_support):
+    """Per intent, the observed weight vector with the highest MRR"""
+    best = {}
+    for (intent, weights), stat in candidates.items():
+        if stat.n < min_support:
+            continue
+        mrr = stat.rr / stat.n
+        if intent not in best or mrr > best[intent]['mrr']:
+            best[intent] = {'weights': dict(zip(ASPECTS, weights)), 'mrr': mrr, 'queries': stat.n}
+    return best
+
+
+def print_report(analysis):
+    print("\n📊 Dynamic vs manual weights on shared queries:\n")
+    print(f"{'Intent':<14} {'n':>6} {'MRR dw':>8} {'MRR mw':>8} {'Δ MRR':>8} {'W/L/T':>14} {'Δ tok/q':>9}")
+    print("-" * 72)
+    for intent, row in analysis['by_intent'].items():
+        dw, mw = row['dynamic'], row['manual']
+        delta = dw['mrr'] - mw['mrr']
+        tokens = dw['tokens_per_query'] - mw['tokens_per_query']
+        wlt = f"{row['wins']}/{row['losses']}/{row['ties']}"
+        print(f"{intent[:13]:<14} {dw['queries']:>6} {dw['mrr']:>8.3f} {mw['mrr']:>8.3f} {delta:>+8.3f} {wlt:>14} {tokens:>+9.1f}")
+
+    print("\n⚖️  Applied weight vectors (identity/physical/context):\n")
+    for vec, stat in list(analysis['by_applied_weights'].items())[:15]:
+        print(f"   {vec:<18} n={stat['queries']:<6} MRR {stat['mrr']:.3f}  Acc@1 {stat['accuracy_at_1']*100:.1f}%")
+
+    for title, key in [('recorded ranks', 'best_recorded_weights'), ('offline re-scoring', 'best_rescored_weights')]:
+        best = analysis[key]
+        if not best:
+            continue
+        print(f"\n🏆 Best weights per intent ({title}):\n")
+        for intent, entry in sorted(best.items()):
+            w = entry['weights']
+            print(f"   {intent[:13]:<14} {w['identity']:.2f}/{w['physical']:.2f}/{w['context']:.2f}"
+                  f"  MRR {entry['mrr']:.3f} (n={entry['queries']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-intent dynamic weights effectiveness')
+    parser.add_argument('--grid-step', type=float, default=0.1, help='Weight grid step for offline re-scoring')
+    parser.add_argument('--min-support', type=int, default=10, help='Minimum queries for a recorded weight vector')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("🧭 Analyzing dynamic weights...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    analysis = analyze(pb, args)
+    print_report(analysis)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(analysis, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
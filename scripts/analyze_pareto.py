@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Accuracy vs cost Pareto frontier across test configurations
+
+Pools completed runs per configuration (embedding, enrichment, tester,
+difficulty, weights mode), prices them with the per-model pricing table
+(MODEL_PRICING, overridable through PRICING_FILE) and keeps the
+non-dominated configurations on three objectives:
+  - accuracy (Acc@1 by default, --metric to change), higher is better
+  - cost per query, lower is better
+  - tokens per query, lower is better
+
+A configuration is dominated when another one is at least as good on all
+three and strictly better on one; everything left is a sensible production
+choice, the rest can be dropped. Metrics come from the summaries written by
+finalize_test_runs.py when current, otherwise from the results.
+
+Usage:
+    python3 scripts/analyze_pareto.py
+    python3 scripts/analyze_pareto.py --metric mean_reciprocal_rank --per-run
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient, run_cost
+from watch_test_run import StreamingMetrics
+from finalize_test_runs import stored_metrics
+
+OUTPUT_FILE = 'pareto_frontier.json'
+METRICS = ('accuracy_at_1', 'accuracy_at_5', 'accuracy_at_10', 'mean_reciprocal_rank')
+
+
+def configuration(run):
+    weights = 'dynamic' if run.get('use_dynamic_weights') else '/'.join(
+        f"{run.get(f'mvs_weight_{a}') or 0:g}" for a in ('identity', 'physical', 'context')
+    )
+    return (
+        run.get('embedding_model') or 'unknown',
+        run.get('enrichment_model') or 'none',
+        run.get('tester_model') or 'unknown',
+        run.get('difficulty_mode') or 'medium',
+        weights
+    )
+
+
+def run_metrics(pb, run):
+    metrics = stored_metrics(run)
+    if metrics is None:
+        stats = StreamingMetrics()
+        for result in pb.iter_records('embedding_test_results', filter=f'run_id="{run["id"]}"', fields='correct_rank'):
+            stats.add(result)
+        metrics = stats.metrics()
+    return metrics
+
+
+def dominates(a, b):
+    """a is at least as good as b everywhere and strictly better somewhere"""
+    at_least = a['accuracy'] >= b['accuracy'] and a['cost_per_query'] <= b['cost_per_query'] \
+        and a['tokens_per_query'] <= b['tokens_per_query']
+    better = a['accuracy'] > b['accuracy'] or a['cost_per_query'] < b['cost_per_query'] \
+        or a['tokens_per_query'] < b['tokens_per_query']
+    return at_least and better
+
+
+def pareto_frontier(points):
+    """Non-dominated points; sorted by accuracy so each point is only
+    checked against the ones that can beat it"""
+    ordered = sorted(points, key=lambda p: (-p['accuracy'], p['cost_per_query'], p['tokens_per_query']))
+    frontier = []
+    for p in ordered:
+        if not any(dominates(q, p) for q in frontier):
+            frontier.append(p)
+    return frontier
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy / cost / tokens Pareto frontier')
+    parser.add_argument('--metric', choices=METRICS, default='accuracy_at_1', help='Accuracy objective')
+    parser.add_argument('--per-run', action='store_true', help='Treat every run as its own configuration')
+    parser.add_argument('--min-queries', type=int, default=20, help='Skip configurations with fewer queries')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("📐 Computing accuracy / cost frontier...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    runs = list(pb.iter_records('embedding_test_runs', filter='status="completed"'))
+    print(f"✅ Found {len(runs)} completed tests\n")
+
+    pooled = defaultdict(lambda: {'runs': [], 'queries': 0, 'weighted': 0.0, 'cost': 0.0, 'tokens': 0})
+    for run in runs:
+        metrics = run_metrics(pb, run)
+        n = metrics['total_queries']
+        if not n:
+            continue
+        key = (run['name'],) if args.per_run else configuration(run)
+        p = pooled[key]
+        p['runs'].append(run['name'])
+        p['queries'] += n
+        # Every metric is a per-query mean, so pooling weights by query count
+        p['weighted'] += metrics[args.metric] * n
+        p['cost'] += run_cost(run)
+        p['tokens'] += (run.get('total_search_tokens') or 0) + (run.get('total_tester_tokens') or 0)
+
+    points = [
+        {
+            'configuration': '_'.join(key) if not args.per_run else key[0],
+            'runs': p['runs'],
+            'queries': p['queries'],
+            'accuracy': p['weighted'] / p['queries'],
+            'cost_per_query': p['cost'] / p['queries'],
+            'tokens_per_query': p['tokens'] / p['queries']
+        }
+        for key, p in pooled.items() if p['queries'] >= args.min_queries
+    ]
+    frontier = pareto_frontier(points)
+    on_frontier = {id(p) for p in frontier}
+
+    print(f"🏁 {len(frontier)} of {len(points)} configurations are non-dominated ({args.metric}):\n")
+    print(f"{'Configuration':<40} {'Queries':>8} {'Accuracy':>9} {'$/query':>10} {'tok/query':>10}")
+    print("-" * 82)
+    for p in sorted(frontier, key=lambda p: p['cost_per_query']):
+        print(f"{p['configuration'][:39]:<40} {p['queries']:>8} {p['accuracy']*100:>8.1f}% "
+              f"{p['cost_per_query']:>10.6f} {p['tokens_per_query']:>10.0f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'metric': args.metric,
+            'frontier': sorted(frontier, key=lambda p: p['cost_per_query']),
+            'dominated': [p for p in points if id(p) not in on_frontier]
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Similarity score and margin profiler with match_threshold recommendation
+
+Per completed run, collects the top-1 similarity, `similarity_margin` and the
+similarity of the correct hit (the top_results entry whose id is the source
+group) into flat sorted arrays, then prints quantiles and histograms.
+
+Threshold recommendation works at candidate level: every entry of
+top_results is a candidate, the correct hit is a positive. Sweeping the
+threshold over the sorted scores (one pass) gives precision / recall at every
+cut-off; the recommended `match_threshold` is the highest-precision cut-off
+that still keeps the requested recall. Fewer retained candidates also means
+smaller search payloads, so the average kept per query is reported too.
+
+Usage:
+    python3 scripts/analyze_similarity.py
+    python3 scripts/analyze_similarity.py --recall 0.98 --bins 20
+"""
+
+import os
+import sys
+import json
+import argparse
+from bisect import bisect_right
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+
+OUTPUT_FILE = 'similarity_profile.json'
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def quantile(sorted_values, q):
+    """Linear-interpolated quantile of an already sorted list"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def histogram(sorted_values, bins, lo=0.0, hi=1.0):
+    """Bin counts via bisect on the sorted values"""
+    edges = [lo + (hi - lo) * i / bins for i in range(bins + 1)]
+    cumulative = [bisect_right(sorted_values, e) for e in edges[1:]]
+    cumulative[-1] = len(sorted_values)
+    counts = [cumulative[0]] + [cumulative[i] - cumulative[i - 1] for i in range(1, bins)]
+    return edges, counts
+
+
+def profile_results(results):
+    """Flat score arrays + labelled candidates for one run"""
+    top1, margins, correct = [], [], []
+    candidates = []
+    queries = 0
+
+    for r in results:
+        top_results = r.get('top_results') or []
+        source = r.get('source_group_id')
+        queries += 1
+        if top_results:
+            top1.append(top_results[0].get('similarity') or 0)
+        if r.get('similarity_margin') is not None:
+            margins.append(r['similarity_margin'])
+        for t in top_results:
+            is_correct = bool(source) and t.get('id') == source
+            score = t.get('similarity') or 0
+            candidates.append((score, is_correct))
+            if is_correct:
+                correct.append(score)
+
+    top1.sort()
+    margins.sort()
+    correct.sort()
+    return {'top1': top1, 'margin': margins, 'correct': correct}, candidates, queries
+
+
+def sweep_threshold(candidates, queries, target_recall):
+    """Best-precision threshold keeping recall >= target, in one pass"""
+    positives = sum(1 for _, ok in candidates if ok)
+    if not positives:
+        return None
+
+    ordered = sorted(candidates, key=lambda c: -c[0])
+    best = None
+    kept = hits = 0
+    i = 0
+    while i < len(ordered):
+        score = ordered[i][0]
+        # Candidates with equal scores are kept or dropped together
+        while i < len(ordered) and ordered[i][0] == score:
+            kept += 1
+            hits += ordered[i][1]
+            i += 1
+        recall = hits / positives
+        if recall < target_recall:
+            continue
+        precision = hits / kept
+        if best is None or precision > best['precision']:
+            best = {
+                'match_threshold': score,
+                'precision': precision,
+                'recall': recall,
+                'candidates_per_query': kept / queries if queries else 0,
+                'baseline_candidates_per_query': len(candidates) / queries if queries else 0
+            }
+    return best
+
+
+def summarize(arrays, bins):
+    summary = {}
+    for name, values in arrays.items():
+        edges, counts = histogram(values, bins) if values else ([], [])
+        summary[name] = {
+            'count': len(values),
+            'quantiles': {f'p{int(q*100)}': quantile(values, q) for q in QUANTILES},
+            'histogram': {'edges': edges, 'counts': counts}
+        }
+    return summary
+
+
+def print_histogram(name, entry, width=40):
+    counts = entry['histogram']['counts']
+    if not counts:
+        return
+    peak = max(counts) or 1
+    print(f"   {name}:")
+    edges = entry['histogram']['edges']
+    for i, count in enumerate(counts):
+        if not count:
+            continue
+        bar = '█' * max(1, round(count / peak * width))
+        print(f"      {edges[i]:.2f}-{edges[i+1]:.2f} {bar} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Similarity score distribution profiler')
+    parser.add_argument('--recall', type=float, default=0.95, help='Minimum candidate recall to keep')
+    parser.add_argument('--bins', type=int, default=20)
+    parser.add_argument('--histograms', action='store_true', help='Print histograms, not only quantiles')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("📈 Profiling similarity scores...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    runs = [r for r in pb.get_test_runs(limit=500) if r.get('status') == 'completed']
+    print(f"✅ Found {len(runs)} completed tests\n")
+
+    profiles = []
+    for run in runs:
+        results = pb.iter_records(
+            'embedding_test_results',
+            filter=f'run_id="{run["id"]}"',
+            fields='source_group_id,similarity_margin,top_results'
+        )
+        arrays, candidates, queries = profile_results(results)
+        recommendation = sweep_threshold(candidates, queries, args.recall)
+        summary = summarize(arrays, args.bins)
+
+        profiles.append({
+            'id': run['id'],
+            'name': run['name'],
+            'current_match_threshold': run.get('match_threshold'),
+            'queries': queries,
+            'distributions': summary,
+            'recommendation': recommendation
+        })
+
+        print(f"🔹 {run['name']} ({queries} queries)")
+        for name in ('top1', 'margin', 'correct'):
+            q = summary[name]['quantiles']
+            if summary[name]['count']:
+                print(f"   {name:<8} " + '  '.join(f"{k} {v:.3f}" for k, v in q.items()))
+        if args.histograms:
+            for name in ('top1', 'correct'):
+                print_histogram(name, summary[name])
+        if recommendation:
+            print(f"   ➜ match_threshold {recommendation['match_threshold']:.3f} "
+                  f"(precision {recommendation['precision']*100:.1f}%, recall {recommendation['recall']*100:.1f}%, "
+                  f"{recommendation['candidates_per_query']:.1f}/{recommendation['baseline_candidates_per_query']:.1f} candidates/query)"
+                  f" — current: {run.get('match_threshold', 'n/a')}")
+        print()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'target_recall': args.recall, 'runs': profiles}, f, indent=2, ensure_ascii=False)
+    print(f"💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Run throughput timeline from result timestamps
+
+Turns the `created` timestamps of each run's results into:
+  - queries/minute and tokens/second over the run's active span
+  - inter-query latency percentiles (p50/p95/p99) and the overhead on top
+    of the configured delay_between_queries_ms
+  - stalls: gaps much longer than the run's typical gap
+  - a per-minute timeline of completed queries
+and pools the gaps per embedding model and per tester model, so
+delay_between_queries_ms and concurrency can be tuned against each
+provider's real rate limits.
+
+Usage:
+    python3 scripts/analyze_throughput.py
+    python3 scripts/analyze_throughput.py --stall-factor 5 --min-stall 30 --timeline
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from analyze_similarity import quantile
+
+OUTPUT_FILE = 'throughput_report.json'
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def parse_timestamp(value):
+    """PocketBase '2026-01-21 21:14:24.123Z' -> POSIX seconds"""
+    if not value:
+        return None
+    value = value.strip().replace('T', ' ').rstrip('Z')
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def percentiles(sorted_values):
+    return {f'p{int(p*100)}': quantile(sorted_values, p) for p in PERCENTILES}
+
+
+def run_throughput(run, results, stall_factor, min_stall):
+    """Throughput profile of one run from (timestamp, tokens) pairs"""
+    points = []
+    for r in results:
+        ts = parse_timestamp(r.get('created'))
+        if ts is not None:
+            points.append((ts, (r.get('search_tokens') or 0) + (r.get('tester_tokens') or 0)))
+    points.sort()
+
+    if len(points) < 2:
+        return None, []
+
+    gaps = [b[0] - a[0] for a, b in zip(points, points[1:])]
+    sorted_gaps = sorted(gaps)
+    typical = quantile(sorted_gaps, 0.5)
+    stall_threshold = max(typical * stall_factor, min_stall)
+    stalls = [
+        {'after_query': i + 1, 'at': points[i][0], 'seconds': gap}
+        for i, gap in enumerate(gaps) if gap > stall_threshold
+    ]
+    stalled_seconds = sum(s['seconds'] for s in stalls)
+
+    span = points[-1][0] - points[0][0]
+    active = max(span - stalled_seconds, 1e-9)
+    tokens = sum(t for _, t in points)
+    delay = (run.get('delay_between_queries_ms') or 0) / 1000
+
+    timeline = Counter(int((ts - points[0][0]) // 60) for ts, _ in points)
+
+    profile = {
+        'queries': len(points),
+        'span_seconds': span,
+        'stalled_seconds': stalled_seconds,
+        'queries_per_minute': len(points) / active * 60,
+        'tokens_per_second': tokens / active,
+        'configured_delay_seconds': delay,
+        'gap_seconds': percentiles(sorted_gaps),
+        'overhead_seconds': {k: v - delay for k, v in percentiles(sorted_gaps).items()},
+        'stall_threshold_seconds': stall_threshold,
+        'stalls': stalls,
+        'timeline_per_minute': [timeline.get(m, 0) for m in range(max(timeline) + 1)]
+    }
+    return profile, gaps
+
+
+def sparkline(counts):
+    blocks = ' ▁▂▃▄▅▆▇█'
+    peak = max(counts) or 1
+    return ''.join(blocks[round(c / peak * (len(blocks) - 1))] for c in counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput timeline from result timestamps')
+    parser.add_argument('--stall-factor', type=float, default=10.0, help='Gap > factor × median gap is a stall')
+    parser.add_argument('--min-stall', type=float, default=30.0, help='Minimum stall length in seconds')
+    parser.add_argument('--timeline', action='store_true', help='Print per-minute timeline sparklines')
+    parser.add_argument('--include-running', action='store_true', help='Also profile runs that are not completed')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("⏱️  Measuring test throughput...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    runs = pb.get_test_runs(limit=500)
+    if not args.include_running:
+        runs = [r for r in runs if r.get('status') == 'completed']
+    print(f"✅ Found {len(runs)} tests\n")
+
+    profiles = []
+    gaps_by_model = defaultdict(list)
+
+    print(f"{'Name':<32} {'q/min':>7} {'tok/s':>8} {'p50':>6} {'p95':>6} {'p99':>6} {'delay':>6} {'stalls':>7}")
+    print("-" * 84)
+
+    for run in runs:
+        results = pb.iter_records(
+            'embedding_test_results',
+            filter=f'run_id="{run["id"]}"',
+            fields='created,search_tokens,tester_tokens'
+        )
+        profile, gaps = run_throughput(run, results, args.stall_factor, args.min_stall)
+        if profile is None:
+            continue
+
+        gaps_by_model[('embedding', run.get('embedding_model') or 'unknown')].extend(gaps)
+        gaps_by_model[('tester', run.get('tester_model') or 'unknown')].extend(gaps)
+        profiles.append({'id': run['id'], 'name': run['name'], **profile})
+
+        g = profile['gap_seconds']
+        print(f"{run['name'][:31]:<32} {profile['queries_per_minute']:>7.1f} {profile['tokens_per_second']:>8.1f} "
+              f"{g['p50']:>5.1f}s {g['p95']:>5.1f}s {g['p99']:>5.1f}s "
+              f"{profile['configured_delay_seconds']:>5.1f}s {len(profile['stalls']):>7}")
+        if args.timeline:
+            print(f"   {sparkline(profile['timeline_per_minute'])}")
+
+    by_model = {}
+    print("\n📦 Inter-query latency per model:\n")
+    for (kind, code), gaps in sorted(gaps_by_model.items()):
+        sorted_gaps = sorted(gaps)
+        by_model[f'{kind}:{code}'] = {'gaps': len(gaps), 'gap_seconds': percentiles(sorted_gaps)}
+        p = by_model[f'{kind}:{code}']['gap_seconds']
+        print(f"   {kind:<10} {code:<10} n={len(gaps):<7} p50 {p['p50']:.2f}s  p95 {p['p95']:.2f}s  p99 {p['p99']:.2f}s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'runs': profiles, 'by_model': by_model}, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
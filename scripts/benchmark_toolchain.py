@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analysis scripts against a local PocketBase stand-in
+
+Starts pocketbase_standin.PocketBaseStandIn on a free port, seeds it with
+deterministic synthetic runs, results and groups at the requested scale,
+points every script at it and measures each case after a warm-up pass:
+wall time (best of --repeat) and, in a separate pass under tracemalloc,
+peak Python memory.
+
+Cases:
+  - calculate_metrics        over every seeded result
+  - export_to_json           full JSON export
+  - export_full_data         streamed markdown export (report cache off)
+  - comparison_report        comparison report (report cache off)
+  - coverage_check           embedding coverage audit over all groups
+  - wandb_offline            upload_to_wandb in offline mode for one run
+
+Results go to a JSON file (one record per case with the scale, seconds,
+peak MiB and HTTP requests/bytes served) so runs can be diffed over time.
+
+Usage:
+    python3 scripts/benchmark_toolchain.py
+    python3 scripts/benchmark_toolchain.py --runs 50 --queries 1000 --groups 2000 --dims 768
+    python3 scripts/benchmark_toolchain.py --case calculate_metrics --case coverage_check --repeat 5
+    python3 scripts/benchmark_toolchain.py --latency-ms 20 --max-in-flight 6 --error-rate 0.02   # overloaded server
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from pocketbase_standin import PocketBaseStandIn, seed
+
+OUTPUT_FILE = 'benchmark_results.json'
+
+
+@contextlib.contextmanager
+def quiet():
+    """Scripts print progress; keep the benchmark output readable"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def case_calculate_metrics(ctx):
+    from export_to_wandb import calculate_metrics
+    calculate_metrics(ctx['results'])
+
+
+def case_export_to_json(ctx):
+    import export_to_json
+    sys.argv = ['export_to_json.py']
+    export_to_json.export_to_json()
+
+
+def case_export_full_data(ctx):
+    import export_full_data
+    sys.argv = ['export_full_data.py', '--rebuild']
+    export_full_data.export_full_data()
+
+
+def case_comparison_report(ctx):
+    import generate_comparison_report
+    sys.argv = ['generate_comparison_report.py', '--rebuild']
+    generate_comparison_report.generate_report()
+
+
+def case_coverage_check(ctx):
+    import check_embedding_coverage
+    from export_to_wandb import PocketBaseClient
+    pb = PocketBaseClient(ctx['url'], ctx['email'], ctx['password'])
+    check_embedding_coverage.audit(pb)
+
+
+def case_wandb_offline(ctx):
+    import export_to_wandb
+    run = ctx['runs'][0]
+    results = [r for r in ctx['results'] if r['run_id'] == run['id']]
+    export_to_wandb.upload_to_wandb(run, results, offline=True)
+
+
+CASES = {
+    'calculate_metrics': case_calculate_metrics,
+    'export_to_json': case_export_to_json,
+    'export_full_data': case_export_full_data,
+    'comparison_report': case_comparison_report,
+    'coverage_check': case_coverage_check,
+    'wandb_offline': case_wandb_offline
+}
+
+
+def measure(fn, ctx, repeat):
+    """(best seconds, peak MiB); an untimed warm-up pass absorbs imports,
+    and timing and memory are separate passes so tracemalloc overhead does
+    not inflate the time"""
+    with quiet():
+        fn(ctx)
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with quiet():
+            fn(ctx)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        with quiet():
+            fn(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analysis toolchain on synthetic data')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200, help='Results per run')
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--dims', type=int, default=128, help='Stored vector dimensions')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='Timing passes per case (best is kept)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Server time added to every stand-in request')
+    parser.add_argument('--max-in-flight', type=int, help='Stand-in answers 429 above this many concurrent requests')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of stand-in requests answered with 503')
+    parser.add_argument('--case', action='append', choices=list(CASES), help='Only run these cases (repeatable)')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    scale = {'runs': args.runs, 'queries': args.queries, 'groups': args.groups, 'dims': args.dims, 'seed': args.seed,
+             'latency_ms': args.latency_ms, 'max_in_flight': args.max_in_flight, 'error_rate': args.error_rate}
+    print(f"🧪 Seeding stand-in: {args.runs} runs × {args.queries} queries, {args.groups} groups × {args.dims} dims...")
+    data = seed(args.runs, args.queries, args.groups, args.dims, args.seed)
+
+    server = PocketBaseStandIn(data, latency=args.latency_ms / 1000, max_in_flight=args.max_in_flight,
+                               error_rate=args.error_rate, seed_value=args.seed)
+    server.start()
+    output = os.path.abspath(args.output)
+    argv = sys.argv
+    cwd = os.getcwd()
+
+    # Every script reads these at import time
+    os.environ.update({
+        'POCKETBASE_URL': server.url,
+        'POCKETBASE_ADMIN_EMAIL': server.email,
+        'POCKETBASE_ADMIN_PASSWORD': server.password,
+        'AI_INSIGHTS_BACKEND': 'stub'
+    })
+    ctx = {
+        'url': server.url,
+        'email': server.email,
+        'password': server.password,
+        'runs': data['embedding_test_runs'],
+        'results': data['embedding_test_results']
+    }
+
+    records = []
+    print(f"📡 Stand-in at {server.url}\n")
+    print(f"{'Case':<20} {'Seconds':>9} {'Peak MiB':>9} {'Requests':>9} {'MiB served':>11}")
+    print("-" * 62)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            # Scripts write their outputs to the working directory
+            os.chdir(workdir)
+            for name in args.case or CASES:
+                requests_before, bytes_before = server.requests, server.bytes_sent
+                try:
+                    seconds, peak_mib = measure(CASES[name], ctx, args.repeat)
+                except ImportError as e:
+                    print(f"{name:<20} skipped ({e})")
+                    records.append({'case': name, 'skipped': str(e)})
+                    continue
+                except (Exception, SystemExit) as e:
+                    # One broken case must not cost the others' numbers
+                    print(f"{name:<20} failed ({type(e).__name__}: {e})")
+                    records.append({'case': name, 'error': f'{type(e).__name__}: {e}'})
+                    continue
+                passes = args.repeat + 2
+                record = {
+                    'case': name,
+                    'seconds': seconds,
+                    'peak_mib': peak_mib,
+                    'requests_per_pass': (server.requests - requests_before) // passes,
+                    'mib_served_per_pass': (server.bytes_sent - bytes_before) / passes / (1024 * 1024)
+                }
+                records.append(record)
+                print(f"{name:<20} {seconds:>9.3f} {peak_mib:>9.1f} {record['requests_per_pass']:>9} "
+                      f"{record['mib_served_per_pass']:>11.2f}")
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+        server.stop()
+        # Written even when interrupted, with the cases measured so far
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generated_at': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'scale': scale,
+                'repeat': args.repeat,
+                'cases': records
+            }, f, indent=2)
+        print(f"\n💾 Saved to: {output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
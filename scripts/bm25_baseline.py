@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Lexical BM25 baseline replayed over the recorded test queries
+
+Builds an in-memory inverted index over group name + description (name
+terms weighted --name-boost times) and replays every generated_query of
+the completed runs against it. Next to each run's embedding metrics it
+reports:
+  - BM25: Acc@k / MRR of the lexical ranking alone
+  - Hybrid: reciprocal rank fusion (RRF) of the BM25 ranking and the
+    stored embedding ranking. Only the stored top_results are known for
+    the embedding side, so both rankings are cut at that depth
+  - Cascade: answer lexically when BM25 is confident (relative gap
+    between its top two scores >= margin), otherwise use the embedding
+    result; the lexical share is the share of embedding calls saved
+plus per-query search latency and the index's memory (tracemalloc).
+
+Usage:
+    python3 scripts/bm25_baseline.py
+    python3 scripts/bm25_baseline.py --run-id abc123 --stem-prefix 6
+    python3 scripts/bm25_baseline.py --k1 1.5 --b 0.6 --margins 0.2,0.4,0.6
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tracemalloc
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from watch_test_run import StreamingMetrics
+
+OUTPUT_FILE = 'bm25_baseline.json'
+RESULT_FIELDS = 'source_group_id,generated_query,correct_rank,top_results'
+RRF_K = 60
+DEFAULT_MARGINS = (0.1, 0.2, 0.3, 0.5)
+
+
+def tokenize(text, stem_prefix=None):
+    """Lowercase alphanumeric words; with stem_prefix, cut to that many
+    characters (a crude stemmer that folds most Polish inflections)"""
+    words = ''.join(c.lower() if c.isalnum() else ' ' for c in text or '').split()
+    return [w[:stem_prefix] for w in words] if stem_prefix else words
+
+
+class BM25Index:
+    """Inverted index: term -> [(doc, term frequency)], Okapi BM25 scoring"""
+
+    def __init__(self, docs, k1=1.2, b=0.75, stem_prefix=None):
+        """`docs` is a list of token lists"""
+        self.k1 = k1
+        self.b = b
+        self.stem_prefix = stem_prefix
+        self.postings = defaultdict(list)
+        self.lengths = [len(tokens) for tokens in docs]
+        for doc, tokens in enumerate(docs):
+            counts = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            for token, tf in counts.items():
+                self.postings[token].append((doc, tf))
+        n = len(docs)
+        self.average_length = sum(self.lengths) / n if n else 0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+        # Length normalization per document, so scoring is one multiply-add per posting
+        self.norms = [k1 * (1 - b + b * length / self.average_length) if self.average_length else k1
+                      for length in self.lengths]
+
+    @classmethod
+    def from_groups(cls, groups, name_boost=2, **kwargs):
+        stem = kwargs.get('stem_prefix')
+        docs = [tokenize(g.get('name'), stem) * name_boost + tokenize(g.get('description'), stem) for g in groups]
+        return cls(docs, **kwargs)
+
+    def scores(self, query):
+        """{doc: score} of every document sharing a term with the query"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query, self.stem_prefix)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + self.norms[doc])
+        return scores
+
+    def search(self, query):
+        """[(doc, score)] best first; ties keep index order"""
+        return sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+
+
+def rank_of(ranking, target):
+    """1-based position of target in a ranking of ids, 0 if absent"""
+    for position, item in enumerate(ranking, 1):
+        if item == target:
+            return position
+    return 0
+
+
+def rrf(*rankings, k=RRF_K):
+    """Reciprocal rank fusion of id rankings, best first"""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for position, item in enumerate(ranking, 1):
+            fused[item] += 1 / (k + position)
+    return [item for item, _ in sorted(fused.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+
+def confident(hits, margin):
+    """BM25's top hit stands out: (s1 - s2) / s1 >= margin"""
+    if not hits:
+        return False
+    if len(hits) == 1:
+        return True
+    return (hits[0][1] - hits[1][1]) / hits[0][1] >= margin
+
+
+def evaluate_run(index, group_ids, results, margins):
+    """Embedding, BM25, hybrid and cascade metrics over one run's results"""
+    embedding = StreamingMetrics()
+    lexical = StreamingMetrics()
+    hybrid = StreamingMetrics()
+    cascades = {m: (StreamingMetrics(), [0]) for m in margins}
+    latencies = []
+
+    for result in results:
+        source = result.get('source_group_id')
+        stored = [r['id'] for r in result.get('top_results') or []]
+        embedding.add(result)
+
+        started = time.perf_counter()
+        hits = index.search(result.get('generated_query') or '')
+        latencies.append(time.perf_counter() - started)
+
+        lexical_ids = [group_ids[doc] for doc, _ in hits]
+        lexical_rank = rank_of(lexical_ids, source)
+        lexical.add({'correct_rank': lexical_rank})
+        depth = len(stored) or 10
+        hybrid.add({'correct_rank': rank_of(rrf(lexical_ids[:depth], stored), source)})
+
+        for margin, (stats, routed) in cascades.items():
+            if confident(hits, margin):
+                routed[0] += 1
+                stats.add({'correct_rank': lexical_rank})
+            else:
+                stats.add(result)
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        'queries': n,
+        'embedding': embedding.metrics(),
+        'bm25': lexical.metrics(),
+        'hybrid': hybrid.metrics(),
+        'cascade': [{'margin': m, 'lexical_share': routed[0] / n if n else 0, **stats.metrics()}
+                    for m, (stats, routed) in cascades.items()],
+        'latency_ms': {
+            'mean': sum(latencies) / n * 1000 if n else 0,
+            'p50': latencies[n // 2] * 1000 if n else 0,
+            'p95': latencies[min(n - 1, int(n * 0.95))] * 1000 if n else 0
+        }
+    }
+
+
+def build_index(groups, args):
+    """Index plus its build time and traced memory"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = BM25Index.from_groups(groups, args.name_boost, k1=args.k1, b=args.b, stem_prefix=args.stem_prefix)
+    seconds = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, {
+        'groups': len(groups),
+        'terms': len(index.postings),
+        'postings': sum(len(p) for p in index.postings.values()),
+        'build_seconds': seconds,
+        'memory_mib': memory / 1048576
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BM25 baseline over recorded test queries')
+    parser.add_argument('--run-id', help='Only this run (default: every completed run)')
+    parser.add_argument('--k1', type=float, default=1.2)
+    parser.add_argument('--b', type=float, default=0.75)
+    parser.add_argument('--name-boost', type=int, default=2, help='Times the name terms are counted')
+    parser.add_argument('--stem-prefix', type=int, help='Cut terms to this many characters')
+    parser.add_argument('--margins', default=','.join(f'{m:g}' for m in DEFAULT_MARGINS),
+                        help='Cascade confidence margins to evaluate')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+    margins = [float(m) for m in args.margins.split(',') if m]
+
+    print("🔤 Evaluating the BM25 baseline...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    groups = pb.fetch_all('groups', filter='deleted_at=""', fields='id,name,description')
+    index, index_stats = build_index(groups, args)
+    group_ids = [g['id'] for g in groups]
+    print(f"📚 Indexed {index_stats['groups']} groups: {index_stats['terms']:,} terms, "
+          f"{index_stats['postings']:,} postings, {index_stats['memory_mib']:.2f} MiB "
+          f"in {index_stats['build_seconds']*1000:.0f} ms\n")
+
+    if args.run_id:
+        runs = [pb.get_record('embedding_test_runs', args.run_id)]
+    else:
+        runs = list(pb.iter_records('embedding_test_runs', filter='status="completed"'))
+    print(f"✅ Found {len(runs)} runs\n")
+
+    print(f"{'Name':<30} {'Queries':>8} {'Emb MRR':>8} {'BM25':>8} {'Hybrid':>8} "
+          f"{'Cascade':>8} {'Lexical':>8} {'ms/query':>9}")
+    print("-" * 97)
+    output = []
+    default_margin = margins[len(margins) // 2] if margins else None
+    for run in runs:
+        results = pb.fetch_all('embedding_test_results', filter=f'run_id="{run["id"]}"', fields=RESULT_FIELDS)
+        evaluation = evaluate_run(index, group_ids, results, margins)
+        output.append({'id': run['id'], 'name': run.get('name'), 'embedding_model': run.get('embedding_model'),
+                       **evaluation})
+        cascade = next((c for c in evaluation['cascade'] if c['margin'] == default_margin), None)
+        print(f"{run.get('name', run['id'])[:29]:<30} {evaluation['queries']:>8} "
+              f"{evaluation['embedding']['mean_reciprocal_rank']:>8.3f} "
+              f"{evaluation['bm25']['mean_reciprocal_rank']:>8.3f} "
+              f"{evaluation['hybrid']['mean_reciprocal_rank']:>8.3f} "
+              f"{cascade['mean_reciprocal_rank'] if cascade else 0:>8.3f} "
+              f"{cascade['lexical_share'] if cascade else 0:>8.1%} "
+              f"{evaluation['latency_ms']['mean']:>9.3f}")
+
+    if output and margins:
+        total = sum(r['queries'] for r in output)
+        print("\n🔀 Cascade over all runs (answer lexically when BM25's top-2 gap >= margin)")
+        print(f"{'Margin':>8} {'Lexical':>9} {'MRR':>8} {'vs embedding':>13}")
+        embedding_mrr = sum(r['embedding']['mean_reciprocal_rank'] * r['queries'] for r in output) / total if total else 0
+        for k, margin in enumerate(margins):
+            share = sum(r['cascade'][k]['lexical_share'] * r['queries'] for r in output) / total if total else 0
+            mrr = sum(r['cascade'][k]['mean_reciprocal_rank'] * r['queries'] for r in output) / total if total else 0
+            print(f"{margin:>8g} {share:>9.1%} {mrr:>8.3f} {mrr - embedding_mrr:>+13.3f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'parameters': {'k1': args.k1, 'b': args.b, 'name_boost': args.name_boost,
+                                  'stem_prefix': args.stem_prefix, 'rrf_k': RRF_K},
+                   'index': index_stats, 'runs': output}, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
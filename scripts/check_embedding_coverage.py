@@ -1,8 +1,31 @@
 #!/usr/bin/env python3
-"""Check how many groups have embeddings for each key"""
+"""
+Audit embedding coverage and vector integrity for every embedding key
+
+Streams all groups page by page (vectors are checked and dropped; only
+per-key counters, a presence bitmap and the ids that need work are kept),
+and for every embedding key and each identity/physical/context aspect
+reports:
+  - coverage (groups that have the vector)
+  - wrong dimension, NaN values, zero norm
+  - stale vectors: the group was edited after the vector was generated
+    (per-vector timestamp when stored, otherwise the group's `updated` is
+    later than the last completed regeneration job of any key: all keys
+    live in the one `embeddings` field, so every job bumps `updated`)
+
+The output file lists, per key, the group ids that need regeneration.
+
+Usage:
+    python3 scripts/check_embedding_coverage.py
+    python3 scripts/check_embedding_coverage.py --key g25f_oai3l --min-coverage 0.9
+"""
 
 import os
 import sys
+import json
+import math
+import argparse
+from collections import defaultdict
 from dotenv import load_dotenv
 
 load_dotenv('.env.local')
@@ -13,67 +36,196 @@ POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
 
 sys.path.insert(0, os.path.dirname(__file__))
 from export_to_wandb import PocketBaseClient
+from analyze_throughput import parse_timestamp
+from tracing import traced
+
+OUTPUT_FILE = 'embedding_regeneration_targets.json'
+ASPECTS = ('identity', 'physical', 'context')
+
+# Known output dimensions per embedding model code (last part of the key)
+EXPECTED_DIMENSIONS = {
+    'gem004': 768,
+    'oai3l': 3072,
+    'oai3s': 1536,
+    'voy3': 1024,
+    'voy35': 1024
+}
+
+# Regeneration writes and the group's `updated` are not perfectly in sync
+STALE_TOLERANCE_SECONDS = 60
+
+
+def vector_issue(vector, expected_dim):
+    """None if the vector is fine, else a short reason"""
+    if not isinstance(vector, list) or not vector:
+        return 'empty'
+    if expected_dim and len(vector) != expected_dim:
+        return 'dimension'
+    norm = 0.0
+    for x in vector:
+        if x is None or x != x:
+            return 'nan'
+        norm += x * x
+    if norm == 0.0 or not math.isfinite(norm):
+        return 'zero_norm'
+    return None
+
+
+class KeyAudit:
+    """Counters for one embedding key; ids kept only for groups that need work"""
+
+    def __init__(self, key):
+        self.key = key
+        self.expected_dim = EXPECTED_DIMENSIONS.get(key.rsplit('_', 1)[-1])
+        self.present = bytearray()
+        self.aspects = {a: defaultdict(int) for a in ASPECTS}
+        self.stale = 0
+        self.regenerate = {}
+
+    def mark_present(self, ordinal):
+        byte, bit = divmod(ordinal, 8)
+        if byte >= len(self.present):
+            self.present.extend(b'\0' * (byte - len(self.present) + 1))
+        self.present[byte] |= 1 << bit
+
+    def has(self, ordinal):
+        byte, bit = divmod(ordinal, 8)
+        return byte < len(self.present) and bool(self.present[byte] & (1 << bit))
+
+    def check(self, ordinal, group, entry, stale_before):
+        self.mark_present(ordinal)
+        reasons = []
+        for aspect in ASPECTS:
+            counters = self.aspects[aspect]
+            vector = entry.get(aspect)
+            if vector is None:
+                counters['missing'] += 1
+                reasons.append(f'{aspect}:missing')
+                continue
+            if self.expected_dim is None and isinstance(vector, list) and vector:
+                # Unknown model: the first vector seen defines the dimension
+                self.expected_dim = len(vector)
+            issue = vector_issue(vector, self.expected_dim)
+            if issue:
+                counters[issue] += 1
+                reasons.append(f'{aspect}:{issue}')
+            else:
+                counters['ok'] += 1
+
+        group_updated = parse_timestamp(group.get('updated'))
+        generated = parse_timestamp(entry.get('updated_at') or entry.get('generated_at')) or stale_before
+        if group_updated and generated and group_updated - generated > STALE_TOLERANCE_SECONDS:
+            self.stale += 1
+            reasons.append('stale')
+
+        if reasons:
+            self.regenerate[group['id']] = reasons
+
+
+def last_regeneration_time(pb):
+    """updated timestamp of the most recent completed regeneration job.
+
+    Not per key: a job for any key rewrites groups.embeddings and so bumps
+    groups.updated, which would look like an edit after every other key's
+    last job. Per-key precision comes from per-vector timestamps."""
+    latest = None
+    for job in pb.iter_records('embedding_regeneration_jobs', filter='status="completed"', fields='updated'):
+        ts = parse_timestamp(job.get('updated'))
+        if ts and (latest is None or ts > latest):
+            latest = ts
+    return latest
+
+
+@traced('coverage.audit')
+def audit(pb):
+    stale_before = last_regeneration_time(pb)
+    audits = {}
+    group_ids = []
+    no_embeddings = 0
+
+    for ordinal, group in enumerate(pb.iter_records(
+        'groups', filter='deleted_at = ""', fields='id,name,updated,embeddings', per_page=200
+    )):
+        group_ids.append(group['id'])
+        embeddings = group.get('embeddings') or {}
+        if not embeddings:
+            no_embeddings += 1
+        for key, entry in embeddings.items():
+            if key not in audits:
+                audits[key] = KeyAudit(key)
+            audits[key].check(ordinal, group, entry or {}, stale_before)
+        if (ordinal + 1) % 1000 == 0:
+            print(f"   ...{ordinal + 1} groups scanned")
+
+    # Groups lacking a key entirely need it generated as well
+    for key_audit in audits.values():
+        for ordinal, group_id in enumerate(group_ids):
+            if not key_audit.has(ordinal):
+                key_audit.regenerate.setdefault(group_id, ['missing'])
+
+    return audits, group_ids, no_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Embedding coverage and vector integrity audit')
+    parser.add_argument('--key', action='append', help='Only report these embedding keys (repeatable)')
+    parser.add_argument('--min-coverage', type=float, default=0.95, help='Coverage below this needs regeneration')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
 
-def check_embeddings():
     print("🔍 Checking embedding coverage...\n")
-    
     pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
-    
-    # Get all groups (use internal pb client)
-    import requests
-    response = requests.get(
-        f'{POCKETBASE_URL}/api/collections/groups/records',
-        params={'perPage': 500, 'filter': 'embeddings != null'},
-        headers={'Authorization': f'Bearer {pb.token}'}
-    )
-    response.raise_for_status()
-    all_groups = response.json()['items']
-    
-    print(f"✅ Total groups with embeddings: {len(all_groups)}\n")
-    
-    # Count per key
-    key_counts = {}
-    
-    for group in all_groups:
-        embeddings = group.get('embeddings', {})
-        if embeddings:
-            for key in embeddings.keys():
-                if key not in key_counts:
-                    key_counts[key] = 0
-                key_counts[key] += 1
-    
-    # Sort by count
-    sorted_keys = sorted(key_counts.items(), key=lambda x: x[1], reverse=True)
-    
+
+    audits, group_ids, no_embeddings = audit(pb)
+    total_groups = len(group_ids)
+    print(f"✅ Total groups: {total_groups} ({no_embeddings} without any embeddings)\n")
+
+    keys = args.key or sorted(audits, key=lambda k: -sum(audits[k].aspects['identity'].values()))
+
     print("📊 Embedding Coverage by Key:\n")
-    print(f"{'Key':<20} {'Groups':<10} {'%':<10}")
-    print("-" * 40)
-    
-    for key, count in sorted_keys:
-        percent = (count / len(all_groups) * 100)
-        print(f"{key:<20} {count:<10} {percent:.1f}%")
-    
-    # Check specific key
-    target_key = 'g25f_oai3l'
-    if target_key in key_counts:
-        print(f"\n⚠️  Key '{target_key}': {key_counts[target_key]} groups")
-        print(f"   This is {'VERY LOW' if key_counts[target_key] < 50 else 'OK'}")
-    else:
-        print(f"\n❌ Key '{target_key}' NOT FOUND in any groups!")
-        print(f"   Need to regenerate embeddings for this key")
-    
+    print(f"{'Key':<20} {'Dim':>5} {'Aspect':<9} {'OK':>7} {'%':>7} {'Missing':>8} {'Dim!':>5} {'NaN':>5} {'Zero':>5}")
+    print("-" * 80)
+
+    targets = {}
+    for key in keys:
+        key_audit = audits.get(key)
+        if key_audit is None:
+            print(f"{key:<20} ❌ NOT FOUND in any group")
+            targets[key] = sorted(group_ids)
+            continue
+        for aspect in ASPECTS:
+            c = key_audit.aspects[aspect]
+            ok = c['ok']
+            missing = total_groups - ok - c['dimension'] - c['nan'] - c['zero_norm'] - c['empty']
+            percent = ok / total_groups * 100 if total_groups else 0
+            print(f"{key if aspect == 'identity' else '':<20} {key_audit.expected_dim or '?':>5} {aspect:<9} "
+                  f"{ok:>7} {percent:>6.1f}% {missing:>8} {c['dimension']:>5} {c['nan']:>5} {c['zero_norm']:>5}")
+        if key_audit.stale:
+            print(f"{'':<20} {'':>5} {'stale':<9} {key_audit.stale:>7}")
+        targets[key] = sorted(key_audit.regenerate)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'total_groups': total_groups, 'regenerate': targets}, f, indent=2)
+    print(f"\n💾 Group ids to regenerate per key saved to: {args.output}")
+
+    needs_work = [
+        key for key in targets
+        if total_groups and 1 - len(targets[key]) / total_groups < args.min_coverage
+    ]
     print(f"\n💡 Recommendation:")
-    if target_key not in key_counts or key_counts[target_key] < 50:
-        print(f"   1. Go to UI → Embedding Tests → Regeneration")
-        print(f"   2. Create job for: enrichment=g25f, embedding=oai3l")
-        print(f"   3. Wait for completion (~5-10 min)")
-        print(f"   4. Re-run test")
+    if needs_work:
+        for key in needs_work:
+            enrichment, _, embedding = key.rpartition('_')
+            print(f"   ⚠️  {key}: {len(targets[key])} groups to regenerate")
+            print(f"      UI → Embedding Tests → Regeneration: enrichment={enrichment or 'none'}, embedding={embedding}")
+        print(f"   Then follow progress and ETA: python3 scripts/monitor_regeneration.py")
     else:
-        print(f"   Key has enough groups, test should work correctly")
+        print(f"   All keys have at least {args.min_coverage*100:.0f}% valid coverage, tests should work correctly")
+
 
 if __name__ == '__main__':
     try:
-        check_embeddings()
+        main()
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Find equivalent test configurations and the runs that already cover them
+
+A configuration's fingerprint is a hash of the fields that change test
+outcomes, normalized: defaults filled in, field order and the #n in run
+names ignored, the enrichment model read from embedding_key when the run
+does not name it, manual weights dropped when dynamic weights replace
+them. Runs and queue configs with the same fingerprint test the same
+thing. Fields that only change how long a test takes
+(delay_between_queries_ms) or how many queries it has
+(target_query_count) are not part of it: a run covers a request when it
+is completed, has at least the requested number of queries and its
+health (finalize_test_runs.py) does not flag it as broken. Runs without a
+current stored summary have their health computed from their results.
+
+Reports, for every pending queue entry, the run that already covers it
+and earlier pending entries it duplicates; with --pool, metrics pooled
+over every set of equivalent completed runs (query-weighted, with the
+spread between runs).
+
+Usage:
+    python3 scripts/config_fingerprint.py
+    python3 scripts/config_fingerprint.py --pool
+    python3 scripts/config_fingerprint.py --pool --min-runs 3
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from finalize_test_runs import compute_summary, stored_metrics, is_current, SUMMARY_FIELD
+
+OUTPUT_FILE = 'config_fingerprints.json'
+
+# Run fields a queue config may set, with the defaults of a new run
+RUN_DEFAULTS = {
+    'embedding_model': 'oai3l',
+    'embedding_key': None,
+    'use_sample_groups': False,
+    'tester_model': 'gpt4m',
+    'tester_temperature': 0.7,
+    'difficulty_mode': 'medium',
+    'mvs_weight_identity': 0.5,
+    'mvs_weight_physical': 0.3,
+    'mvs_weight_context': 0.2,
+    'match_threshold': 0.3,
+    'delay_between_queries_ms': 0,
+    'target_query_count': 100,
+    'use_dynamic_weights': False
+}
+
+# Stored health flags that disqualify a run from covering a request
+INVALID_FLAGS = {'no_results', 'incomplete', 'mostly_failed'}
+POOLED = ('accuracy_at_1', 'accuracy_at_5', 'accuracy_at_10', 'mean_reciprocal_rank')
+
+
+def canonical_config(record):
+    """Outcome-relevant configuration of a run or queue config, normalized"""
+    config = dict(RUN_DEFAULTS)
+    config.update({k: v for k, v in record.items() if k in RUN_DEFAULTS and v is not None and v != ''})
+    embedding = str(config['embedding_model']).lower()
+    key = str(config['embedding_key'] or '').lower()
+    enrichment = record.get('enrichment_model') or None
+    if not enrichment and key.endswith(f'_{embedding}'):
+        enrichment = key[:-len(embedding) - 1]
+    dynamic = bool(config['use_dynamic_weights'])
+    return {
+        'embedding_model': embedding,
+        'enrichment_model': str(enrichment or 'none').lower(),
+        'tester_model': str(config['tester_model']).lower(),
+        'tester_temperature': round(float(config['tester_temperature']), 3),
+        'difficulty_mode': str(config['difficulty_mode']).lower(),
+        'use_dynamic_weights': dynamic,
+        'weights': None if dynamic else [round(float(config[f'mvs_weight_{a}'] or 0), 4)
+                                         for a in ('identity', 'physical', 'context')],
+        'match_threshold': round(float(config['match_threshold'] or 0), 4),
+        'use_sample_groups': bool(config['use_sample_groups'])
+    }
+
+
+def fingerprint(record):
+    canonical = json.dumps(canonical_config(record), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def describe(canonical):
+    weights = 'dw' if canonical['use_dynamic_weights'] else 'mw ' + '/'.join(f'{w:g}' for w in canonical['weights'])
+    return (f"{canonical['enrichment_model']}_{canonical['embedding_model']}_{canonical['tester_model']} "
+            f"{canonical['difficulty_mode']} {weights}")
+
+
+def run_problems(run, target=0, health=None):
+    """Why a run cannot stand in for a request of `target` queries ([] if it can).
+    `health` is the run's computed health; without it the stored summary's is
+    used, and a completed run with no current summary cannot stand in"""
+    problems = []
+    if run.get('status') != 'completed':
+        problems.append(f"status {run.get('status')}")
+    if (run.get('completed_query_count') or 0) < target:
+        problems.append(f"{run.get('completed_query_count') or 0}/{target} queries")
+    if health is None and is_current(run):
+        health = run[SUMMARY_FIELD]['health']
+    if health is not None:
+        problems.extend(sorted(INVALID_FLAGS.intersection(health.get('flags', []))))
+    elif not problems:
+        problems.append('no current summary')
+    return problems
+
+
+class FingerprintIndex:
+    """Runs grouped by configuration fingerprint; with `pb`, the health of
+    completed runs without a current summary is computed (once per run)"""
+
+    def __init__(self, runs, pb=None):
+        self.pb = pb
+        self.runs = defaultdict(list)
+        self._health = {}
+        for run in runs:
+            self.runs[fingerprint(run)].append(run)
+
+    @classmethod
+    def load(cls, pb):
+        return cls(pb.fetch_all('embedding_test_runs'), pb)
+
+    def add(self, run):
+        self.runs[fingerprint(run)].append(run)
+
+    def problems(self, run, target=0):
+        """run_problems(), computing the health a completed run has no current summary of"""
+        health = None
+        if self.pb is not None and run.get('status') == 'completed' and not is_current(run):
+            if run['id'] not in self._health:
+                self._health[run['id']] = compute_summary(self.pb, run)['health']
+            health = self._health[run['id']]
+        return run_problems(run, target, health)
+
+    def covering(self, config):
+        """The completed, valid run with the most queries that covers a queue config, or None"""
+        target = config.get('target_query_count') or RUN_DEFAULTS['target_query_count']
+        valid = [r for r in self.runs.get(fingerprint(config), []) if not self.problems(r, target)]
+        return max(valid, key=lambda r: (r.get('completed_query_count') or 0, r.get('updated') or ''), default=None)
+
+    def equivalent(self, record):
+        return self.runs.get(fingerprint(record), [])
+
+
+def pool_metrics(pb, runs):
+    """Query-weighted metrics over equivalent runs, plus the range between them"""
+    per_run = []
+    for run in runs:
+        metrics = stored_metrics(run) or compute_summary(pb, run)['metrics']
+        if metrics['total_queries']:
+            per_run.append(metrics)
+    total = sum(m['total_queries'] for m in per_run)
+    successful = sum(m['successful_queries'] for m in per_run)
+    pooled = {key: sum(m[key] * m['total_queries'] for m in per_run) / total if total else 0 for key in POOLED}
+    pooled['average_rank'] = sum(m['average_rank'] * m['successful_queries'] for m in per_run) / successful \
+        if successful else 0
+    pooled['total_queries'] = total
+    pooled['successful_queries'] = successful
+    pooled['runs'] = len(per_run)
+    pooled['range'] = {key: [min(m[key] for m in per_run), max(m[key] for m in per_run)] if per_run else [0, 0]
+                       for key in POOLED}
+    return pooled
+
+
+def queue_report(index, entries):
+    """Per pending entry: the run covering it and the earlier entry it repeats"""
+    first_entry = {}
+    rows = []
+    for entry in sorted(entries, key=lambda e: e.get('position') or 0):
+        config = entry.get('config') or {}
+        fp = fingerprint(config)
+        covered = index.covering(config)
+        rows.append({
+            'queue_id': entry['id'],
+            'position': entry.get('position'),
+            'fingerprint': fp,
+            'config': describe(canonical_config(config)),
+            'covered_by': {'id': covered['id'], 'name': covered.get('name'),
+                           'queries': covered.get('completed_query_count')} if covered else None,
+            'duplicate_of': first_entry.get(fp),
+            'equivalent_runs': len(index.equivalent(config))
+        })
+        first_entry.setdefault(fp, entry['id'])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect duplicate test configurations')
+    parser.add_argument('--pool', action='store_true', help='Pool metrics over equivalent completed runs')
+    parser.add_argument('--min-runs', type=int, default=2, help='Smallest set of equivalent runs to report')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("🧬 Fingerprinting test configurations...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    index = FingerprintIndex.load(pb)
+    pending = pb.fetch_all('embedding_test_queue', filter='status="pending"', sort='position')
+    total_runs = sum(len(runs) for runs in index.runs.values())
+    print(f"✅ {total_runs} runs in {len(index.runs)} distinct configurations, {len(pending)} pending queue entries\n")
+
+    rows = queue_report(index, pending)
+    if rows:
+        print("📋 Pending queue")
+        for row in rows:
+            if row['covered_by']:
+                status = f"♻️  covered by {row['covered_by']['name']} ({row['covered_by']['queries']} queries)"
+            elif row['duplicate_of']:
+                status = f"🔁 repeats queue entry {row['duplicate_of']}"
+            else:
+                status = '🆕 new' if not row['equivalent_runs'] else f"⚠️  {row['equivalent_runs']} equivalent run(s), none valid"
+            print(f"   {row['queue_id']:<16} {row['config'][:44]:<44} {status}")
+        saved = sum(1 for r in rows if r['covered_by'] or r['duplicate_of'])
+        print(f"\n💡 {saved} of {len(rows)} pending entries need not run "
+              f"(queue_worker.py --reuse-covered skips them)\n")
+
+    clusters = []
+    for fp, runs in sorted(index.runs.items(), key=lambda kv: -len(kv[1])):
+        completed = [r for r in runs if not index.problems(r)]
+        if len(completed) < args.min_runs:
+            continue
+        cluster = {'fingerprint': fp, 'config': canonical_config(runs[0]),
+                   'runs': [{'id': r['id'], 'name': r.get('name'), 'queries': r.get('completed_query_count')}
+                            for r in completed]}
+        if args.pool:
+            cluster['pooled'] = pool_metrics(pb, completed)
+        clusters.append(cluster)
+
+    print(f"🔁 {len(clusters)} configuration(s) with {args.min_runs}+ completed runs")
+    if clusters and args.pool:
+        print(f"\n{'Configuration':<44} {'Runs':>5} {'Queries':>8} {'Acc@1':>8} {'MRR':>7} {'MRR range':>15}")
+        print("-" * 92)
+    for cluster in clusters:
+        label = describe(cluster['config'])[:43]
+        if args.pool:
+            p = cluster['pooled']
+            low, high = p['range']['mean_reciprocal_rank']
+            print(f"{label:<44} {p['runs']:>5} {p['total_queries']:>8} {p['accuracy_at_1']*100:>7.1f}% "
+                  f"{p['mean_reciprocal_rank']:>7.3f} {low:>7.3f}-{high:.3f}")
+        else:
+            print(f"   {label:<44} {', '.join(r['name'] or r['id'] for r in cluster['runs'])[:60]}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'queue': rows, 'clusters': clusters}, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
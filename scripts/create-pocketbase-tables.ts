@@ -123,7 +123,8 @@ async function createTables() {
                     { name: 'recall_at_10', type: 'number', required: false },
                     { name: 'mrr', type: 'number', required: false },
                     { name: 'ndcg_at_10', type: 'number', required: false },
-                    { name: 'completed_query_count', type: 'number', required: false }
+                    { name: 'completed_query_count', type: 'number', required: false },
+                    { name: 'query_embedding', type: 'json', required: false } // scripts/queue_worker.py
                 ]
             })
             console.log('  ✓ Utworzono\n')
@@ -163,7 +164,8 @@ async function createTables() {
                     { name: 'error_message', type: 'text', required: false },
                     { name: 'use_dynamic_weights', type: 'bool', required: false },
                     { name: 'total_search_tokens', type: 'number', required: false },
-                    { name: 'total_tester_tokens', type: 'number', required: false }
+                    { name: 'total_tester_tokens', type: 'number', required: false },
+                    { name: 'metrics_summary', type: 'json', required: false } // finalize_test_runs.py
                 ]
             })
             console.log('  ✓ Utworzono\n')
@@ -4,11 +4,24 @@ Export ALL embedding test data to markdown for AI analysis
 
 Usage:
     python3 scripts/export_full_data.py
+    python3 scripts/export_full_data.py --shard-dir full_test_data_runs   # one file per run + index
+    python3 scripts/export_full_data.py --rebuild                         # ignore the report cache
+    python3 scripts/export_full_data.py --memory-budget 512               # stream results in bounded pages
+
+Runs whose `updated` stamp is unchanged since the last export are taken
+from the report cache (.report_cache/), so only new or changed runs hit
+PocketBase.
+
+With --memory-budget, a run's results are never held as a list: they are
+paged in budget-sized pages into a RunDigest (metrics plus the handful of
+sample and failed queries the section shows) and every result of the run
+is counted (the regular export takes the first 1000).
 """
 
 import os
 import sys
-import json
+import argparse
+from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv('.env.local')
@@ -18,226 +31,318 @@ POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
 POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
 
 sys.path.insert(0, os.path.dirname(__file__))
-from export_to_wandb import PocketBaseClient, calculate_metrics, get_readable_name
+from export_to_wandb import PocketBaseClient, calculate_metrics, get_readable_name, run_cost
+from report_writer import ReportWriter, ReportCache, table_lines
+from watch_test_run import StreamingMetrics
+from memory_budget import MemoryBudget, peak_rss_summary
+from tracing import traced
 
-def export_full_data():
-    """Export all test data to markdown"""
-    
-    print("📦 Exporting full test data...\n")
-    
-    # Connect
-    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+OUTPUT_FILE = 'full_test_data.md'
+SECTION_VERSION = 2  # bump when render_run_details changes, invalidates the report cache
+SAMPLE_RESULTS = 10
+SAMPLE_FAILED = 5
+
+
+def summary_row(i, run, metrics, cost):
+    emb = get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')
+    enr = get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')
+    return [
+        i, run['name'][:25], run.get('status', 'unknown'), emb[:15], enr[:12], run.get('target_query_count', 0),
+        f"{metrics['accuracy_at_1']*100:.1f}%", f"{metrics['mean_reciprocal_rank']:.3f}", f"${cost:.4f}"
+    ]
+
+
+class RunDigest:
+    """Everything render_run_details needs from a run's results, in constant memory"""
+
+    def __init__(self):
+        self.stats = StreamingMetrics()
+        self.samples = []
+        self.failed = []
+        self.failed_count = 0
+
+    def add(self, result):
+        self.stats.add(result)
+        if len(self.samples) < SAMPLE_RESULTS:
+            self.samples.append(result)
+        if result.get('correct_rank', 0) == 0 or result.get('correct_rank', 0) > 10:
+            self.failed_count += 1
+            if len(self.failed) < SAMPLE_FAILED:
+                self.failed.append(result)
+        return self
+
+    @classmethod
+    def of(cls, results):
+        digest = cls()
+        for result in results:
+            digest.add(result)
+        return digest
+
+
+@traced('render.run_details')
+def render_run_details(run, digest, metrics, cost):
+    """Markdown section body for one run"""
+    md = ["**Configuration:**\n"]
+    md.append(f"- ID: `{run['id']}`\n")
+    md.append(f"- Status: {run.get('status', 'unknown')}\n")
+    md.append(f"- Embedding: {get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')}\n")
+    md.append(f"- Embedding Code: `{run.get('embedding_model', 'unknown')}`\n")
+    md.append(f"- Enrichment: {get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')}\n")
+    md.append(f"- Enrichment Code: `{run.get('enrichment_model', 'none')}`\n")
+    md.append(f"- Tester: {get_readable_name(run.get('tester_model', 'unknown'), 'tester')}\n")
+    md.append(f"- Tester Code: `{run.get('tester_model', 'unknown')}`\n")
+    md.append(f"- Target Queries: {run.get('target_query_count', 0)}\n")
+    md.append(f"- Completed Queries: {run.get('completed_query_count', 0)}\n")
+    md.append(f"- Difficulty: {run.get('difficulty_mode', 'unknown')}\n")
+    md.append(f"- Dynamic Weights: {run.get('use_dynamic_weights', False)}\n")
+    md.append(f"- Created: {run.get('created', 'unknown')}\n\n")
     
-    # Get all test runs
-    runs = pb.get_test_runs(limit=100)
-    print(f"✅ Found {len(runs)} test runs\n")
+    # Weights
+    md.append("**Weights:**\n")
+    md.append(f"- Identity: {run.get('mvs_weight_identity', 0)}\n")
+    md.append(f"- Physical: {run.get('mvs_weight_physical', 0)}\n")
+    md.append(f"- Context: {run.get('mvs_weight_context', 0)}\n\n")
     
-    # Build markdown
-    md = "# Embedding Tests - Complete Data Export\n\n"
-    md += f"**Generated:** {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    md += f"**Total Test Runs:** {len(runs)}\n\n"
-    md += "---\n\n"
+    # Metrics
+    md.append("**Metrics:**\n")
+    md.append(f"- Accuracy@1: **{metrics['accuracy_at_1']*100:.2f}%**\n")
+    md.append(f"- Accuracy@5: {metrics['accuracy_at_5']*100:.2f}%\n")
+    md.append(f"- Accuracy@10: {metrics['accuracy_at_10']*100:.2f}%\n")
+    md.append(f"- Mean Reciprocal Rank: {metrics['mean_reciprocal_rank']:.4f}\n")
+    md.append(f"- Average Rank: {metrics['average_rank']:.2f}\n")
+    md.append(f"- Total Queries: {metrics['total_queries']}\n")
+    md.append(f"- Successful Queries: {metrics['successful_queries']}\n")
+    if metrics['total_queries'] > 0:
+        md.append(f"- Success Rate: {(metrics['successful_queries']/metrics['total_queries']*100):.2f}%\n\n")
+    else:
+        md.append(f"- Success Rate: N/A\n\n")
     
-    # Summary table
-    md += "## 📊 Quick Summary\n\n"
-    md += "| # | Name | Status | Embedding | Enrichment | Queries | Acc@1 | MRR | Cost |\n"
-    md += "|---|------|--------|-----------|------------|---------|-------|-----|------|\n"
+    # Cost
+    md.append("**Cost Analysis:**\n")
+    md.append(f"- Search Tokens: {run.get('total_search_tokens', 0):,}\n")
+    md.append(f"- Tester Tokens: {run.get('total_tester_tokens', 0):,}\n")
+    md.append(f"- Total Tokens: {run.get('total_search_tokens', 0) + run.get('total_tester_tokens', 0):,}\n")
+    md.append(f"- Total Cost: ${cost:.4f}\n")
+    if metrics['total_queries'] > 0:
+        md.append(f"- Cost per Query: ${cost/metrics['total_queries']:.6f}\n\n")
+    else:
+        md.append(f"- Cost per Query: N/A\n\n")
     
-    for i, run in enumerate(runs, 1):
-        results = pb.get_test_results(run['id'])
-        metrics = calculate_metrics(results)
-        
-        cost = (run.get('total_search_tokens', 0) / 1_000_000) * 0.02 + \
-               (run.get('total_tester_tokens', 0) / 1_000_000) * 0.15
+    # Sample results (top 10 queries)
+    if digest.samples:
+        md.append("**Sample Results (first 10 queries):**\n\n")
+        md.append("| # | Query | Source | Rank | Top Result | Similarity |\n")
+        md.append("|---|-------|--------|------|------------|------------|\n")
         
-        emb = get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')
-        enr = get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')
+        for j, result in enumerate(digest.samples, 1):
+            query = result.get('generated_query', 'N/A')[:30]
+            source = result.get('source_group_name', 'N/A')[:20]
+            rank = result.get('correct_rank', 0)
+            
+            top_results = result.get('top_results', [])
+            if top_results and len(top_results) > 0:
+                top = top_results[0].get('name', 'N/A')[:20]
+                sim = top_results[0].get('similarity', 0)
+            else:
+                top = 'N/A'
+                sim = 0
+            
+            md.append(f"| {j} | {query}... | {source} | {rank} | {top} | {sim:.3f} |\n")
         
-        md += f"| {i} | {run['name'][:25]} | {run.get('status', 'unknown')} | "
-        md += f"{emb[:15]} | {enr[:12]} | {run.get('target_query_count', 0)} | "
-        md += f"{metrics['accuracy_at_1']*100:.1f}% | {metrics['mean_reciprocal_rank']:.3f} | "
-        md += f"${cost:.4f} |\n"
+        md.append("\n")
     
-    md += "\n---\n\n"
+    # Failed queries
+    if digest.failed_count:
+        md.append(f"**Failed Queries ({digest.failed_count}):**\n")
+        for j, result in enumerate(digest.failed, 1):
+            query = result.get('generated_query', 'N/A')[:50]
+            source = result.get('source_group_name', 'N/A')
+            md.append(f"{j}. \"{query}\" (expected: {source})\n")
+        if digest.failed_count > SAMPLE_FAILED:
+            md.append(f"...and {digest.failed_count - SAMPLE_FAILED} more\n")
+        md.append("\n")
     
-    # Detailed per test
-    md += "## 📋 Detailed Test Data\n\n"
+    md.append("---\n\n")
+    return ''.join(md)
+
+
+def write_appendix(report, example_number=1):
+    """Appendix: Naming Convention"""
+    report.write("## 📖 Appendix: Naming Convention Guide\n\n")
+    report.write("### Test Name Format\n\n")
+    report.write("```\n{enrichment}_{embedding}_{tester}_{mode}_#{number}\n```\n\n")
+    report.lines(
+        f"**Example:** `g25f_oai3l_gpt4o_mwM_#{example_number}`",
+        "- Enrichment: `g25f` = Gemini 2.5 Flash",
+        "- Embedding: `oai3l` = OpenAI text-embedding-3-large",
+        "- Tester: `gpt4o` = GPT-4o",
+        "- Mode: `mwM` = Manual Weights, Medium difficulty",
+        f"- Number: `#{example_number}` = {'First' if example_number == 1 else 'Second'} run",
+        ""
+    )
     
-    for i, run in enumerate(runs, 1):
-        print(f"Processing {i}/{len(runs)}: {run['name']}")
-        
-        results = pb.get_test_results(run['id'])
-        metrics = calculate_metrics(results)
-        
-        cost = (run.get('total_search_tokens', 0) / 1_000_000) * 0.02 + \
-               (run.get('total_tester_tokens', 0) / 1_000_000) * 0.15
-        
-        md += f"### Test {i}: {run['name']}\n\n"
-        
-        # Config
-        md += "**Configuration:**\n"
-        md += f"- ID: `{run['id']}`\n"
-        md += f"- Status: {run.get('status', 'unknown')}\n"
-        md += f"- Embedding: {get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')}\n"
-        md += f"- Embedding Code: `{run.get('embedding_model', 'unknown')}`\n"
-        md += f"- Enrichment: {get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')}\n"
-        md += f"- Enrichment Code: `{run.get('enrichment_model', 'none')}`\n"
-        md += f"- Tester: {get_readable_name(run.get('tester_model', 'unknown'), 'tester')}\n"
-        md += f"- Tester Code: `{run.get('tester_model', 'unknown')}`\n"
-        md += f"- Target Queries: {run.get('target_query_count', 0)}\n"
-        md += f"- Completed Queries: {run.get('completed_query_count', 0)}\n"
-        md += f"- Difficulty: {run.get('difficulty_mode', 'unknown')}\n"
-        md += f"- Dynamic Weights: {run.get('use_dynamic_weights', False)}\n"
-        md += f"- Created: {run.get('created', 'unknown')}\n\n"
-        
-        # Weights
-        md += "**Weights:**\n"
-        md += f"- Identity: {run.get('mvs_weight_identity', 0)}\n"
-        md += f"- Physical: {run.get('mvs_weight_physical', 0)}\n"
-        md += f"- Context: {run.get('mvs_weight_context', 0)}\n\n"
-        
-        # Metrics
-        md += "**Metrics:**\n"
-        md += f"- Accuracy@1: **{metrics['accuracy_at_1']*100:.2f}%**\n"
-        md += f"- Accuracy@5: {metrics['accuracy_at_5']*100:.2f}%\n"
-        md += f"- Accuracy@10: {metrics['accuracy_at_10']*100:.2f}%\n"
-        md += f"- Mean Reciprocal Rank: {metrics['mean_reciprocal_rank']:.4f}\n"
-        md += f"- Average Rank: {metrics['average_rank']:.2f}\n"
-        md += f"- Total Queries: {metrics['total_queries']}\n"
-        md += f"- Successful Queries: {metrics['successful_queries']}\n"
-        if metrics['total_queries'] > 0:
-            md += f"- Success Rate: {(metrics['successful_queries']/metrics['total_queries']*100):.2f}%\n\n"
-        else:
-            md += f"- Success Rate: N/A\n\n"
-        
-        # Cost
-        md += "**Cost Analysis:**\n"
-        md += f"- Search Tokens: {run.get('total_search_tokens', 0):,}\n"
-        md += f"- Tester Tokens: {run.get('total_tester_tokens', 0):,}\n"
-        md += f"- Total Tokens: {run.get('total_search_tokens', 0) + run.get('total_tester_tokens', 0):,}\n"
-        md += f"- Total Cost: ${cost:.4f}\n"
-        if metrics['total_queries'] > 0:
-            md += f"- Cost per Query: ${cost/metrics['total_queries']:.6f}\n\n"
-        else:
-            md += f"- Cost per Query: N/A\n\n"
+    report.write("### Enrichment Model Codes\n\n")
+    report.table(['Code', 'Model Name'], [
+        (f'`{code}`', name) for code, name in [
+            ('g25f', 'Gemini 2.5 Flash'),
+            ('g25fl', 'Gemini 2.5 Flash Lite'),
+            ('g25p', 'Gemini 2.5 Pro'),
+            ('gpt5n', 'GPT-5 Nano'),
+            ('gpt4m', 'GPT-4o Mini'),
+            ('gpt4o', 'GPT-4o'),
+            ('none', 'No Enrichment')
+        ]
+    ])
+    
+    report.write("### Embedding Model Codes\n\n")
+    report.table(['Code', 'Model Name', 'Provider'], [
+        (f'`{code}`', name, provider) for code, name, provider in [
+            ('gem004', 'text-embedding-004', 'Google'),
+            ('oai3l', 'text-embedding-3-large', 'OpenAI'),
+            ('oai3s', 'text-embedding-3-small', 'OpenAI'),
+            ('voy3', 'Voyage AI 3', 'Voyage'),
+            ('voy35', 'Voyage AI 3.5', 'Voyage')
+        ]
+    ])
+    
+    report.write("### Tester Model Codes\n\n")
+    report.table(['Code', 'Model Name'], [
+        (f'`{code}`', name) for code, name in [
+            ('gpt4o', 'GPT-4o'),
+            ('gpt4m', 'GPT-4o Mini'),
+            ('g25f', 'Gemini 2.5 Flash')
+        ]
+    ])
+    
+    report.write("### Mode Codes\n\n")
+    report.table(['Code', 'Meaning'], [
+        ('`mwM`', '**Manual Weights, Medium** - Fixed weights, medium difficulty'),
+        ('`dwM`', '**Dynamic Weights, Medium** - AI-adjusted weights per query'),
+        ('`mwE`', '**Manual Weights, Easy** - Fixed weights, easy difficulty'),
+        ('`mwH`', '**Manual Weights, Hard** - Fixed weights, hard difficulty')
+    ])
+    
+    report.lines(
+        "### Weight Types",
+        "",
+        "**Manual Weights (mw):**",
+        "- Identity, Physical, Context weights are fixed",
+        "- Same weights used for all queries",
+        "- More consistent, less expensive",
+        "",
+        "**Dynamic Weights (dw):**",
+        "- Weights adjusted per query based on intent",
+        "- AI classifies query intent → adjusts weights",
+        "- More adaptive, slightly more expensive",
+        "",
+        "### Difficulty Modes",
+        "",
+        "- **Easy (E):** Simple, direct queries",
+        "- **Medium (M):** Standard queries with some complexity",
+        "- **Hard (H):** Complex, ambiguous, or tricky queries",
+        ""
+    )
+
+
+def write_full_report(pb, runs, output_file, shard_dir=None, header_lines=(), example_number=1,
+                      use_cache=True, cache_name='full_test_data', budget=None):
+    """Stream the full report: only runs that are new or changed since the
+    last export are fetched and rendered, the rest come from the report cache.
+    With a MemoryBudget, results are paged through a RunDigest instead of
+    being fetched as one list"""
+    cache = ReportCache(cache_name, version=SECTION_VERSION)
+    summary_rows = []
+    fetched = 0
+    
+    with ReportWriter(output_file, shard_dir=shard_dir) as report:
+        report.write("# Embedding Tests - Complete Data Export\n\n")
+        report.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        report.lines(*header_lines)
+        report.write("---\n\n")
         
-        # Sample results (top 10 queries)
-        if results:
-            md += "**Sample Results (first 10 queries):**\n\n"
-            md += "| # | Query | Source | Rank | Top Result | Similarity |\n"
-            md += "|---|-------|--------|------|------------|------------|\n"
-            
-            for j, result in enumerate(results[:10], 1):
-                query = result.get('generated_query', 'N/A')[:30]
-                source = result.get('source_group_name', 'N/A')[:20]
-                rank = result.get('correct_rank', 0)
-                
-                top_results = result.get('top_results', [])
-                if top_results and len(top_results) > 0:
-                    top = top_results[0].get('name', 'N/A')[:20]
-                    sim = top_results[0].get('similarity', 0)
+        for i, run in enumerate(runs, 1):
+            cost = run_cost(run)
+            entry = cache.get(run) if use_cache else None
+            if entry is None:
+                print(f"Processing {i}/{len(runs)}: {run['name']}")
+                fetched += 1
+                if budget is not None:
+                    digest = RunDigest()
+                    for result in budget.iter_results(pb, run['id']):
+                        digest.add(result)
+                    metrics = digest.stats.metrics()
                 else:
-                    top = 'N/A'
-                    sim = 0
-                
-                md += f"| {j} | {query}... | {source} | {rank} | {top} | {sim:.3f} |\n"
+                    results = pb.get_test_results(run['id'])
+                    digest = RunDigest.of(results)
+                    metrics = calculate_metrics(results)
+                    del results
+                entry = cache.put(run, metrics, render_run_details(run, digest, metrics, cost))
             
-            md += "\n"
+            summary_rows.append(summary_row(i, run, entry['metrics'], cost))
+            report.add_section(run['id'], f"### Test {i}: {run['name']}\n\n" + entry['section'], title=run['name'])
+        
+        cache.prune(run['id'] for run in runs)
+        print(f"♻️  {len(runs) - fetched} runs unchanged (from cache), {fetched} fetched and rendered\n")
+        
+        # Summary table
+        report.write("## 📊 Quick Summary\n\n")
+        report.lines(*table_lines(
+            ['#', 'Name', 'Status', 'Embedding', 'Enrichment', 'Queries', 'Acc@1', 'MRR', 'Cost'], summary_rows
+        ))
+        report.write("\n---\n\n")
         
-        # Failed queries
-        failed = [r for r in results if r.get('correct_rank', 0) == 0 or r.get('correct_rank', 0) > 10]
-        if failed:
-            md += f"**Failed Queries ({len(failed)}):**\n"
-            for j, result in enumerate(failed[:5], 1):
-                query = result.get('generated_query', 'N/A')[:50]
-                source = result.get('source_group_name', 'N/A')
-                md += f"{j}. \"{query}\" (expected: {source})\n"
-            if len(failed) > 5:
-                md += f"...and {len(failed) - 5} more\n"
-            md += "\n"
+        # Detailed per test
+        report.write("## 📋 Detailed Test Data\n\n")
+        report.write_sections()
         
-        md += "---\n\n"
-    
-    # Appendix: Naming Convention
-    md += "## 📖 Appendix: Naming Convention Guide\n\n"
-    md += "### Test Name Format\n\n"
-    md += "```\n{enrichment}_{embedding}_{tester}_{mode}_#{number}\n```\n\n"
-    md += "**Example:** `g25f_oai3l_gpt4o_mwM_#1`\n"
-    md += "- Enrichment: `g25f` = Gemini 2.5 Flash\n"
-    md += "- Embedding: `oai3l` = OpenAI text-embedding-3-large\n"
-    md += "- Tester: `gpt4o` = GPT-4o\n"
-    md += "- Mode: `mwM` = Manual Weights, Medium difficulty\n"
-    md += "- Number: `#1` = First run\n\n"
-    
-    md += "### Enrichment Model Codes\n\n"
-    md += "| Code | Model Name |\n|------|------------|\n"
-    for code, name in [
-        ('g25f', 'Gemini 2.5 Flash'),
-        ('g25fl', 'Gemini 2.5 Flash Lite'),
-        ('g25p', 'Gemini 2.5 Pro'),
-        ('gpt5n', 'GPT-5 Nano'),
-        ('gpt4m', 'GPT-4o Mini'),
-        ('gpt4o', 'GPT-4o'),
-        ('none', 'No Enrichment')
-    ]:
-        md += f"| `{code}` | {name} |\n"
-    
-    md += "\n### Embedding Model Codes\n\n"
-    md += "| Code | Model Name | Provider |\n|------|------------|----------|\n"
-    for code, name, provider in [
-        ('gem004', 'text-embedding-004', 'Google'),
-        ('oai3l', 'text-embedding-3-large', 'OpenAI'),
-        ('oai3s', 'text-embedding-3-small', 'OpenAI'),
-        ('voy3', 'Voyage AI 3', 'Voyage'),
-        ('voy35', 'Voyage AI 3.5', 'Voyage')
-    ]:
-        md += f"| `{code}` | {name} | {provider} |\n"
-    
-    md += "\n### Tester Model Codes\n\n"
-    md += "| Code | Model Name |\n|------|------------|\n"
-    for code, name in [
-        ('gpt4o', 'GPT-4o'),
-        ('gpt4m', 'GPT-4o Mini'),
-        ('g25f', 'Gemini 2.5 Flash')
-    ]:
-        md += f"| `{code}` | {name} |\n"
-    
-    md += "\n### Mode Codes\n\n"
-    md += "| Code | Meaning |\n|------|----------|\n"
-    md += "| `mwM` | **Manual Weights, Medium** - Fixed weights, medium difficulty |\n"
-    md += "| `dwM` | **Dynamic Weights, Medium** - AI-adjusted weights per query |\n"
-    md += "| `mwE` | **Manual Weights, Easy** - Fixed weights, easy difficulty |\n"
-    md += "| `mwH` | **Manual Weights, Hard** - Fixed weights, hard difficulty |\n\n"
-    
-    md += "### Weight Types\n\n"
-    md += "**Manual Weights (mw):**\n"
-    md += "- Identity, Physical, Context weights are fixed\n"
-    md += "- Same weights used for all queries\n"
-    md += "- More consistent, less expensive\n\n"
-    
-    md += "**Dynamic Weights (dw):**\n"
-    md += "- Weights adjusted per query based on intent\n"
-    md += "- AI classifies query intent → adjusts weights\n"
-    md += "- More adaptive, slightly more expensive\n\n"
-    
-    md += "### Difficulty Modes\n\n"
-    md += "- **Easy (E):** Simple, direct queries\n"
-    md += "- **Medium (M):** Standard queries with some complexity\n"
-    md += "- **Hard (H):** Complex, ambiguous, or tricky queries\n\n"
-    
-    # Save
-    output_file = 'full_test_data.md'
-    with open(output_file, 'w') as f:
-        f.write(md)
+        write_appendix(report, example_number)
     
+    return report.chars_written
+
+
+def print_next_steps(output_file, chars_written, budget=None):
     print(f"\n✅ Full data exported to: {output_file}")
-    print(f"📄 File size: {len(md):,} characters")
+    print(f"📄 File size: {chars_written:,} characters")
+    print(peak_rss_summary(budget))
     print(f"\n💡 You can now:\n")
     print(f"1. Open {output_file}")
     print(f"2. Copy entire content")
     print(f"3. Paste to AI (Claude, ChatGPT, etc.)")
     print(f"4. Ask: 'Which model is best? Why?'\n")
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export all embedding test data to markdown')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--shard-dir', help='Write each run to its own file here; the report links to them')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the report cache and re-fetch every run')
+    parser.add_argument('--memory-budget', type=int, metavar='MIB',
+                        help='Page results in budget-sized pages instead of loading each run at once')
+    return parser.parse_args()
+
+
+def export_full_data():
+    """Export all test data to markdown"""
+    args = parse_args()
+    
+    print("📦 Exporting full test data...\n")
+    
+    # Connect
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    
+    # Get all test runs
+    runs = pb.get_test_runs(limit=100)
+    print(f"✅ Found {len(runs)} test runs\n")
+    
+    budget = MemoryBudget(args.memory_budget) if args.memory_budget else None
+    chars_written = write_full_report(
+        pb, runs, args.output, args.shard_dir,
+        header_lines=(f"**Total Test Runs:** {len(runs)}", ""),
+        use_cache=not args.rebuild,
+        budget=budget
+    )
+    print_next_steps(args.output, chars_written, budget)
+
 if __name__ == '__main__':
     try:
         export_full_data()
@@ -2,13 +2,21 @@
 """
 Export all test data to JSON for detailed analysis
 
+With --memory-budget, runs are processed one at a time: results are paged
+in budget-sized pages, aggregated on the fly and spilled to a temporary
+file, and both outputs are written incrementally, so memory no longer grows
+with the size of the instance. Budgeted exports include every result of a
+run (the regular export takes the first 1000).
+
 Usage:
     python3 scripts/export_to_json.py
+    python3 scripts/export_to_json.py --memory-budget 512
 """
 
 import os
 import sys
 import json
+import argparse
 from dotenv import load_dotenv
 
 load_dotenv('.env.local')
@@ -18,11 +26,165 @@ POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
 POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
 
 sys.path.insert(0, os.path.dirname(__file__))
-from export_to_wandb import PocketBaseClient, calculate_metrics
+from export_to_wandb import PocketBaseClient, calculate_metrics, run_cost
+from watch_test_run import StreamingMetrics
+from memory_budget import MemoryBudget, Spill, peak_rss_summary
+from tracing import span
+
+def result_data(result):
+    return {
+        "id": result.get('id'),
+        "query": result.get('generated_query'),
+        "source_group_id": result.get('source_group_id'),
+        "source_group_name": result.get('source_group_name'),
+        "correct_rank": result.get('correct_rank'),
+        "query_intent": result.get('query_intent'),
+        "search_tokens": result.get('search_tokens'),
+        "tester_tokens": result.get('tester_tokens'),
+        "similarity_margin": result.get('similarity_margin'),
+        "applied_weights": result.get('applied_weights'),
+        "top_results": result.get('top_results', [])[:10],  # Top 10 results
+        "created": result.get('created')
+    }
+
+
+def build_run_data(run, metrics):
+    """Run record without its results"""
+    search_tokens = run.get('total_search_tokens', 0)
+    tester_tokens = run.get('total_tester_tokens', 0)
+    total_tokens = search_tokens + tester_tokens
+    cost = run_cost(run)
+
+    return {
+        # Basic info
+        "id": run['id'],
+        "name": run['name'],
+        "status": run.get('status'),
+        "created": run.get('created'),
+        "updated": run.get('updated'),
+        
+        # Configuration
+        "config": {
+            "embedding_model": run.get('embedding_model'),
+            "embedding_key": run.get('embedding_key'),
+            "enrichment_model": run.get('enrichment_model'),
+            "tester_model": run.get('tester_model'),
+            "tester_temperature": run.get('tester_temperature'),
+            "difficulty_mode": run.get('difficulty_mode'),
+            "target_query_count": run.get('target_query_count'),
+            "completed_query_count": run.get('completed_query_count'),
+            "use_sample_groups": run.get('use_sample_groups'),
+            "use_dynamic_weights": run.get('use_dynamic_weights'),
+            "weights": {
+                "identity": run.get('mvs_weight_identity'),
+                "physical": run.get('mvs_weight_physical'),
+                "context": run.get('mvs_weight_context')
+            }
+        },
+        
+        # Metrics
+        "metrics": {
+            "accuracy_at_1": metrics['accuracy_at_1'],
+            "accuracy_at_5": metrics['accuracy_at_5'],
+            "accuracy_at_10": metrics['accuracy_at_10'],
+            "mean_reciprocal_rank": metrics['mean_reciprocal_rank'],
+            "average_rank": metrics['average_rank'],
+            "total_queries": metrics['total_queries'],
+            "successful_queries": metrics['successful_queries'],
+            "success_rate": metrics['successful_queries'] / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
+        },
+        
+        # Cost
+        "cost": {
+            "search_tokens": search_tokens,
+            "tester_tokens": tester_tokens,
+            "total_tokens": total_tokens,
+            "total_cost_usd": cost,
+            "cost_per_query": cost / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
+        },
+        
+        # All results
+        "results": []
+    }
+
+
+def _indent(text, prefix):
+    return text.replace('\n', '\n' + prefix)
+
+
+class StreamedExport:
+    """Writes the pretty and compact exports one run at a time
+
+    Output is byte-identical to json.dump of the whole structure (indent=2
+    and default separators respectively), so a budgeted export can be
+    diffed against a regular one.
+    """
+
+    def __init__(self, pretty, compact, metadata):
+        self.pretty = pretty
+        self.compact = compact
+        self.runs = 0
+        self.pretty.write('{\n  "metadata": ' + _indent(json.dumps(metadata, indent=2, ensure_ascii=False), '  ') +
+                          ',\n  "test_runs": [')
+        self.compact.write('{"metadata": ' + json.dumps(metadata, ensure_ascii=False) + ', "test_runs": [')
+
+    def write_run(self, run_data, results):
+        """run_data["results"] must be empty; results is re-iterable (a Spill)"""
+        pretty = json.dumps(run_data, indent=2, ensure_ascii=False)
+        compact = json.dumps(run_data, ensure_ascii=False)
+        # "results" is the last key, so its empty list closes the record
+        pretty_head, pretty_tail = pretty[:-len('[]\n}')], pretty[-len('\n}'):]
+        compact_head, compact_tail = compact[:-len('[]}')], compact[-len('}'):]
+
+        separator = ',' if self.runs else ''
+        self.pretty.write(separator + '\n    ' + _indent(pretty_head, '    ') + '[')
+        self.compact.write((', ' if self.runs else '') + compact_head + '[')
+        count = 0
+        for result in results:
+            self.pretty.write((',' if count else '') + '\n        ' +
+                              _indent(json.dumps(result, indent=2, ensure_ascii=False), '        '))
+            self.compact.write((', ' if count else '') + json.dumps(result, ensure_ascii=False))
+            count += 1
+        self.pretty.write(('\n      ]' if count else ']') + _indent(pretty_tail, '    '))
+        self.compact.write(']' + compact_tail)
+        self.runs += 1
+
+    def close(self):
+        self.pretty.write('\n  ]\n}' if self.runs else ']\n}')
+        self.compact.write(']}')
+
+
+def export_budgeted(pb, runs, metadata, budget, output_file, compact_file):
+    """One run in memory at a time: results stream through the metrics
+    into a spill file, then from the spill into both outputs"""
+    total_results = 0
+    with open(output_file, 'w', encoding='utf-8') as pretty, open(compact_file, 'w', encoding='utf-8') as compact:
+        export = StreamedExport(pretty, compact, metadata)
+        for i, run in enumerate(runs, 1):
+            print(f"Processing {i}/{len(runs)}: {run['name']}")
+            stats = StreamingMetrics()
+            with Spill() as spill:
+                for result in budget.iter_results(pb, run['id']):
+                    stats.add(result)
+                    spill.append(result_data(result))
+                with span('render.json', key='streamed'):
+                    export.write_run(build_run_data(run, stats.metrics()), spill)
+                total_results += spill.count
+        export.close()
+    return len(runs), total_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export all test data to JSON')
+    parser.add_argument('--memory-budget', type=int, metavar='MIB',
+                        help='Stream runs one at a time with result pages sized to this budget')
+    return parser.parse_args()
+
 
 def export_to_json():
     """Export all test data to JSON"""
     
+    args = parse_args()
     print("📦 Exporting all test data to JSON...\n")
     
     pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
@@ -31,113 +193,49 @@ def export_to_json():
     runs = pb.get_test_runs(limit=100)
     print(f"✅ Found {len(runs)} test runs\n")
     
-    # Build complete data structure
-    export_data = {
-        "metadata": {
-            "exported_at": __import__('datetime').datetime.now().isoformat(),
-            "total_runs": len(runs),
-            "pocketbase_url": POCKETBASE_URL
-        },
-        "test_runs": []
+    metadata = {
+        "exported_at": __import__('datetime').datetime.now().isoformat(),
+        "total_runs": len(runs),
+        "pocketbase_url": POCKETBASE_URL
     }
-    
-    for i, run in enumerate(runs, 1):
-        print(f"Processing {i}/{len(runs)}: {run['name']}")
-        
-        # Get results for this run
-        results = pb.get_test_results(run['id'])
-        
-        # Calculate metrics
-        metrics = calculate_metrics(results)
-        
-        # Calculate cost
-        search_tokens = run.get('total_search_tokens', 0)
-        tester_tokens = run.get('total_tester_tokens', 0)
-        total_tokens = search_tokens + tester_tokens
-        cost = (search_tokens / 1_000_000) * 0.02 + (tester_tokens / 1_000_000) * 0.15
+    output_file = 'test_data_export.json'
+    compact_file = 'test_data_export_compact.json'
+    budget = None
+
+    if args.memory_budget:
+        budget = MemoryBudget(args.memory_budget)
+        print(f"🧮 Memory budget: {args.memory_budget} MiB (streaming runs one at a time)\n")
+        total_runs, total_results = export_budgeted(pb, runs, metadata, budget, output_file, compact_file)
+    else:
+        # Build complete data structure
+        export_data = {
+            "metadata": metadata,
+            "test_runs": []
+        }
         
-        # Build run data
-        run_data = {
-            # Basic info
-            "id": run['id'],
-            "name": run['name'],
-            "status": run.get('status'),
-            "created": run.get('created'),
-            "updated": run.get('updated'),
+        for i, run in enumerate(runs, 1):
+            print(f"Processing {i}/{len(runs)}: {run['name']}")
             
-            # Configuration
-            "config": {
-                "embedding_model": run.get('embedding_model'),
-                "embedding_key": run.get('embedding_key'),
-                "enrichment_model": run.get('enrichment_model'),
-                "tester_model": run.get('tester_model'),
-                "tester_temperature": run.get('tester_temperature'),
-                "difficulty_mode": run.get('difficulty_mode'),
-                "target_query_count": run.get('target_query_count'),
-                "completed_query_count": run.get('completed_query_count'),
-                "use_sample_groups": run.get('use_sample_groups'),
-                "use_dynamic_weights": run.get('use_dynamic_weights'),
-                "weights": {
-                    "identity": run.get('mvs_weight_identity'),
-                    "physical": run.get('mvs_weight_physical'),
-                    "context": run.get('mvs_weight_context')
-                }
-            },
+            # Get results for this run
+            results = pb.get_test_results(run['id'])
             
-            # Metrics
-            "metrics": {
-                "accuracy_at_1": metrics['accuracy_at_1'],
-                "accuracy_at_5": metrics['accuracy_at_5'],
-                "accuracy_at_10": metrics['accuracy_at_10'],
-                "mean_reciprocal_rank": metrics['mean_reciprocal_rank'],
-                "average_rank": metrics['average_rank'],
-                "total_queries": metrics['total_queries'],
-                "successful_queries": metrics['successful_queries'],
-                "success_rate": metrics['successful_queries'] / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
-            },
+            run_data = build_run_data(run, calculate_metrics(results))
             
-            # Cost
-            "cost": {
-                "search_tokens": search_tokens,
-                "tester_tokens": tester_tokens,
-                "total_tokens": total_tokens,
-                "total_cost_usd": cost,
-                "cost_per_query": cost / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
-            },
+            # Add all query results
+            run_data["results"] = [result_data(result) for result in results]
             
-            # All results
-            "results": []
-        }
+            export_data["test_runs"].append(run_data)
         
-        # Add all query results
-        for result in results:
-            result_data = {
-                "id": result.get('id'),
-                "query": result.get('generated_query'),
-                "source_group_id": result.get('source_group_id'),
-                "source_group_name": result.get('source_group_name'),
-                "correct_rank": result.get('correct_rank'),
-                "query_intent": result.get('query_intent'),
-                "search_tokens": result.get('search_tokens'),
-                "tester_tokens": result.get('tester_tokens'),
-                "similarity_margin": result.get('similarity_margin'),
-                "applied_weights": result.get('applied_weights'),
-                "top_results": result.get('top_results', [])[:10],  # Top 10 results
-                "created": result.get('created')
-            }
-            run_data["results"].append(result_data)
+        # Save to JSON
+        with open(output_file, 'w', encoding='utf-8') as f, span('render.json', key='pretty'):
+            json.dump(export_data, f, indent=2, ensure_ascii=False)
         
-        export_data["test_runs"].append(run_data)
-    
-    # Save to JSON
-    output_file = 'test_data_export.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
-    
-    # Also save compact version
-    compact_file = 'test_data_export_compact.json'
-    with open(compact_file, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, ensure_ascii=False)
+        # Also save compact version
+        with open(compact_file, 'w', encoding='utf-8') as f, span('render.json', key='compact'):
+            json.dump(export_data, f, ensure_ascii=False)
+
+        total_runs = len(export_data['test_runs'])
+        total_results = sum(len(run['results']) for run in export_data['test_runs'])
     
     print(f"\n✅ Export complete!")
     print(f"\n📄 Files created:")
@@ -145,8 +243,9 @@ def export_to_json():
     print(f"   - {compact_file} ({os.path.getsize(compact_file):,} bytes) - Compact")
     
     print(f"\n📊 Summary:")
-    print(f"   - Total runs: {len(export_data['test_runs'])}")
-    print(f"   - Total results: {sum(len(run['results']) for run in export_data['test_runs'])}")
+    print(f"   - Total runs: {total_runs}")
+    print(f"   - Total results: {total_results}")
+    print(f"\n{peak_rss_summary(budget)}")
     
     print(f"\n💡 You can now:")
     print(f"   1. Open in JSON viewer/editor")
@@ -13,23 +13,46 @@ Usage:
     
     # Or upload specific test
     python scripts/export_to_wandb.py --test-id abc123
+
+    # Parallel upload, re-uploading runs that are already in the manifest
+    python scripts/export_to_wandb.py --workers 8 --force
+
+    # No network: write runs locally, push them later
+    python scripts/export_to_wandb.py --offline
+    python scripts/export_to_wandb.py --sync
+
+Runs that were uploaded before (same id and `updated` stamp in the local
+manifest) are skipped, so routine syncs only touch new or changed runs.
 """
 
 import os
 import sys
 import json
+import math
+import argparse
 import requests
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from dotenv import load_dotenv
 import wandb
 
-# Load environment variables
+# Load environment variables (before the local imports: ai_insights reads
+# its AI_INSIGHTS_* settings at import time)
 load_dotenv('.env.local')
 
+sys.path.insert(0, os.path.dirname(__file__))
+from ai_insights import default_generator
+from resilience import RequestPolicy, print_endpoint_stats
+from tracing import span, traced
+
 POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
 POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
 POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
 WANDB_PROJECT = os.getenv('WANDB_PROJECT', 'rekwizytor-embedding-tests')
+UPLOAD_MANIFEST = os.getenv('WANDB_UPLOAD_MANIFEST', '.wandb_upload_manifest.json')
+WANDB_OFFLINE_DIR = os.getenv('WANDB_OFFLINE_DIR', 'wandb_offline')
+TABLE_CHUNK_SIZE = 1000
 
 # Model name mappings for human-readable config
 EMBEDDING_MODELS = {
@@ -59,6 +82,68 @@ TESTER_MODELS = {
     'unknown': 'Unknown Tester Model'
 }
 
+# USD per 1M tokens, keyed by the same codes as the maps above. Search tokens
+# are priced at the embedding model's rate, tester tokens at the tester's;
+# enrichment tokens are spent by regeneration jobs, not by test runs.
+# Override or extend with a JSON file of the same shape in PRICING_FILE.
+MODEL_PRICING = {
+    'embedding': {
+        'gem004': 0.025,
+        'oai3l': 0.13,
+        'oai3s': 0.02,
+        'voy3': 0.06,
+        'voy35': 0.06
+    },
+    'enrichment': {
+        'g25f': 0.30,
+        'g25fl': 0.10,
+        'g25p': 1.25,
+        'gpt5n': 0.05,
+        'gpt4m': 0.15,
+        'gpt4o': 2.50,
+        'none': 0.0,
+        '': 0.0
+    },
+    'tester': {
+        'gpt4o': 2.50,
+        'gpt4m': 0.15,
+        'g25f': 0.30
+    }
+}
+
+# Flat rates used before per-model pricing, still the fallback for unknown codes
+DEFAULT_PRICING = {'embedding': 0.02, 'enrichment': 0.15, 'tester': 0.15}
+
+
+def load_pricing(path=None):
+    """MODEL_PRICING merged with the optional PRICING_FILE overrides"""
+    pricing = {model_type: dict(prices) for model_type, prices in MODEL_PRICING.items()}
+    path = path or os.getenv('PRICING_FILE')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            overrides = json.load(f)
+        for model_type, prices in overrides.items():
+            if model_type not in pricing:
+                raise ValueError(f"Unknown model type '{model_type}' in {path} (expected {', '.join(pricing)})")
+            pricing[model_type].update(prices)
+    return pricing
+
+
+PRICING = load_pricing()
+
+
+def token_cost(tokens, code, model_type):
+    """Cost in USD of `tokens` tokens of the model `code`"""
+    price = PRICING.get(model_type, {}).get(code or 'unknown', DEFAULT_PRICING[model_type])
+    return (tokens or 0) / 1_000_000 * price
+
+
+def run_cost(run):
+    """Search + tester cost of a test run (or any record with the same fields)"""
+    return token_cost(run.get('total_search_tokens', 0), run.get('embedding_model'), 'embedding') + \
+           token_cost(run.get('total_tester_tokens', 0), run.get('tester_model'), 'tester')
+
+
 def get_readable_name(code, model_type):
     """Convert model code to human-readable name"""
     mappings = {
@@ -70,60 +155,170 @@ def get_readable_name(code, model_type):
 
 
 class PocketBaseClient:
-    """Simple PocketBase client for fetching test data"""
+    """Simple PocketBase client for fetching test data
+
+    Requests go through a resilience.RequestPolicy: transient failures are
+    retried with backoff, concurrency adapts to the server, and `stats`
+    holds per-endpoint latency and error counts.
+    """
     
-    def __init__(self, url, email, password):
+    def __init__(self, url, email, password, policy=None):
         self.url = url
         self.token = None
+        self.policy = policy or RequestPolicy()
         self._authenticate(email, password)
     
     def _authenticate(self, email, password):
         """Authenticate as admin"""
-        response = requests.post(
-            f'{self.url}/api/collections/_superusers/auth-with-password',
+        response = self._request(
+            'POST', '/api/collections/_superusers/auth-with-password',
             json={'identity': email, 'password': password}
         )
         response.raise_for_status()
-        self.token = response.json()['token']
+        self.token = self._json(response)['token']
     
     def _headers(self):
         return {'Authorization': f'Bearer {self.token}'}
+
+    def _request(self, method, path, **kwargs):
+        """Every API call goes through here (one span per request when tracing)"""
+        parts = path.split('/')
+        collection = parts[3] if len(parts) > 3 and parts[2] == 'collections' else path
+        key = f'{method} {collection}'
+        with span('pocketbase.request', key=key) as s:
+            response, retries = self.policy.execute(key, method, lambda timeout: requests.request(
+                method, f'{self.url}{path}', headers=self._headers(), timeout=timeout, **kwargs
+            ))
+            s.set(status=response.status_code, bytes=len(response.content), retries=retries)
+        return response
+
+    @property
+    def stats(self):
+        return self.policy.stats
+
+    def _json(self, response):
+        with span('pocketbase.json'):
+            return response.json()
     
     def get_test_runs(self, limit=100):
         """Fetch test runs"""
-        response = requests.get(
-            f'{self.url}/api/collections/embedding_test_runs/records',
-            params={'perPage': limit},  # Removed sort due to PocketBase API issue
-            headers=self._headers()
+        response = self._request(
+            'GET', '/api/collections/embedding_test_runs/records',
+            params={'perPage': limit}  # Removed sort due to PocketBase API issue
         )
         response.raise_for_status()
-        return response.json()['items']
+        return self._json(response)['items']
     
     def get_test_results(self, run_id):
         """Fetch results for a specific run"""
-        response = requests.get(
-            f'{self.url}/api/collections/embedding_test_results/records',
-            params={'filter': f'run_id="{run_id}"', 'perPage': 1000},
-            headers=self._headers()
+        response = self._request(
+            'GET', '/api/collections/embedding_test_results/records',
+            params={'filter': f'run_id="{run_id}"', 'perPage': 1000}
         )
         response.raise_for_status()
-        return response.json()['items']
+        return self._json(response)['items']
+
+    def get_page(self, collection, page=1, per_page=500, filter=None, fields=None, sort=None, total=False):
+        """One list page ({'items': [...], 'totalItems': n, ...}); totalItems
+        is only counted when `total` is set, it costs PocketBase a COUNT query"""
+        params = {'page': page, 'perPage': per_page}
+        if not total:
+            params['skipTotal'] = 1
+        if filter:
+            params['filter'] = filter
+        if fields:
+            params['fields'] = fields
+        if sort:
+            params['sort'] = sort
+        response = self._request('GET', f'/api/collections/{collection}/records', params=params)
+        response.raise_for_status()
+        return self._json(response)
 
+    def iter_records(self, collection, filter=None, fields=None, per_page=500):
+        """Iterate over every record of a collection, page by page"""
+        page = 1
+        while True:
+            items = self.get_page(collection, page, per_page, filter=filter, fields=fields)['items']
+            yield from items
+            if len(items) < per_page:
+                break
+            page += 1
 
-def generate_ai_insights(run_data, metrics, total_cost):
-    """Generate AI insights using OpenAI"""
-    if not os.getenv('OPENAI_API_KEY'):
-        return None
+    def fetch_all(self, collection, filter=None, fields=None, per_page=500, sort=None):
+        """Every matching record as a list; pages after the first are fetched
+        concurrently, as many at a time as the adaptive limit allows"""
+        first = self.get_page(collection, 1, per_page, filter=filter, fields=fields, sort=sort, total=True)
+        items = list(first['items'])
+        pages = -(-first['totalItems'] // per_page)
+        if pages > 1:
+            fetch = lambda page: self.get_page(collection, page, per_page, filter=filter, fields=fields, sort=sort)['items']
+            with ThreadPoolExecutor(max_workers=self.policy.limiter.maximum) as executor:
+                for page_items in executor.map(fetch, range(2, pages + 1)):
+                    items.extend(page_items)
+        return items
+
+    def get_record(self, collection, record_id):
+        """Fetch a single record"""
+        response = self._request('GET', f'/api/collections/{collection}/records/{record_id}')
+        response.raise_for_status()
+        return self._json(response)
+
+    def create_record(self, collection, data):
+        """Create a single record (a unique-index conflict raises HTTPError 400)"""
+        response = self._request('POST', f'/api/collections/{collection}/records', json=data)
+        response.raise_for_status()
+        return self._json(response)
+
+    def delete_record(self, collection, record_id):
+        """Delete a record; False if it was already gone"""
+        response = self._request('DELETE', f'/api/collections/{collection}/records/{record_id}')
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def update_record(self, collection, record_id, data):
+        """Patch fields of a single record"""
+        response = self._request('PATCH', f'/api/collections/{collection}/records/{record_id}', json=data)
+        response.raise_for_status()
+        return self._json(response)
+
+    def batch_update(self, collection, updates):
+        """Patch many records in one transactional /api/batch request
+
+        `updates` is a list of (record_id, data). Falls back to one PATCH per
+        record when the server has batch requests disabled.
+        """
+        response = self._request('POST', '/api/batch', json={'requests': [
+            {'method': 'PATCH', 'url': f'/api/collections/{collection}/records/{record_id}', 'body': data}
+            for record_id, data in updates
+        ]})
+        if response.status_code in (403, 404):
+            return [self.update_record(collection, record_id, data) for record_id, data in updates]
+        response.raise_for_status()
+        return [item.get('body') for item in self._json(response)]
+
+    def batch_create(self, collection, records):
+        """Create many records in one transactional /api/batch request,
+        falling back to one POST per record like batch_update"""
+        response = self._request('POST', '/api/batch', json={'requests': [
+            {'method': 'POST', 'url': f'/api/collections/{collection}/records', 'body': data}
+            for data in records
+        ]})
+        if response.status_code in (403, 404):
+            return [self.create_record(collection, data) for data in records]
+        response.raise_for_status()
+        return [item.get('body') for item in self._json(response)]
+
+
+def build_insights_prompt(run_data, metrics, total_cost):
+    """Prompt for the AI insights; it holds every input the answer depends on"""
+    # Get human-readable names
+    embedding = get_readable_name(run_data.get('embedding_model', 'unknown'), 'embedding')
+    enrichment = get_readable_name(run_data.get('enrichment_model', 'none'), 'enrichment')
+    tester = get_readable_name(run_data.get('tester_model', 'unknown'), 'tester')
     
-    try:
-        from openai import OpenAI
-        
-        # Get human-readable names
-        embedding = get_readable_name(run_data.get('embedding_model', 'unknown'), 'embedding')
-        enrichment = get_readable_name(run_data.get('enrichment_model', 'none'), 'enrichment')
-        tester = get_readable_name(run_data.get('tester_model', 'unknown'), 'tester')
-        
-        prompt = f"""Analyze this embedding test result concisely (max 150 words):
+    return f"""Analyze this embedding test result concisely (max 150 words):
 
 Configuration:
 - Embedding Model: {embedding}
@@ -145,21 +340,29 @@ Provide:
 3. One-line recommendation
 
 Be direct and actionable."""
-        
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=200
-        )
-        
-        return response.choices[0].message.content.strip()
-    
+
+
+def submit_ai_insights(run_data, metrics, total_cost, generator=None):
+    """Start insight generation; returns a future, or None without a backend"""
+    if not metrics['total_queries']:
+        return None
+    generator = generator or default_generator()
+    if generator is None:
+        return None
+    return generator.submit(build_insights_prompt(run_data, metrics, total_cost))
+
+
+def generate_ai_insights(run_data, metrics, total_cost, generator=None):
+    """Generate AI insights (cached on disk, see ai_insights.py)"""
+    try:
+        future = submit_ai_insights(run_data, metrics, total_cost, generator)
+        return future.result() if future else None
     except Exception as e:
         print(f'      ⚠️  AI analysis failed: {e}')
         return None
 
+
+@traced('metrics.calculate')
 def calculate_metrics(results):
     """Calculate test metrics from results"""
     if not results:
@@ -181,7 +384,8 @@ def calculate_metrics(results):
     acc_at_5 = sum(1 for r in valid_results if r['correct_rank'] <= 5) / total
     acc_at_10 = sum(1 for r in valid_results if r['correct_rank'] <= 10) / total
     
-    mrr = sum(1 / r['correct_rank'] for r in valid_results) / total
+    # Exactly rounded, so StreamingMetrics gives the same value on every Python
+    mrr = math.fsum(1 / r['correct_rank'] for r in valid_results) / total
     avg_rank = sum(r['correct_rank'] for r in valid_results) / successful if successful > 0 else 0
     
     return {
@@ -195,17 +399,31 @@ def calculate_metrics(results):
     }
 
 
-def upload_to_wandb(run_data, results):
-    """Upload test run to W&B"""
+def histogram_bins(values, bins=64, discrete=False):
+    """(counts, edges) of equal-width bins, last bin closed like numpy's,
+    for wandb.Histogram(np_histogram=...) without numpy installed.
+    discrete: edges at half-integers, so each integer gets its own bin
+    when `bins` covers the range"""
+    low, high = min(values), max(values)
+    if discrete or low == high:
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    counts = [0] * bins
+    for value in values:
+        counts[min(int((value - low) / width), bins - 1)] += 1
+    return counts, [low + i * width for i in range(bins)] + [high]
+
+
+@traced('wandb.upload')
+def upload_to_wandb(run_data, results, offline=False, chunk_size=TABLE_CHUNK_SIZE):
+    """Upload test run to W&B (or write it to WANDB_OFFLINE_DIR for a later sync)"""
     
     # Calculate metrics
     metrics = calculate_metrics(results)
     
     # Calculate cost
     total_tokens = run_data.get('total_search_tokens', 0) + run_data.get('total_tester_tokens', 0)
-    search_cost = (run_data.get('total_search_tokens', 0) / 1_000_000) * 0.02
-    tester_cost = (run_data.get('total_tester_tokens', 0) / 1_000_000) * 0.15
-    total_cost = search_cost + tester_cost
+    total_cost = run_cost(run_data)
     
     # Get human-readable names
     embedding_code = run_data.get('embedding_model') or 'unknown'
@@ -216,39 +434,57 @@ def upload_to_wandb(run_data, results):
     enrichment_name = get_readable_name(enrichment_code, 'enrichment')
     tester_name = get_readable_name(tester_code, 'tester')
     
+    # Start AI insights now (needs network, so not in offline mode); the
+    # request runs in the background while the tables are logged
+    insights_future = None
+    if not offline:
+        print('      🤖 Generating AI insights...')
+        try:
+            insights_future = submit_ai_insights(run_data, metrics, total_cost)
+        except Exception as e:
+            print(f'      ⚠️  AI analysis failed: {e}')
+    else:
+        os.makedirs(WANDB_OFFLINE_DIR, exist_ok=True)
+
     # Initialize W&B run
-    run = wandb.init(
-        project=WANDB_PROJECT,
-        name=run_data['name'],
-        id=run_data['id'],
-        config={
-            # Codes (for filtering/grouping)
-            'embedding_model_code': embedding_code,
-            'enrichment_model_code': enrichment_code,
-            'tester_model_code': tester_code,
-            
-            # Human-readable names
-            'embedding_model': embedding_name,
-            'enrichment_model': enrichment_name,
-            'tester_model': tester_name,
-            
-            # Other config
-            'target_query_count': run_data.get('target_query_count', 0),
-            'difficulty_mode': run_data.get('difficulty_mode') or 'medium',
-            'mvs_weight_identity': run_data.get('mvs_weight_identity', 0),
-            'mvs_weight_physical': run_data.get('mvs_weight_physical', 0),
-            'mvs_weight_context': run_data.get('mvs_weight_context', 0),
-            'use_dynamic_weights': run_data.get('use_dynamic_weights', False)
-        },
-        tags=[
-            tag for tag in [
-                embedding_code,
-                enrichment_code,
-                run_data.get('difficulty_mode') or 'medium',
-                run_data.get('status') or 'completed'
-            ] if tag  # Filter out any None/empty values
-        ]
-    )
+    with span('wandb.init'):
+        run = wandb.init(
+            project=WANDB_PROJECT,
+            name=run_data['name'],
+            id=run_data['id'],
+            # An interrupted upload continues the same W&B run (online only:
+            # offline runs are resumed by `wandb sync`)
+            resume=None if offline else 'allow',
+            mode='offline' if offline else 'online',
+            dir=WANDB_OFFLINE_DIR if offline else None,
+            config={
+                # Codes (for filtering/grouping)
+                'embedding_model_code': embedding_code,
+                'enrichment_model_code': enrichment_code,
+                'tester_model_code': tester_code,
+                
+                # Human-readable names
+                'embedding_model': embedding_name,
+                'enrichment_model': enrichment_name,
+                'tester_model': tester_name,
+                
+                # Other config
+                'target_query_count': run_data.get('target_query_count', 0),
+                'difficulty_mode': run_data.get('difficulty_mode') or 'medium',
+                'mvs_weight_identity': run_data.get('mvs_weight_identity', 0),
+                'mvs_weight_physical': run_data.get('mvs_weight_physical', 0),
+                'mvs_weight_context': run_data.get('mvs_weight_context', 0),
+                'use_dynamic_weights': run_data.get('use_dynamic_weights', False)
+            },
+            tags=[
+                tag for tag in [
+                    embedding_code,
+                    enrichment_code,
+                    run_data.get('difficulty_mode') or 'medium',
+                    run_data.get('status') or 'completed'
+                ] if tag  # Filter out any None/empty values
+            ]
+        )
     
     # Log final summary
     wandb.summary.update({
@@ -274,27 +510,51 @@ def upload_to_wandb(run_data, results):
         'cost_per_query': total_cost / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
     })
     
-    # Create results table
-    if results:
+    # Per-query distributions
+    ranks = [r.get('correct_rank') or 0 for r in results]
+    similarities = [
+        r['top_results'][0].get('similarity', 0)
+        for r in results if r.get('top_results')
+    ]
+    histograms = {}
+    if ranks:
+        bins = min(64, max(ranks) - min(ranks) + 1)
+        histograms['correct_rank_hist'] = wandb.Histogram(np_histogram=histogram_bins(ranks, bins, discrete=True))
+    if similarities:
+        histograms['top1_similarity_hist'] = wandb.Histogram(np_histogram=histogram_bins(similarities))
+    if histograms:
+        wandb.log(histograms)
+
+    # Full results table, logged in chunks to keep each table small
+    for part, start in enumerate(range(0, len(results), chunk_size), 1):
         table_data = []
-        for r in results[:100]:  # Limit to first 100 for performance
+        for r in results[start:start + chunk_size]:
+            top = (r.get('top_results') or [{}])[0]
             table_data.append([
-                r.get('query_text', ''),
+                r.get('generated_query') or r.get('query_text', ''),
                 r.get('source_group_name', ''),
                 r.get('correct_rank', 0),
-                r.get('top_results', [{}])[0].get('name', '') if r.get('top_results') else '',
-                r.get('top_results', [{}])[0].get('similarity', 0) if r.get('top_results') else 0
+                r.get('query_intent', ''),
+                top.get('name', ''),
+                top.get('similarity', 0),
+                r.get('similarity_margin', 0)
             ])
         
         table = wandb.Table(
-            columns=['query', 'source_group', 'rank', 'top_result', 'similarity'],
+            columns=['query', 'source_group', 'rank', 'intent', 'top_result', 'similarity', 'margin'],
             data=table_data
         )
-        wandb.log({'query_results': table})
+        with span('wandb.log_table', rows=len(table_data)):
+            wandb.log({f'query_results_{part:03d}': table})
     
-    # Generate AI insights
-    print('      🤖 Generating AI insights...')
-    insights = generate_ai_insights(run_data, metrics, total_cost)
+    # Collect AI insights
+    insights = None
+    if insights_future is not None:
+        try:
+            with span('ai.insights.wait'):
+                insights = insights_future.result()
+        except Exception as e:
+            print(f'      ⚠️  AI analysis failed: {e}')
     
     if insights:
         # Add to summary
@@ -320,9 +580,10 @@ def upload_to_wandb(run_data, results):
             print(f'      ⚠️  Failed to save artifact: {e}')
     
     # Finish run
-    wandb.finish()
+    with span('wandb.finish'):
+        wandb.finish()
     
-    print(f"✅ Uploaded: {run_data['name']}")
+    print(f"✅ {'Saved offline' if offline else 'Uploaded'}: {run_data['name']}")
     print(f"   📊 {embedding_name}")
     print(f"   🔧 Enrichment: {enrichment_name}")
     print(f"   Accuracy@1: {metrics['accuracy_at_1']*100:.1f}%")
@@ -334,8 +595,73 @@ def upload_to_wandb(run_data, results):
         print(f"   💡 {first_line}...")
 
 
+def load_manifest(path=UPLOAD_MANIFEST):
+    """{run_id: {'updated': ..., 'uploaded_at': ...}} of runs already in W&B"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=UPLOAD_MANIFEST):
+    """Write atomically so an interrupted sync never leaves a broken manifest"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+_worker_pb = None
+
+
+def _upload_worker(run, offline=False, chunk_size=TABLE_CHUNK_SIZE):
+    """Upload one run from a worker process (one PocketBase login per process);
+    returns the process's cumulative request stats"""
+    global _worker_pb
+    if _worker_pb is None:
+        _worker_pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    results = _worker_pb.fetch_all('embedding_test_results', filter=f'run_id="{run["id"]}"')
+    upload_to_wandb(run, results, offline=offline, chunk_size=chunk_size)
+    return os.getpid(), _worker_pb.stats.snapshot()
+
+
+def sync_offline_runs(batch_size=20):
+    """Push offline runs from WANDB_OFFLINE_DIR to W&B in batches of `wandb sync`"""
+    import glob
+    import subprocess
+
+    run_dirs = sorted(glob.glob(os.path.join(WANDB_OFFLINE_DIR, 'wandb', 'offline-run-*')))
+    # `wandb sync` leaves a *.wandb.synced marker next to each synced run file
+    pending = [d for d in run_dirs if not glob.glob(os.path.join(d, '*.wandb.synced'))]
+    print(f"📤 {len(pending)} offline run(s) to sync ({len(run_dirs) - len(pending)} already synced)\n")
+
+    failed = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        print(f"   Syncing {start + 1}-{start + len(batch)} of {len(pending)}...")
+        completed = subprocess.run(['wandb', 'sync', *batch])
+        if completed.returncode != 0:
+            failed += len(batch)
+            print(f"   ❌ wandb sync exited with {completed.returncode}")
+    return failed
+
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Export embedding tests from PocketBase to W&B')
+    parser.add_argument('--test-id', help='Upload only this test run')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel upload processes')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and upload everything')
+    parser.add_argument('--offline', action='store_true', help=f'Write runs to {WANDB_OFFLINE_DIR} without network')
+    parser.add_argument('--sync', action='store_true', help='Push previously written offline runs and exit')
+    parser.add_argument('--chunk-size', type=int, default=TABLE_CHUNK_SIZE, help='Rows per logged results table')
+    args = parser.parse_args()
+
+    if args.sync:
+        failed = sync_offline_runs()
+        print(f"\n{'⚠️  Some runs failed to sync' if failed else '🎉 Offline runs synced'}")
+        return
+
     print("🚀 Exporting tests from PocketBase to W&B...\n")
     
     # Check env vars
@@ -350,30 +676,61 @@ def main():
     
     # Fetch test runs
     print("📊 Fetching test runs...")
-    runs = pb.get_test_runs()
+    if args.test_id:
+        runs = [pb.get_record('embedding_test_runs', args.test_id)]
+    else:
+        runs = list(pb.iter_records('embedding_test_runs'))
     print(f"✅ Found {len(runs)} tests\n")
     
-    # Upload each run to W&B
-    for i, run in enumerate(runs, 1):
-        print(f"[{i}/{len(runs)}] Processing: {run['name']}")
-        
+    manifest = {} if args.force else load_manifest()
+    pending = []
+    for run in runs:
         # Skip if not completed
         if run.get('status') != 'completed':
-            print(f"   ⏭️  Skipped (status: {run.get('status')})\n")
+            print(f"   ⏭️  {run['name']}: skipped (status: {run.get('status')})")
             continue
-        
-        # Fetch results
-        results = pb.get_test_results(run['id'])
-        
-        # Upload to W&B
-        try:
-            upload_to_wandb(run, results)
-        except Exception as e:
-            print(f"   ❌ Failed: {e}")
-        
-        print()
+        # Skip if this exact version is already uploaded
+        if manifest.get(run['id'], {}).get('updated') == run.get('updated'):
+            print(f"   ✔️  {run['name']}: unchanged since last upload")
+            continue
+        pending.append(run)
+
+    print(f"\n📤 Uploading {len(pending)} run(s) with {args.workers} worker(s)...\n")
+    manifest = load_manifest()
+    failed = 0
+    worker_stats = {}
+
+    # wandb does not survive fork well, so workers are spawned fresh
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context) as executor:
+        futures = {
+            executor.submit(_upload_worker, run, args.offline, args.chunk_size): run
+            for run in pending
+        }
+        for future in as_completed(futures):
+            run = futures[future]
+            try:
+                pid, stats = future.result()
+                worker_stats[pid] = stats
+            except Exception as e:
+                failed += 1
+                print(f"   ❌ Failed: {run['name']}: {e}")
+                continue
+            manifest[run['id']] = {
+                'name': run['name'],
+                'updated': run.get('updated'),
+                'uploaded_at': datetime.now().isoformat(),
+                'offline': args.offline
+            }
+            save_manifest(manifest)
     
-    print(f"\n🎉 Done! View at: https://wandb.ai/{WANDB_PROJECT}")
+    print_endpoint_stats([pb.stats.snapshot(), *worker_stats.values()])
+    if failed:
+        print(f"\n⚠️  {failed} run(s) failed, re-run to retry them")
+    if args.offline:
+        print(f"\n💾 Runs saved to {WANDB_OFFLINE_DIR}. Push them later with: python3 scripts/export_to_wandb.py --sync")
+    else:
+        print(f"\n🎉 Done! View at: https://wandb.ai/{WANDB_PROJECT}")
 
 
 if __name__ == '__main__':
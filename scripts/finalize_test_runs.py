@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Write computed metrics, cost and health back onto finished test runs
+
+For every completed run, streams its results once, computes the
+calculate_metrics numbers, the cost and a few health checks, and stores
+them in the `metrics_summary` JSON field of `embedding_test_runs`.
+Reports and dashboards can then read one small record per run instead of
+downloading thousands of results.
+
+Updates are sent in batches (PocketBase /api/batch, or one PATCH per run
+when batching is disabled). Writes are idempotent: a run is skipped when
+its summary has the current METRICS_VERSION and was computed from the
+same number of stored results and token totals. Bump METRICS_VERSION
+whenever a metric definition changes and the next run recomputes
+everything.
+
+The field is declared in scripts/create-pocketbase-tables.ts; this script
+does not change the schema and stops if the field is missing.
+
+Usage:
+    python3 scripts/finalize_test_runs.py
+    python3 scripts/finalize_test_runs.py --run-id abc123 --force
+    python3 scripts/finalize_test_runs.py --dry-run
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient, run_cost
+from watch_test_run import StreamingMetrics
+from sample_metrics import count_results
+
+COLLECTION = 'embedding_test_runs'
+SUMMARY_FIELD = 'metrics_summary'
+METRICS_VERSION = 2  # 2: per-model pricing
+RESULT_FIELDS = 'correct_rank,search_tokens,tester_tokens,source_group_id,generated_query'
+
+# Health thresholds
+MIN_COMPLETENESS = 0.9       # results / target_query_count
+MIN_UNIQUE_GROUPS = 10       # fewer source groups makes accuracy meaningless
+MAX_DUPLICATE_RATIO = 0.2    # share of repeated queries
+MAX_FAILED_RATIO = 0.5       # share of queries where the source group was not found
+
+
+def source_fingerprint(run, result_count):
+    """What the summary was computed from; a change means it is out of date"""
+    return {
+        'result_count': result_count,
+        'total_search_tokens': run.get('total_search_tokens') or 0,
+        'total_tester_tokens': run.get('total_tester_tokens') or 0
+    }
+
+
+def is_current(run, result_count=None):
+    """Summary matches METRICS_VERSION and `result_count`, the run's stored
+    results (count_results). Readers without a count compare against the
+    run's completed_query_count, which the test writer keeps in step"""
+    if result_count is None:
+        result_count = run.get('completed_query_count') or 0
+    summary = run.get(SUMMARY_FIELD) or {}
+    return summary.get('version') == METRICS_VERSION and \
+        summary.get('source') == source_fingerprint(run, result_count)
+
+
+def stored_metrics(run, result_count=None):
+    """calculate_metrics-shaped dict from the run record, None if missing or stale"""
+    if not is_current(run, result_count):
+        return None
+    return run[SUMMARY_FIELD]['metrics']
+
+
+def run_health(run, stats, groups, queries):
+    target = run.get('target_query_count') or 0
+    completeness = stats.n / target if target else 1.0
+    duplicate_ratio = 1 - len(queries) / stats.n if stats.n else 0.0
+    failed_ratio = 1 - stats.successful / stats.n if stats.n else 0.0
+
+    flags = []
+    if not stats.n:
+        flags.append('no_results')
+    if completeness < MIN_COMPLETENESS:
+        flags.append('incomplete')
+    if stats.n and len(groups) < MIN_UNIQUE_GROUPS:
+        flags.append('few_groups')
+    if duplicate_ratio > MAX_DUPLICATE_RATIO:
+        flags.append('duplicate_queries')
+    if failed_ratio > MAX_FAILED_RATIO:
+        flags.append('mostly_failed')
+
+    return {
+        'status': 'ok' if not flags else 'warn',
+        'flags': flags,
+        'completeness': completeness,
+        'unique_groups': len(groups),
+        'unique_queries': len(queries),
+        'duplicate_ratio': duplicate_ratio,
+        'failed_ratio': failed_ratio
+    }
+
+
+def compute_summary(pb, run):
+    """Stream the run's results once into metrics, cost and health"""
+    stats = StreamingMetrics(run.get('target_query_count') or 0)
+    groups = set()
+    queries = set()
+    for result in pb.iter_records('embedding_test_results', filter=f'run_id="{run["id"]}"', fields=RESULT_FIELDS):
+        stats.add(result)
+        groups.add(result.get('source_group_id'))
+        queries.add((result.get('generated_query') or '').strip().lower())
+
+    search_tokens = run.get('total_search_tokens') or 0
+    tester_tokens = run.get('total_tester_tokens') or 0
+    cost = run_cost(run)
+
+    return {
+        'version': METRICS_VERSION,
+        'computed_at': time.strftime('%Y-%m-%d %H:%M:%SZ', time.gmtime()),
+        'source': source_fingerprint(run, stats.n),
+        'metrics': stats.metrics(),
+        'cost': {
+            'total_usd': cost,
+            'per_query_usd': cost / stats.n if stats.n else 0,
+            'total_tokens': search_tokens + tester_tokens,
+            'tokens_per_query': (search_tokens + tester_tokens) / stats.n if stats.n else 0
+        },
+        'health': run_health(run, stats, groups, queries)
+    }
+
+
+def has_summary_field(pb):
+    """Whether the collection schema declares the JSON summary field"""
+    response = pb._request('GET', f'/api/collections/{COLLECTION}')
+    response.raise_for_status()
+    return any(f.get('name') == SUMMARY_FIELD for f in response.json().get('fields', []))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write metrics, cost and health back onto test runs')
+    parser.add_argument('--run-id', help='Only finalize this run')
+    parser.add_argument('--force', action='store_true', help='Recompute even if the stored summary is current')
+    parser.add_argument('--batch-size', type=int, default=50, help='Runs per batched update')
+    parser.add_argument('--dry-run', action='store_true', help='Compute and print, write nothing')
+    args = parser.parse_args()
+
+    print("🧮 Finalizing test runs...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    if not args.dry_run and not has_summary_field(pb):
+        print(f"❌ {COLLECTION} has no '{SUMMARY_FIELD}' field; add it (json) as in "
+              f"scripts/create-pocketbase-tables.ts")
+        return
+
+    if args.run_id:
+        runs = [pb.get_record(COLLECTION, args.run_id)]
+    else:
+        runs = list(pb.iter_records(COLLECTION, filter='status="completed"'))
+
+    pending = [r for r in runs if args.force or not is_current(r, count_results(pb, r['id']))]
+    print(f"✅ {len(runs)} completed runs, {len(runs) - len(pending)} already current (v{METRICS_VERSION})\n")
+
+    batch = []
+    written = 0
+    for i, run in enumerate(pending, 1):
+        summary = compute_summary(pb, run)
+        m = summary['metrics']
+        health = summary['health']
+        print(f"   {i}/{len(pending)} {run['name'][:40]:<40} Acc@1 {m['accuracy_at_1']*100:5.1f}%  "
+              f"MRR {m['mean_reciprocal_rank']:.3f}  ${summary['cost']['total_usd']:.4f}  "
+              f"{'✅' if health['status'] == 'ok' else '⚠️  ' + ', '.join(health['flags'])}")
+
+        batch.append((run['id'], {SUMMARY_FIELD: summary}))
+        if len(batch) >= args.batch_size or i == len(pending):
+            if not args.dry_run:
+                pb.batch_update(COLLECTION, batch)
+                written += len(batch)
+            batch = []
+
+    print(f"\n💾 {'Dry run, nothing written' if args.dry_run else f'{written} run summaries written'}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
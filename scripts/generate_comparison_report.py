@@ -4,10 +4,18 @@ Generate a comparison report from PocketBase test results
 
 Usage:
     python3 scripts/generate_comparison_report.py
+    python3 scripts/generate_comparison_report.py --shard-dir comparison_report_runs   # one file per test + index
+    python3 scripts/generate_comparison_report.py --rebuild                             # ignore the report cache
+
+Tests whose `updated` stamp is unchanged since the last report are taken
+from the report cache (.report_cache/); only new or changed ones are
+fetched from PocketBase.
 """
 
 import os
 import sys
+import argparse
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment
@@ -23,12 +31,25 @@ from export_to_wandb import (
     PocketBaseClient, 
     calculate_metrics,
     get_readable_name,
+    run_cost,
     EMBEDDING_MODELS,
     ENRICHMENT_MODELS
 )
+from report_writer import ReportWriter, ReportCache, table_lines
+from finalize_test_runs import stored_metrics
+from tracing import traced
+
+OUTPUT_FILE = 'comparison_report.md'
+SECTION_VERSION = 2  # bump when render_breakdown changes, invalidates the report cache
+
 
 def generate_report():
     """Generate markdown comparison report"""
+    parser = argparse.ArgumentParser(description='Comparison report of completed embedding tests')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--shard-dir', help='Write each test breakdown to its own file here; the report links to them')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the report cache and re-fetch every test')
+    args = parser.parse_args()
     
     print("📊 Generating Comparison Report...\n")
     
@@ -41,132 +62,159 @@ def generate_report():
     
     print(f"✅ Found {len(completed_runs)} completed tests\n")
     
-    # Calculate metrics for each
+    # Calculate metrics for each; unchanged tests come from the report cache
+    cache = ReportCache('comparison_report', version=SECTION_VERSION)
     test_data = []
+    fetched = 0
     for run in completed_runs:
-        results = pb.get_test_results(run['id'])
-        metrics = calculate_metrics(results)
-        
         # Calculate cost
-        search_tokens = run.get('total_search_tokens', 0)
-        tester_tokens = run.get('total_tester_tokens', 0)
-        cost = (search_tokens / 1_000_000) * 0.02 + (tester_tokens / 1_000_000) * 0.15
+        cost = run_cost(run)
+        
+        entry = None if args.rebuild else cache.get(run)
+        if entry is None:
+            # Summary written back by finalize_test_runs.py saves the results download
+            metrics = stored_metrics(run) or calculate_metrics(pb.get_test_results(run['id']))
+            data = {
+                'run': run,
+                'metrics': metrics,
+                'cost': cost,
+                'cost_per_query': cost / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
+            }
+            entry = cache.put(run, metrics, render_breakdown(data))
+            fetched += 1
         
         test_data.append({
             'run': run,
-            'metrics': metrics,
+            'metrics': entry['metrics'],
+            'section': entry['section'],
             'cost': cost,
-            'cost_per_query': cost / metrics['total_queries'] if metrics['total_queries'] > 0 else 0
+            'cost_per_query': cost / entry['metrics']['total_queries'] if entry['metrics']['total_queries'] > 0 else 0
         })
     
+    cache.prune(run['id'] for run in completed_runs)
+    print(f"♻️  {len(completed_runs) - fetched} tests unchanged (from cache), {fetched} fetched\n")
+    
     # Sort by accuracy
     test_data.sort(key=lambda x: x['metrics']['accuracy_at_1'], reverse=True)
     
-    # Generate markdown report
-    report = generate_markdown_report(test_data)
+    # Stream markdown report to file
+    with ReportWriter(args.output, shard_dir=args.shard_dir) as report:
+        write_markdown_report(report, test_data)
     
-    # Save to file
-    output_file = 'comparison_report.md'
-    with open(output_file, 'w') as f:
-        f.write(report)
-    
-    print(f"✅ Report saved to: {output_file}\n")
+    print(f"✅ Report saved to: {args.output}\n")
     print("Preview:\n")
     print("=" * 80)
-    print(report[:1000])
+    with open(args.output, encoding='utf-8') as f:
+        print(f.read(1000))
     print("=" * 80)
     
-    return output_file
+    return args.output
 
-def generate_markdown_report(test_data):
-    """Generate markdown comparison report"""
+
+def summary_row(i, data):
+    run = data['run']
+    metrics = data['metrics']
+    
+    # Get readable names
+    emb_code = run.get('embedding_model', 'unknown')
+    enr_code = run.get('enrichment_model', 'none')
+    
+    emb_name = get_readable_name(emb_code, 'embedding')
+    enr_name = get_readable_name(enr_code, 'enrichment')
+    
+    # Truncate names
+    emb_short = emb_name.replace('text-embedding-', '').replace('OpenAI ', 'OAI ').replace('Google ', '')[:15]
+    enr_short = enr_name.replace('Gemini ', 'G').replace('GPT-', 'G')[:12]
+    
+    return [
+        i, run['name'][:20], emb_short, enr_short,
+        f"{metrics['accuracy_at_1']*100:.1f}%", f"{metrics['accuracy_at_5']*100:.1f}%",
+        f"{metrics['mean_reciprocal_rank']:.3f}", f"${data['cost']:.4f}", f"${data['cost_per_query']:.6f}"
+    ]
+
+
+@traced('render.breakdown')
+def render_breakdown(data):
+    """Detailed breakdown section body for one test"""
+    run = data['run']
+    metrics = data['metrics']
+    
+    emb_name = get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')
+    enr_name = get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')
+    tester_name = get_readable_name(run.get('tester_model', 'unknown'), 'tester')
+    
+    md = [f"**Configuration:**\n"]
+    md.append(f"- Embedding: {emb_name}\n")
+    md.append(f"- Enrichment: {enr_name}\n")
+    md.append(f"- Tester: {tester_name}\n")
+    md.append(f"- Queries: {run.get('target_query_count', 0)}\n\n")
+    
+    md.append(f"**Metrics:**\n")
+    md.append(f"- Accuracy@1: **{metrics['accuracy_at_1']*100:.1f}%**\n")
+    md.append(f"- Accuracy@5: {metrics['accuracy_at_5']*100:.1f}%\n")
+    md.append(f"- Accuracy@10: {metrics['accuracy_at_10']*100:.1f}%\n")
+    md.append(f"- MRR: {metrics['mean_reciprocal_rank']:.3f}\n")
+    md.append(f"- Avg Rank: {metrics['average_rank']:.2f}\n")
+    
+    if metrics['total_queries'] > 0:
+        md.append(f"- Success Rate: {(metrics['successful_queries']/metrics['total_queries']*100):.1f}%\n\n")
+    else:
+        md.append(f"- Success Rate: N/A\n\n")
+    
+    md.append(f"**Cost:**\n")
+    md.append(f"- Total: ${data['cost']:.4f}\n")
+    md.append(f"- Per Query: ${data['cost_per_query']:.6f}\n")
+    md.append(f"- Tokens: {run.get('total_search_tokens', 0) + run.get('total_tester_tokens', 0):,}\n\n")
+    
+    md.append("---\n\n")
+    return ''.join(md)
+
+
+@traced('render.report')
+def write_markdown_report(report, test_data):
+    """Write markdown comparison report"""
     
-    md = "# Embedding Tests - Comparison Report\n\n"
-    md += f"**Generated:** {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    md += f"**Total Tests:** {len(test_data)}\n\n"
+    report.write("# Embedding Tests - Comparison Report\n\n")
+    report.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    report.write(f"**Total Tests:** {len(test_data)}\n\n")
     
     # Summary table
-    md += "## 📊 Summary Table\n\n"
-    md += "| Rank | Name | Embedding | Enrichment | Acc@1 | Acc@5 | MRR | Cost | Cost/Q |\n"
-    md += "|------|------|-----------|------------|-------|-------|-----|------|--------|\n"
-    
-    for i, data in enumerate(test_data, 1):
-        run = data['run']
-        metrics = data['metrics']
+    report.write("## 📊 Summary Table\n\n")
+    report.lines(*table_lines(
+        ['Rank', 'Name', 'Embedding', 'Enrichment', 'Acc@1', 'Acc@5', 'MRR', 'Cost', 'Cost/Q'],
+        (summary_row(i, data) for i, data in enumerate(test_data, 1))
+    ))
+    
+    if test_data:
+        # Best performers
+        report.write("\n## 🏆 Best Performers\n\n")
         
-        # Get readable names
-        emb_code = run.get('embedding_model', 'unknown')
-        enr_code = run.get('enrichment_model', 'none')
+        best_acc = max(test_data, key=lambda x: x['metrics']['accuracy_at_1'])
+        best_mrr = max(test_data, key=lambda x: x['metrics']['mean_reciprocal_rank'])
+        best_cost = min(test_data, key=lambda x: x['cost'])
+        best_value = min(test_data, key=lambda x: x['cost_per_query'] if x['metrics']['accuracy_at_1'] > 0.5 else float('inf'))
         
-        emb_name = get_readable_name(emb_code, 'embedding')
-        enr_name = get_readable_name(enr_code, 'enrichment')
-        
-        # Truncate names
-        emb_short = emb_name.replace('text-embedding-', '').replace('OpenAI ', 'OAI ').replace('Google ', '')[:15]
-        enr_short = enr_name.replace('Gemini ', 'G').replace('GPT-', 'G')[:12]
-        
-        md += f"| {i} | {run['name'][:20]} | {emb_short} | {enr_short} | "
-        md += f"{metrics['accuracy_at_1']*100:.1f}% | {metrics['accuracy_at_5']*100:.1f}% | "
-        md += f"{metrics['mean_reciprocal_rank']:.3f} | ${data['cost']:.4f} | ${data['cost_per_query']:.6f} |\n"
-    
-    # Best performers
-    md += "\n## 🏆 Best Performers\n\n"
-    
-    best_acc = max(test_data, key=lambda x: x['metrics']['accuracy_at_1'])
-    best_mrr = max(test_data, key=lambda x: x['metrics']['mean_reciprocal_rank'])
-    best_cost = min(test_data, key=lambda x: x['cost'])
-    best_value = min(test_data, key=lambda x: x['cost_per_query'] if x['metrics']['accuracy_at_1'] > 0.5 else float('inf'))
-    
-    md += f"### 🎯 Best Accuracy@1\n"
-    md += f"**{best_acc['run']['name']}** - {best_acc['metrics']['accuracy_at_1']*100:.1f}%\n\n"
-    
-    md += f"### 📈 Best MRR\n"
-    md += f"**{best_mrr['run']['name']}** - {best_mrr['metrics']['mean_reciprocal_rank']:.3f}\n\n"
-    
-    md += f"### 💰 Lowest Cost\n"
-    md += f"**{best_cost['run']['name']}** - ${best_cost['cost']:.4f}\n\n"
-    
-    md += f"### ⭐ Best Value (Acc/Cost)\n"
-    md += f"**{best_value['run']['name']}** - {best_value['metrics']['accuracy_at_1']*100:.1f}% @ ${best_value['cost_per_query']:.6f}/query\n\n"
+        report.lines(
+            "### 🎯 Best Accuracy@1",
+            f"**{best_acc['run']['name']}** - {best_acc['metrics']['accuracy_at_1']*100:.1f}%",
+            "",
+            "### 📈 Best MRR",
+            f"**{best_mrr['run']['name']}** - {best_mrr['metrics']['mean_reciprocal_rank']:.3f}",
+            "",
+            "### 💰 Lowest Cost",
+            f"**{best_cost['run']['name']}** - ${best_cost['cost']:.4f}",
+            "",
+            "### ⭐ Best Value (Acc/Cost)",
+            f"**{best_value['run']['name']}** - {best_value['metrics']['accuracy_at_1']*100:.1f}% @ ${best_value['cost_per_query']:.6f}/query",
+            ""
+        )
     
     # Detailed breakdown
-    md += "## 📋 Detailed Breakdown\n\n"
+    report.write("## 📋 Detailed Breakdown\n\n")
     
     for i, data in enumerate(test_data, 1):
-        run = data['run']
-        metrics = data['metrics']
-        
-        emb_name = get_readable_name(run.get('embedding_model', 'unknown'), 'embedding')
-        enr_name = get_readable_name(run.get('enrichment_model', 'none'), 'enrichment')
-        tester_name = get_readable_name(run.get('tester_model', 'unknown'), 'tester')
-        
-        md += f"### {i}. {run['name']}\n\n"
-        md += f"**Configuration:**\n"
-        md += f"- Embedding: {emb_name}\n"
-        md += f"- Enrichment: {enr_name}\n"
-        md += f"- Tester: {tester_name}\n"
-        md += f"- Queries: {run.get('target_query_count', 0)}\n\n"
-        
-        md += f"**Metrics:**\n"
-        md += f"- Accuracy@1: **{metrics['accuracy_at_1']*100:.1f}%**\n"
-        md += f"- Accuracy@5: {metrics['accuracy_at_5']*100:.1f}%\n"
-        md += f"- Accuracy@10: {metrics['accuracy_at_10']*100:.1f}%\n"
-        md += f"- MRR: {metrics['mean_reciprocal_rank']:.3f}\n"
-        md += f"- Avg Rank: {metrics['average_rank']:.2f}\n"
-        
-        if metrics['total_queries'] > 0:
-            md += f"- Success Rate: {(metrics['successful_queries']/metrics['total_queries']*100):.1f}%\n\n"
-        else:
-            md += f"- Success Rate: N/A\n\n"
-        
-        md += f"**Cost:**\n"
-        md += f"- Total: ${data['cost']:.4f}\n"
-        md += f"- Per Query: ${data['cost_per_query']:.6f}\n"
-        md += f"- Tokens: {run.get('total_search_tokens', 0) + run.get('total_tester_tokens', 0):,}\n\n"
-        
-        md += "---\n\n"
-    
-    return md
+        report.add_section(data['run']['id'], f"### {i}. {data['run']['name']}\n\n" + data['section'], title=data['run']['name'])
+    report.write_sections()
 
 if __name__ == '__main__':
     try:
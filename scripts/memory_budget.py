@@ -0,0 +1,120 @@
+"""
+Memory-budgeted result streaming and peak RSS reporting for the exporters
+
+With a budget, results are never held per run: they are fetched in pages
+sized so that one decoded page stays within a fraction of the budget, fed
+to constant-size aggregates and (when the output needs them after the
+aggregates) spilled to a temporary JSON-lines file on disk.
+
+    budget = MemoryBudget(512)                 # MiB
+    for result in budget.iter_results(pb, run_id):
+        ...
+    print(peak_rss_summary(budget))
+"""
+
+import os
+import sys
+import json
+import tempfile
+import itertools
+
+PROBE_SIZE = 50          # results fetched once to estimate the decoded size of one result
+MIN_PAGE = 50
+MAX_PAGE = 1000          # PocketBase caps perPage at 1000
+PAGE_SHARE = 0.25        # share of the budget one decoded page may use
+PY_OVERHEAD = 4          # decoded dicts/lists/strs vs their JSON text, measured on result records
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process in MiB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mib():
+    """Current resident set size in MiB (Linux only, None elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryBudget:
+    """Page sizing against a MiB budget, plus an over-budget warning"""
+
+    def __init__(self, budget_mib):
+        self.budget_mib = budget_mib
+        self.per_page = None
+        self.pages = 0
+        self.warned = False
+
+    def page_size(self, sample):
+        """Results per page so one decoded page uses at most PAGE_SHARE of the budget"""
+        if not sample:
+            return MAX_PAGE
+        per_result = sum(len(json.dumps(r)) for r in sample) / len(sample) * PY_OVERHEAD
+        return max(MIN_PAGE, min(MAX_PAGE, int(self.budget_mib * 1024 * 1024 * PAGE_SHARE / per_result)))
+
+    def iter_results(self, pb, run_id, fields=None):
+        """All results of a run, one budget-sized page in memory at a time"""
+        filter = f'run_id="{run_id}"'
+        if self.per_page is None:
+            # One small probe per export sizes the pages for every run
+            sample = list(itertools.islice(pb.iter_records('embedding_test_results', filter=filter, per_page=PROBE_SIZE), PROBE_SIZE))
+            self.per_page = self.page_size(sample)
+        for i, result in enumerate(pb.iter_records('embedding_test_results', filter=filter, fields=fields, per_page=self.per_page)):
+            if i % self.per_page == 0:
+                self.pages += 1
+                self.check()
+            yield result
+
+    def check(self):
+        rss = current_rss_mib()
+        if rss is not None and rss > self.budget_mib and not self.warned:
+            self.warned = True
+            print(f"   ⚠️  RSS {rss:.0f} MiB is above the {self.budget_mib} MiB budget")
+
+
+class Spill:
+    """Temporary JSON-lines file for records needed after their aggregates"""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.count = 0
+
+    def append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write('\n')
+        self.count += 1
+
+    def __iter__(self):
+        self.file.flush()
+        self.file.seek(0)
+        for line in self.file:
+            yield json.loads(line)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def peak_rss_summary(budget=None):
+    peak = peak_rss_mib()
+    if peak is None:
+        return "📈 Peak RSS: unavailable on this platform"
+    line = f"📈 Peak RSS: {peak:.1f} MiB"
+    if budget is not None:
+        line += f" (budget {budget.budget_mib} MiB, {budget.pages} result pages of {budget.per_page or 0})"
+    return line
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Local HTTP service answering metrics questions from an in-process cache
+
+Keeps one authenticated PocketBaseClient and a thread-safe LRU of computed
+answers, so dashboards and notebooks get repeat answers in milliseconds
+instead of paying a script start, a login and a full download each time.
+
+Cache entries are keyed by the run's `updated` stamp. The run list is
+re-read at most every --runs-ttl seconds, and entries of runs whose stamp
+changed (or that were deleted) are dropped then. A run in progress bumps
+its stamp with every completed_query_count update, so its answers refresh
+on their own.
+
+Endpoints (JSON):
+    GET /health                           cache, circuit state and per-endpoint PocketBase stats
+    GET /runs?status=completed            run list with config, cost and stored metrics
+    GET /runs/<id>/metrics                calculate_metrics + cost for one run
+    GET /runs/<id>/metrics?precision=0.02 sampled estimate with bounds (sample_metrics.py)
+    GET /runs/<id>/groups?limit=20&sort=worst
+                                          per source group: queries, Acc@1, MRR, failures
+    GET /compare?ids=<id>,<id>,...        metrics side by side, deltas against the first
+
+Usage:
+    python3 scripts/metrics_service.py
+    python3 scripts/metrics_service.py --port 8787 --cache-size 1024 --runs-ttl 10
+    curl -s localhost:8787/runs/<id>/metrics | jq
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict, defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import requests
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient, calculate_metrics, run_cost
+from finalize_test_runs import stored_metrics
+from sample_metrics import sample_metrics
+from resilience import EndpointStats
+from tracing import span
+
+DEFAULT_PORT = 8787
+RESULT_FIELDS = 'correct_rank,source_group_id,source_group_name,search_tokens,tester_tokens'
+
+
+class LRUCache:
+    """Thread-safe LRU; keys are tuples starting with (kind, run_id, updated)"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count=True):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += count
+                return None
+            self._entries.move_to_end(key)
+            self.hits += count
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard_run(self, run_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == run_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class MetricsService:
+    """Answers for the HTTP handler, computed once per run version"""
+
+    def __init__(self, url, email, password, cache_size=512, runs_ttl=5.0):
+        self.url = url
+        self.email = email
+        self.password = password
+        self.cache = LRUCache(cache_size)
+        self.runs_ttl = runs_ttl
+        self.pb = PocketBaseClient(url, email, password)
+        self._runs = {}
+        self._runs_loaded = 0.0
+        self._runs_lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        self._key_locks_lock = threading.Lock()
+
+    def _pocketbase(self, fn, *args, **kwargs):
+        """Call the client, logging in again once if the token has expired"""
+        try:
+            return fn(self.pb, *args, **kwargs)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in (401, 403):
+                raise
+            self.pb = PocketBaseClient(self.url, self.email, self.password)
+            return fn(self.pb, *args, **kwargs)
+
+    def runs(self):
+        """{run_id: run}, re-read after runs_ttl; changed runs leave the cache"""
+        with self._runs_lock:
+            if time.monotonic() - self._runs_loaded >= self.runs_ttl:
+                fresh = {r['id']: r for r in self._pocketbase(lambda pb: list(pb.iter_records('embedding_test_runs')))}
+                for run_id, run in self._runs.items():
+                    if run_id not in fresh or fresh[run_id].get('updated') != run.get('updated'):
+                        self.cache.discard_run(run_id)
+                self._runs = fresh
+                self._runs_loaded = time.monotonic()
+            return self._runs
+
+    def run(self, run_id):
+        run = self.runs().get(run_id)
+        if run is None:
+            raise LookupError(f'Unknown run: {run_id}')
+        return run
+
+    def cached(self, key, compute):
+        """Cache lookup; concurrent misses on one key compute it once"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        with self._key_locks_lock:
+            lock = self._key_locks[key]
+        with lock:
+            # Another request may have filled it while this one waited
+            value = self.cache.get(key, count=False)
+            if value is None:
+                value = compute()
+                self.cache.put(key, value)
+        with self._key_locks_lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def _digest(self, run):
+        """Metrics and per-group stats from one pass over the run's results"""
+        def compute():
+            results = self._pocketbase(lambda pb: pb.fetch_all(
+                'embedding_test_results', filter=f'run_id="{run["id"]}"', fields=RESULT_FIELDS, per_page=1000
+            ))
+            by_group = defaultdict(list)
+            for result in results:
+                by_group[result.get('source_group_id')].append(result)
+            groups = []
+            for group_id, group_results in by_group.items():
+                metrics = calculate_metrics(group_results)
+                groups.append({
+                    'source_group_id': group_id,
+                    'source_group_name': group_results[0].get('source_group_name'),
+                    'queries': metrics['total_queries'],
+                    'accuracy_at_1': metrics['accuracy_at_1'],
+                    'mean_reciprocal_rank': metrics['mean_reciprocal_rank'],
+                    'average_rank': metrics['average_rank'],
+                    'failed': metrics['total_queries'] - metrics['successful_queries']
+                })
+            return {'metrics': calculate_metrics(results), 'groups': groups}
+        return self.cached(('digest', run['id'], run.get('updated')), compute)
+
+    def run_summary(self, run):
+        return {
+            'id': run['id'],
+            'name': run.get('name'),
+            'status': run.get('status'),
+            'updated': run.get('updated'),
+            'config': {key: run.get(key) for key in (
+                'embedding_model', 'enrichment_model', 'tester_model', 'difficulty_mode', 'use_dynamic_weights',
+                'target_query_count', 'completed_query_count'
+            )},
+            'cost_usd': run_cost(run),
+            'metrics': stored_metrics(run)
+        }
+
+    def list_runs(self, status=None):
+        runs = [r for r in self.runs().values() if status is None or r.get('status') == status]
+        return [self.run_summary(r) for r in sorted(runs, key=lambda r: r.get('created') or '', reverse=True)]
+
+    def metrics(self, run_id, precision=None):
+        run = self.run(run_id)
+        if precision is not None:
+            metrics = self.cached(
+                ('sample', run_id, run.get('updated'), precision),
+                lambda: self._pocketbase(sample_metrics, run_id, precision=precision, seed=0)
+            )
+        else:
+            metrics = stored_metrics(run) or self._digest(run)['metrics']
+        cost = run_cost(run)
+        return {
+            **self.run_summary(run),
+            'metrics': metrics,
+            'cost_per_query': cost / metrics['total_queries'] if metrics['total_queries'] else 0
+        }
+
+    def groups(self, run_id, limit=None, sort='worst'):
+        groups = self._digest(self.run(run_id))['groups']
+        if sort == 'worst':
+            ordered = sorted(groups, key=lambda g: (g['mean_reciprocal_rank'], -g['queries']))
+        elif sort == 'best':
+            ordered = sorted(groups, key=lambda g: (-g['mean_reciprocal_rank'], -g['queries']))
+        elif sort == 'queries':
+            ordered = sorted(groups, key=lambda g: -g['queries'])
+        else:
+            raise ValueError(f'Unknown sort: {sort} (worst, best, queries)')
+        return {'run_id': run_id, 'total_groups': len(groups), 'groups': ordered[:limit] if limit else ordered}
+
+    def compare(self, run_ids):
+        if not run_ids:
+            raise ValueError('ids is required: /compare?ids=<id>,<id>')
+        entries = [self.metrics(run_id) for run_id in run_ids]
+        baseline = entries[0]['metrics']
+        for entry in entries:
+            entry['delta'] = {
+                key: entry['metrics'][key] - baseline[key]
+                for key in ('accuracy_at_1', 'accuracy_at_5', 'accuracy_at_10', 'mean_reciprocal_rank')
+            }
+        return {'baseline': run_ids[0], 'runs': entries}
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'pocketbase_url': self.url,
+            'runs_known': len(self._runs),
+            'runs_age_s': time.monotonic() - self._runs_loaded if self._runs_loaded else None,
+            'cache': self.cache.stats(),
+            'pocketbase': {
+                'circuit': self.pb.policy.breaker.state,
+                'concurrency_limit': int(self.pb.policy.limiter.limit),
+                'endpoints': [
+                    dict(zip(('endpoint', 'count', 'errors', 'retries', 'mean_ms', 'p95_ms', 'mib'), row))
+                    for row in EndpointStats.rows([self.pb.stats.snapshot()])
+                ]
+            }
+        }
+
+    def dispatch(self, path, query):
+        """(status, data) for a GET request"""
+        parts = path.strip('/').split('/')
+        param = lambda name: query.get(name, [None])[0]
+        if parts == ['health']:
+            return 200, self.health()
+        if parts == ['runs']:
+            return 200, self.list_runs(param('status'))
+        if len(parts) == 3 and parts[0] == 'runs' and parts[2] == 'metrics':
+            precision = param('precision')
+            return 200, self.metrics(parts[1], float(precision) if precision else None)
+        if len(parts) == 3 and parts[0] == 'runs' and parts[2] == 'groups':
+            limit = param('limit')
+            return 200, self.groups(parts[1], int(limit) if limit else None, param('sort') or 'worst')
+        if parts == ['compare']:
+            return 200, self.compare([i for i in (param('ids') or '').split(',') if i])
+        return 404, {'message': f'Unknown endpoint: {path}'}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            started = time.perf_counter()
+            with span('service.request', key=url.path.split('/')[-1] or '/') as s:
+                try:
+                    status, data = service.dispatch(url.path, parse_qs(url.query))
+                except LookupError as e:
+                    status, data = 404, {'message': str(e)}
+                except ValueError as e:
+                    status, data = 400, {'message': str(e)}
+                except requests.RequestException as e:
+                    status, data = 502, {'message': f'PocketBase request failed: {e}'}
+                s.set(status=status)
+            payload = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Server-Timing', f'app;dur={(time.perf_counter() - started) * 1000:.1f}')
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local metrics query service with an in-process cache')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=512, help='Cached answers kept (LRU)')
+    parser.add_argument('--runs-ttl', type=float, default=5.0, help='Seconds before the run list is re-read')
+    args = parser.parse_args()
+
+    print("🛰️  Starting metrics service...\n")
+    service = MetricsService(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD,
+                             args.cache_size, args.runs_ttl)
+    print(f"✅ Connected to {POCKETBASE_URL} ({len(service.runs())} runs)")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    base = f"http://{args.host}:{server.server_address[1]}"
+    print(f"📡 Listening on {base}\n")
+    for endpoint in ('/health', '/runs', '/runs/<id>/metrics', '/runs/<id>/groups', '/compare?ids=<id>,<id>'):
+        print(f"   GET {base}{endpoint}")
+    print("\nCtrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped ({service.cache.stats()['hits']} cache hits)")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
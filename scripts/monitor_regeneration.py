@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Monitor embedding regeneration jobs: throughput, ETA, stalls and failures
+
+Samples `embedding_regeneration_jobs` records, derives groups/sec and
+tokens/sec from consecutive samples (or from created → updated for a single
+sample) and prints an ETA per running job. Jobs are flagged as stalled when
+`updated` stops moving and as failing when failed_groups grows past a ratio.
+
+Every sample is appended to a JSONL history file, so rates survive restarts
+and finished jobs give per enrichment/embedding pair throughput numbers for
+sizing future regeneration batches.
+
+Usage:
+    python3 scripts/monitor_regeneration.py            # follow until no job is running
+    python3 scripts/monitor_regeneration.py --once     # single snapshot
+    python3 scripts/monitor_regeneration.py --summary  # throughput per model pair from history
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient, token_cost
+from analyze_throughput import parse_timestamp
+from watch_test_run import format_eta
+
+HISTORY_FILE = 'regeneration_history.jsonl'
+COLLECTION = 'embedding_regeneration_jobs'
+
+
+def load_history(path):
+    """{job_id: [samples...]} from the JSONL history"""
+    history = defaultdict(list)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    sample = json.loads(line)
+                    history[sample['id']].append(sample)
+    return history
+
+
+def take_sample(job):
+    return {
+        'id': job['id'],
+        'sampled_at': time.time(),
+        'status': job.get('status'),
+        'embedding_model': job.get('embedding_model'),
+        'enrichment_model': job.get('enrichment_model'),
+        'total_groups': job.get('total_groups') or 0,
+        'processed_groups': job.get('processed_groups') or 0,
+        'failed_groups': len(job.get('failed_groups') or []),
+        'total_tokens': job.get('total_tokens') or 0,
+        'created': job.get('created'),
+        'updated': job.get('updated')
+    }
+
+
+def job_rates(samples, window):
+    """(groups/sec, tokens/sec) over the last `window` seconds of samples"""
+    latest = samples[-1]
+    earlier = [s for s in samples[:-1] if latest['sampled_at'] - s['sampled_at'] <= window]
+    base = earlier[0] if earlier else None
+
+    if base and latest['processed_groups'] > base['processed_groups']:
+        dt = latest['sampled_at'] - base['sampled_at']
+        return (
+            (latest['processed_groups'] - base['processed_groups']) / dt,
+            (latest['total_tokens'] - base['total_tokens']) / dt
+        )
+
+    # Single sample (or no progress in window): average over the job's lifetime
+    created = parse_timestamp(latest.get('created'))
+    updated = parse_timestamp(latest.get('updated'))
+    if created is None or updated is None or updated <= created:
+        return 0.0, 0.0
+    dt = updated - created
+    return latest['processed_groups'] / dt, latest['total_tokens'] / dt
+
+
+def job_flags(samples, stall_seconds, fail_ratio):
+    latest = samples[-1]
+    flags = []
+    if latest['status'] == 'failed':
+        flags.append('FAILED')
+    if latest['status'] == 'running':
+        updated = parse_timestamp(latest.get('updated'))
+        if updated is not None and latest['sampled_at'] - updated > stall_seconds:
+            flags.append(f"STALLED {int(latest['sampled_at'] - updated)}s")
+    if latest['processed_groups'] and latest['failed_groups'] / latest['processed_groups'] > fail_ratio:
+        flags.append(f"FAILING {latest['failed_groups']}/{latest['processed_groups']}")
+    return flags
+
+
+def print_snapshot(history, jobs, args):
+    print(f"\n🕒 {time.strftime('%H:%M:%S')}")
+    print(f"{'Job':<17} {'Pair':<16} {'Status':<10} {'Progress':>12} {'grp/s':>7} {'tok/s':>8} {'ETA':>9}  Flags")
+    print("-" * 100)
+    for job in jobs:
+        samples = history[job['id']]
+        latest = samples[-1]
+        groups_per_sec, tokens_per_sec = job_rates(samples, args.window)
+        remaining = latest['total_groups'] - latest['processed_groups']
+        eta = remaining / groups_per_sec if groups_per_sec and latest['status'] == 'running' else None
+        pair = f"{latest['enrichment_model']}_{latest['embedding_model']}"
+        progress = f"{latest['processed_groups']}/{latest['total_groups']}"
+        flags = ', '.join(job_flags(samples, args.stall_seconds, args.fail_ratio))
+        print(f"{job['id'][:16]:<17} {pair[:15]:<16} {latest['status'] or '?':<10} {progress:>12} "
+              f"{groups_per_sec:>7.2f} {tokens_per_sec:>8.0f} {format_eta(eta):>9}  {flags}")
+
+
+def print_summary(history):
+    """Throughput per enrichment/embedding pair from finished jobs"""
+    pairs = defaultdict(lambda: {'jobs': 0, 'groups': 0, 'tokens': 0, 'seconds': 0.0, 'failed': 0, 'cost': 0.0})
+    for samples in history.values():
+        latest = samples[-1]
+        if latest['status'] != 'completed':
+            continue
+        created = parse_timestamp(latest.get('created'))
+        updated = parse_timestamp(latest.get('updated'))
+        if created is None or updated is None or updated <= created:
+            continue
+        pair = pairs[f"{latest['enrichment_model']}_{latest['embedding_model']}"]
+        pair['cost'] += token_cost(latest['total_tokens'], latest['enrichment_model'], 'enrichment')
+        pair['jobs'] += 1
+        pair['groups'] += latest['processed_groups']
+        pair['tokens'] += latest['total_tokens']
+        pair['failed'] += latest['failed_groups']
+        pair['seconds'] += updated - created
+
+    print("\n📦 Throughput per enrichment/embedding pair (completed jobs):\n")
+    print(f"{'Pair':<20} {'Jobs':>5} {'Groups':>8} {'grp/s':>7} {'tok/s':>8} {'Failed':>7} {'$/1k grp':>9}")
+    print("-" * 70)
+    for name, p in sorted(pairs.items(), key=lambda x: x[1]['groups'] / x[1]['seconds']):
+        print(f"{name:<20} {p['jobs']:>5} {p['groups']:>8} {p['groups'] / p['seconds']:>7.2f} "
+              f"{p['tokens'] / p['seconds']:>8.0f} {p['failed']:>7} "
+              f"{p['cost'] / p['groups'] * 1000 if p['groups'] else 0:>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regeneration job progress monitor')
+    parser.add_argument('--once', action='store_true', help='Take a single snapshot and exit')
+    parser.add_argument('--summary', action='store_true', help='Only print per-pair throughput from history')
+    parser.add_argument('--all', action='store_true', help='Show finished jobs too')
+    parser.add_argument('--interval', type=float, default=15.0, help='Seconds between samples')
+    parser.add_argument('--window', type=float, default=300.0, help='Rate window in seconds')
+    parser.add_argument('--stall-seconds', type=float, default=120.0, help='No update for this long = stalled')
+    parser.add_argument('--fail-ratio', type=float, default=0.05, help='Failed/processed ratio that flags a job')
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.summary:
+        print_summary(history)
+        return
+
+    print("🔄 Monitoring regeneration jobs...")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    while True:
+        jobs = sorted(pb.iter_records(COLLECTION), key=lambda j: j.get('created', ''))
+        active = [j for j in jobs if j.get('status') in ('running', 'pending')]
+
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for job in jobs:
+                sample = take_sample(job)
+                previous = history[job['id']][-1] if history[job['id']] else None
+                # Finished jobs are only recorded once, when their final state is first seen
+                if previous and job not in active and previous['updated'] == sample['updated']:
+                    continue
+                history[job['id']].append(sample)
+                f.write(json.dumps(sample) + '\n')
+
+        shown = jobs if args.all else active
+        if shown:
+            print_snapshot(history, shown, args)
+        else:
+            print("\n✅ No running regeneration jobs")
+
+        if args.once or not active:
+            break
+        time.sleep(args.interval)
+
+    print_summary(history)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
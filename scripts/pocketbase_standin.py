@@ -0,0 +1,435 @@
+"""
+In-memory PocketBase stand-in for benchmarks and local runs
+
+Serves the subset of the PocketBase REST API the Python scripts use, with
+the same response shapes:
+  - POST  /api/collections/_superusers/auth-with-password
+  - GET   /api/collections/{name}/records     page, perPage, skipTotal, filter, fields, sort
+  - GET/PATCH/DELETE /api/collections/{name}/records/{id}
+  - POST  /api/collections/{name}/records     UNIQUE indexes are enforced
+  - GET/PATCH /api/collections/{name}         collection schema (fields)
+  - POST  /api/collections                    create a collection (fields, indexes)
+  - POST  /api/batch                          all or nothing: a failing request undoes the batch
+Filters support `field op value` terms joined by && (op: = != > >= < <=,
+value: "string", number, true/false), which covers every filter in scripts/.
+
+Overload can be simulated: `latency` adds server time to every request,
+`max_in_flight` answers 429 above that many concurrent requests and
+`error_rate` answers that share of requests with 503.
+
+seed() fills embedding_test_runs, embedding_test_results and groups with
+deterministic synthetic data at a chosen scale.
+
+    server = PocketBaseStandIn(seed(runs=20, queries=500, groups=1000, dims=256))
+    server.start()   # server.url -> http://127.0.0.1:<port>
+    ...
+    server.stop()
+"""
+
+import re
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+UNIQUE_INDEX = re.compile(r'CREATE\s+UNIQUE\s+INDEX\s+\S+\s+ON\s+\S+\s*\(([^)]*)\)', re.IGNORECASE)
+FILTER_TERM = re.compile(r'\s*([\w.]+)\s*(!=|>=|<=|=|>|<)\s*("(?:[^"\\]|\\.)*"|[\w.+-]+)\s*')
+PB_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%fZ'
+
+EMBEDDING_CODES = ('gem004', 'oai3l', 'oai3s', 'voy3', 'voy35')
+ENRICHMENT_CODES = ('g25f', 'g25fl', 'gpt4m', 'none')
+TESTER_CODES = ('gpt4o', 'gpt4m', 'g25f')
+INTENTS = ('identity', 'physical', 'context', 'mixed')
+
+
+def pb_time(dt):
+    return dt.strftime(PB_TIME_FORMAT)[:-4] + 'Z'
+
+
+def parse_filter(expression):
+    """PocketBase filter -> list of (field, op, value) terms, all must hold"""
+    terms = []
+    for part in (expression or '').split('&&'):
+        if not part.strip():
+            continue
+        match = FILTER_TERM.fullmatch(part)
+        if not match:
+            raise ValueError(f'Unsupported filter: {part.strip()}')
+        field, op, raw = match.groups()
+        if raw.startswith('"'):
+            value = json.loads(raw)
+        elif raw in ('true', 'false'):
+            value = raw == 'true'
+        elif raw == 'null':
+            value = None
+        else:
+            value = float(raw) if '.' in raw else int(raw)
+        terms.append((field, op, value))
+    return terms
+
+
+def matches(record, terms):
+    for field, op, value in terms:
+        actual = record.get(field)
+        if actual is None and isinstance(value, str):
+            actual = ''  # PocketBase compares empty fields as ""
+        if op == '=' and actual != value:
+            return False
+        if op == '!=' and actual == value:
+            return False
+        if op in ('>', '>=', '<', '<='):
+            if actual is None:
+                return False
+            if op == '>' and not actual > value or op == '>=' and not actual >= value \
+                    or op == '<' and not actual < value or op == '<=' and not actual <= value:
+                return False
+    return True
+
+
+def project(record, fields):
+    if not fields:
+        return record
+    return {f: record[f] for f in fields.split(',') if f in record}
+
+
+class PocketBaseStandIn:
+    """Threaded HTTP server over a {collection: [records]} dict"""
+
+    def __init__(self, collections, email='bench@local', password='bench', host='127.0.0.1', port=0,
+                 latency=0.0, max_in_flight=None, error_rate=0.0, seed_value=0):
+        self.collections = {name: {r['id']: r for r in records} for name, records in collections.items()}
+        self.schemas = {name: [{'name': f, 'type': 'json'} for f in (records[0] if records else {})]
+                        for name, records in collections.items()}
+        self.unique = {}  # collection -> [tuple of fields], from CREATE UNIQUE INDEX
+        self.email = email
+        self.password = password
+        self.token = secrets.token_hex(16)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.error_rate = error_rate
+        self.in_flight = 0
+        self.rejected = 0
+        self._rng = random.Random(seed_value)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # -- request handling --------------------------------------------------
+
+    def list_records(self, collection, query):
+        page = int(query.get('page', ['1'])[0])
+        per_page = min(int(query.get('perPage', ['30'])[0]), 1000)  # PocketBase caps perPage at 1000
+        terms = parse_filter(query.get('filter', [''])[0])
+        with self.lock:
+            records = [r for r in self.collections.get(collection, {}).values() if matches(r, terms)]
+        for key in reversed([k for k in query.get('sort', [''])[0].split(',') if k]):
+            desc = key.startswith('-')
+            records.sort(key=lambda r: (r.get(key.lstrip('-+')) is None, r.get(key.lstrip('-+'))), reverse=desc)
+        skip_total = query.get('skipTotal', ['0'])[0] in ('1', 'true')
+        fields = query.get('fields', [''])[0]
+        items = [project(r, fields) for r in records[(page - 1) * per_page:page * per_page]]
+        return {
+            'page': page,
+            'perPage': per_page,
+            'totalItems': -1 if skip_total else len(records),
+            'totalPages': -1 if skip_total else math.ceil(len(records) / per_page),
+            'items': items
+        }
+
+    def update_record(self, collection, record_id, data):
+        with self.lock:
+            record = self.collections.get(collection, {}).get(record_id)
+            if record is None:
+                return 404, {'message': 'The requested resource wasn\'t found.'}
+            record.update(data)
+            record['updated'] = pb_time(datetime.now(timezone.utc))
+            return 200, dict(record)
+
+    def create_record(self, collection, data):
+        with self.lock:
+            records = self.collections.setdefault(collection, {})
+            if data.get('id') in records:
+                return 400, {'message': 'Failed to create record.',
+                             'data': {'id': {'code': 'validation_not_unique', 'message': 'Value must be unique.'}}}
+            for fields in self.unique.get(collection, []):
+                key = tuple(data.get(f) for f in fields)
+                if any(tuple(r.get(f) for f in fields) == key for r in records.values()):
+                    return 400, {'message': 'Failed to create record.',
+                                 'data': {fields[0]: {'code': 'validation_not_unique', 'message': 'Value must be unique.'}}}
+            now = pb_time(datetime.now(timezone.utc))
+            record = {'id': secrets.token_hex(8)[:15], 'created': now, 'updated': now, **data}
+            records[record['id']] = record
+            return 200, dict(record)
+
+    def delete_record(self, collection, record_id):
+        with self.lock:
+            if self.collections.get(collection, {}).pop(record_id, None) is None:
+                return 404, {'message': 'The requested resource wasn\'t found.'}
+            return 204, None
+
+    def create_collection(self, body):
+        name = body.get('name')
+        with self.lock:
+            if not name or name in self.schemas:
+                return 400, {'message': 'Failed to create collection.', 'data': {'name': {'code': 'validation_not_unique'}}}
+            self.schemas[name] = body.get('fields', [])
+            self.collections.setdefault(name, {})
+            self.unique[name] = [
+                tuple(f.strip().strip('`"') for f in match.group(1).split(','))
+                for match in map(UNIQUE_INDEX.match, body.get('indexes', [])) if match
+            ]
+            return 200, {'name': name, 'fields': self.schemas[name], 'indexes': body.get('indexes', [])}
+
+    def batch(self, requests):
+        """Run the requests in order; on the first failure undo the earlier
+        ones and answer 400, like PocketBase's batch transaction"""
+        responses = []
+        undo = []  # (collection, record id, record before the request or None)
+        for i, request in enumerate(requests):
+            method = request['method']
+            parts = urlsplit(request['url']).path.strip('/').split('/')
+            collection = parts[2] if len(parts) > 3 and parts[3] == 'records' else None
+            before = None
+            if collection and len(parts) == 5:
+                with self.lock:
+                    before = self.collections.get(collection, {}).get(parts[4])
+                    before = dict(before) if before is not None else None
+            status, data = self.dispatch(method, '/' + '/'.join(parts), {}, request.get('body') or {})
+            if status >= 400:
+                with self.lock:
+                    for name, record_id, record in reversed(undo):
+                        if record is None:
+                            self.collections[name].pop(record_id, None)
+                        else:
+                            self.collections[name][record_id] = record
+                return 400, {'message': 'Batch transaction failed.',
+                             'data': {'requests': {str(i): {'code': 'batch_request_failed', 'response': data}}}}
+            if collection:
+                undo.append((collection, parts[4] if len(parts) == 5 else data['id'], before))
+            responses.append({'status': status, 'body': data})
+        return 200, responses
+
+    def dispatch(self, method, path, query, body):
+        if path == '/api/collections/_superusers/auth-with-password' and method == 'POST':
+            if body.get('identity') == self.email and body.get('password') == self.password:
+                return 200, {'token': self.token, 'record': {'email': self.email}}
+            return 400, {'message': 'Failed to authenticate.'}
+        if path == '/api/health':
+            return 200, {'message': 'API is healthy.'}
+
+        if path == '/api/batch' and method == 'POST':
+            return self.batch(body.get('requests', []))
+
+        parts = path.strip('/').split('/')
+        if parts == ['api', 'collections'] and method == 'POST':
+            return self.create_collection(body)
+        if len(parts) >= 3 and parts[:2] == ['api', 'collections']:
+            collection = parts[2]
+            if len(parts) == 3:
+                if collection not in self.schemas:
+                    return 404, {'message': 'The requested resource wasn\'t found.'}
+                if method == 'PATCH':
+                    self.schemas[collection] = body.get('fields', self.schemas.get(collection, []))
+                return 200, {'name': collection, 'fields': self.schemas.get(collection, [])}
+            if parts[3] == 'records' and len(parts) == 4:
+                if method == 'GET':
+                    return 200, self.list_records(collection, query)
+                if method == 'POST':
+                    return self.create_record(collection, body)
+            if parts[3] == 'records' and len(parts) == 5:
+                if method == 'GET':
+                    with self.lock:
+                        record = self.collections.get(collection, {}).get(parts[4])
+                    return (200, dict(record)) if record else (404, {'message': 'The requested resource wasn\'t found.'})
+                if method == 'PATCH':
+                    return self.update_record(collection, parts[4], body)
+                if method == 'DELETE':
+                    return self.delete_record(collection, parts[4])
+        return 404, {'message': 'The requested resource wasn\'t found.'}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, method):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                authorized = self.headers.get('Authorization') == f'Bearer {server.token}'
+                with server.lock:
+                    server.in_flight += 1
+                    overloaded = server.max_in_flight is not None and server.in_flight > server.max_in_flight
+                    failing = server.error_rate and server._rng.random() < server.error_rate
+                    server.rejected += bool(overloaded or failing)
+                if server.latency and not overloaded:
+                    time.sleep(server.latency)
+                if overloaded:
+                    status, data = 429, {'message': 'Too Many Requests.'}
+                elif failing:
+                    status, data = 503, {'message': 'Service Unavailable.'}
+                elif not authorized and not url.path.endswith('auth-with-password') and url.path != '/api/health':
+                    status, data = 401, {'message': 'The request requires valid record authorization token.'}
+                else:
+                    try:
+                        status, data = server.dispatch(method, url.path, parse_qs(url.query), body)
+                    except ValueError as e:
+                        status, data = 400, {'message': str(e)}
+                payload = b'' if status == 204 else json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with server.lock:
+                    server.in_flight -= 1
+                    server.requests += 1
+                    server.bytes_sent += len(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def do_PATCH(self):
+                self._respond('PATCH')
+
+            def do_DELETE(self):
+                self._respond('DELETE')
+
+        return Handler
+
+
+def seed(runs=10, queries=200, groups=500, dims=128, seed_value=42, query_embeddings=False):
+    """Deterministic synthetic collections; `dims` is the stored vector size.
+    With `query_embeddings`, results carry a query_embedding near their
+    source group's identity vector (drawn from a separate generator, so the
+    rest of the data does not change)"""
+    rng = random.Random(seed_value)
+    query_rng = random.Random(seed_value + 1)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    group_records = []
+    embedding_key = 'g25f_oai3l'
+    for g in range(groups):
+        group_records.append({
+            'id': f'grp{g:012d}',
+            'name': f'Group {g}',
+            'description': f'Synthetic prop group {g} ' + ' '.join(rng.choice(('red', 'wooden', 'chair', 'lamp', 'sword', 'hat')) for _ in range(6)),
+            'deleted_at': '',
+            'updated': pb_time(start),
+            'embeddings': {embedding_key: {
+                aspect: [round(rng.gauss(0, 1), 4) for _ in range(dims)]
+                for aspect in ('identity', 'physical', 'context')
+            }}
+        })
+
+    run_records = []
+    result_records = []
+    for r in range(runs):
+        embedding = rng.choice(EMBEDDING_CODES)
+        enrichment = rng.choice(ENRICHMENT_CODES)
+        tester = rng.choice(TESTER_CODES)
+        run_id = f'run{r:012d}'
+        created = start + timedelta(hours=r)
+        search_tokens = 0
+        tester_tokens = 0
+        skill = rng.uniform(0.3, 0.9)
+        for q in range(queries):
+            source = rng.randrange(groups)
+            rank = 1 if rng.random() < skill else rng.choice((0, 2, 3, 5, 8, 12))
+            top = [rng.randrange(groups) for _ in range(5)]
+            if rank and rank <= 5:
+                top[rank - 1] = source
+            sims = sorted((rng.uniform(0.3, 0.9) for _ in range(5)), reverse=True)
+            s_tokens = rng.randint(5, 20)
+            t_tokens = rng.randint(100, 400)
+            search_tokens += s_tokens
+            tester_tokens += t_tokens
+            result_records.append({
+                'id': f'res{r:06d}{q:06d}',
+                'run_id': run_id,
+                'source_group_id': group_records[source]['id'],
+                'source_group_name': group_records[source]['name'],
+                'generated_query': f'synthetic query {q} about group {source}',
+                'query_intent': rng.choice(INTENTS),
+                'correct_rank': rank,
+                'top_results': [
+                    {'id': group_records[g]['id'], 'name': group_records[g]['name'], 'similarity': s}
+                    for g, s in zip(top, sims)
+                ],
+                'similarity_margin': sims[0] - sims[1],
+                'applied_weights': {'identity': 0.5, 'physical': 0.3, 'context': 0.2},
+                'search_tokens': s_tokens,
+                'tester_tokens': t_tokens,
+                **({'query_embedding': [
+                    round(x + query_rng.gauss(0, 0.35), 4)
+                    for x in group_records[source]['embeddings'][embedding_key]['identity']
+                ]} if query_embeddings else {}),
+                'created': pb_time(created + timedelta(seconds=q * 2)),
+                'updated': pb_time(created + timedelta(seconds=q * 2))
+            })
+        run_records.append({
+            'id': run_id,
+            'name': f'{enrichment}_{embedding}_{tester}_mwM_#{r + 1}',
+            'status': 'completed',
+            'embedding_model': embedding,
+            'embedding_key': f'{enrichment}_{embedding}',
+            'enrichment_model': enrichment,
+            'tester_model': tester,
+            'difficulty_mode': 'medium',
+            'mvs_weight_identity': 0.5,
+            'mvs_weight_physical': 0.3,
+            'mvs_weight_context': 0.2,
+            'match_threshold': 0.3,
+            'use_dynamic_weights': False,
+            'delay_between_queries_ms': 1000,
+            'target_query_count': queries,
+            'completed_query_count': queries,
+            'total_search_tokens': search_tokens,
+            'total_tester_tokens': tester_tokens,
+            'metrics_summary': None,
+            'created': pb_time(created),
+            'updated': pb_time(created + timedelta(seconds=queries * 2))
+        })
+
+    return {
+        'embedding_test_runs': run_records,
+        'embedding_test_results': result_records,
+        'groups': group_records,
+        'embedding_regeneration_jobs': []
+    }
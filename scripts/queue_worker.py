@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+Run queued embedding tests concurrently across worker processes
+
+Pending `embedding_test_queue` entries are claimed atomically, so several
+workers (or several machines) can drain one queue without running an
+entry twice: a claim is a record in `embedding_test_queue_claims`, whose
+UNIQUE index on queue_id lets exactly one create succeed. Claims carry a
+heartbeat; a claim whose worker stopped beating for --claim-ttl seconds
+is taken over, and its running entry resumes from the run's
+completed_query_count. So is a running entry with no claim whose run has
+not changed for --claim-ttl seconds. A worker whose claim was taken over
+stops before writing its next batch and leaves the run to the new owner.
+
+Entries sharing an embedding_key are handed to the same process, which
+keeps that key's group vectors in memory between tests. Each test
+generates queries with the tester provider, embeds them, ranks every
+group by weighted multi-vector similarity (per-intent weights when the
+run uses dynamic weights, mirroring utils/search-logic.ts), writes the
+results in /api/batch batches (each with its query_embedding, for
+simulate_query_cache.py and analyze_dynamic_weights.py) and updates
+completed_query_count after every batch, so the web UI and
+watch_test_run.py follow along. A run resumes from its
+completed_query_count. Result ids derive from the run and query number,
+so a batch that was written just before a crash or takeover, but not
+yet counted, is not stored twice. Setting the queue entry to paused or
+cancelled stops it after the current batch.
+
+Providers come from test_providers.py: 'live' calls the model APIs,
+'stub' is deterministic and offline (see pocketbase_standin.py).
+
+Usage:
+    python3 scripts/queue_worker.py                        # drain the queue and exit
+    python3 scripts/queue_worker.py --workers 4 --poll 30  # keep polling for new entries
+    python3 scripts/queue_worker.py --providers stub       # offline providers
+    python3 scripts/queue_worker.py --reuse-covered        # skip configs a finished run already covers
+    python3 scripts/queue_worker.py --dry-run              # show the schedule, claim nothing
+"""
+
+import os
+import sys
+import math
+import hashlib
+import time
+import random
+import socket
+import operator
+import argparse
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import requests
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from analyze_throughput import parse_timestamp
+from config_fingerprint import FingerprintIndex, RUN_DEFAULTS, canonical_config, describe, fingerprint
+from finalize_test_runs import compute_summary, has_summary_field, SUMMARY_FIELD
+from resilience import print_endpoint_stats
+from test_providers import get_embedding_provider, get_tester_provider
+
+QUEUE = 'embedding_test_queue'
+CLAIMS = 'embedding_test_queue_claims'
+RUNS = 'embedding_test_runs'
+RESULTS = 'embedding_test_results'
+
+ASPECTS = ('identity', 'physical', 'context')
+TOP_K = 10
+SAMPLE_GROUP_COUNT = 100  # use_sample_groups: search a fixed subset of this size
+CLAIM_TTL = 600
+
+# getWeightsForIntent() in utils/search-logic.ts, keyed by the intents
+# results record (identity ↔ 'specific', mixed ↔ 'default')
+INTENT_WEIGHTS = {
+    'identity': {'identity': 0.8, 'physical': 0.1, 'context': 0.1},
+    'physical': {'identity': 0.1, 'physical': 0.8, 'context': 0.1},
+    'context': {'identity': 0.2, 'physical': 0.1, 'context': 0.7},
+    'mixed': {'identity': 0.5, 'physical': 0.3, 'context': 0.2}
+}
+
+
+def now_iso():
+    return time.strftime('%Y-%m-%d %H:%M:%S.000Z', time.gmtime())
+
+
+def config_embedding_key(config):
+    """embedding_key a run of this config searches with: the configured one,
+    else <enrichment>_<embedding> when an enrichment model is set, else the
+    bare embedding model code"""
+    if config.get('embedding_key'):
+        return config['embedding_key']
+    embedding = config.get('embedding_model') or RUN_DEFAULTS['embedding_model']
+    enrichment = config.get('enrichment_model')
+    return f'{enrichment}_{embedding}' if enrichment else embedding
+
+
+def entry_key(entry):
+    """embedding_key the entry will search with; entries sharing it share group vectors"""
+    return config_embedding_key(entry.get('config') or {})
+
+
+# -- claims -----------------------------------------------------------------
+
+class ClaimLost(Exception):
+    """Another worker took the entry over (our claim record is gone)"""
+
+
+def ensure_claims_collection(pb):
+    """Create the claims collection (with its UNIQUE index) if it is missing"""
+    response = pb._request('GET', f'/api/collections/{CLAIMS}')
+    if response.status_code != 404:
+        response.raise_for_status()
+        return False
+    response = pb._request('POST', '/api/collections', json={
+        'name': CLAIMS,
+        'type': 'base',
+        'fields': [
+            {'name': 'queue_id', 'type': 'text', 'required': True},
+            {'name': 'worker', 'type': 'text', 'required': False},
+            {'name': 'heartbeat', 'type': 'number', 'required': False}
+        ],
+        'indexes': [f'CREATE UNIQUE INDEX idx_{CLAIMS}_queue_id ON {CLAIMS} (queue_id)']
+    })
+    if response.status_code == 400 and pb._request('GET', f'/api/collections/{CLAIMS}').ok:
+        return False  # another worker created it first
+    response.raise_for_status()
+    return True
+
+
+def claim_entry(pb, entry, worker, ttl=CLAIM_TTL):
+    """The claim record if this worker now owns the entry, None if another does"""
+    for _ in range(2):
+        try:
+            return pb.create_record(CLAIMS, {'queue_id': entry['id'], 'worker': worker, 'heartbeat': time.time()})
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 400:
+                raise
+        held = pb.get_page(CLAIMS, per_page=1, filter=f'queue_id="{entry["id"]}"')['items']
+        if held and time.time() - (held[0].get('heartbeat') or 0) < ttl:
+            return None
+        if held:
+            # Stale: whoever deletes it and creates first wins, the index settles races
+            pb.delete_record(CLAIMS, held[0]['id'])
+    return None
+
+
+def heartbeat(pb, claim):
+    """Refresh the claim; ClaimLost when a takeover deleted it (the new
+    owner's claim is a new record, so ours can only be gone)"""
+    try:
+        pb.update_record(CLAIMS, claim['id'], {'heartbeat': time.time()})
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            raise ClaimLost(f"claim on {claim['queue_id']} was taken over") from e
+        raise
+
+
+def orphaned_entries(pb, ttl=CLAIM_TTL):
+    """Running entries whose worker is gone: the claim's heartbeat is older
+    than `ttl`, or there is no claim and the run has not changed for `ttl`
+    (the web UI runs entries without claims, and keeps its run updated)"""
+    running = pb.fetch_all(QUEUE, filter='status="running"', sort='position')
+    if not running:
+        return []
+    try:
+        claims = {c['queue_id']: c for c in pb.fetch_all(CLAIMS, fields='queue_id,heartbeat')}
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        claims = {}  # no claims collection yet (--dry-run before the first real run)
+    now = time.time()
+    orphaned = []
+    for entry in running:
+        claim = claims.get(entry['id'])
+        if claim is not None:
+            last_seen = claim.get('heartbeat') or 0
+        elif entry.get('run_id'):
+            last_seen = parse_timestamp(pb.get_record(RUNS, entry['run_id']).get('updated')) or 0
+        else:
+            last_seen = parse_timestamp(entry.get('updated')) or 0
+        if now - last_seen >= ttl:
+            orphaned.append(entry)
+    return orphaned
+
+
+def release(pb, claim):
+    pb.delete_record(CLAIMS, claim['id'])
+
+
+# -- search -----------------------------------------------------------------
+
+def _unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def _dot(a, b):
+    return sum(map(operator.mul, a, b))
+
+
+class GroupIndex:
+    """Unit-normalized aspect vectors of every searchable group for one embedding_key"""
+
+    def __init__(self, groups, vectors):
+        self.groups = groups
+        self.vectors = vectors  # [{aspect: unit vector}] aligned with groups
+        self.tokens = 0
+
+    @classmethod
+    def load(cls, pb, embedding_key, embedder):
+        fields = 'id,name,description' if embedder.local else 'id,name,description,embeddings'
+        groups = pb.fetch_all('groups', filter='deleted_at=""', fields=fields, sort='id')
+        if embedder.local:
+            texts = {
+                'identity': [g.get('name') or '' for g in groups],
+                'physical': [g.get('description') or g.get('name') or '' for g in groups],
+                'context': [f"{g.get('name') or ''}. {g.get('description') or ''}" for g in groups]
+            }
+            tokens = 0
+            by_aspect = {}
+            for aspect in ASPECTS:
+                by_aspect[aspect], used = embedder.embed(texts[aspect])
+                tokens += used
+            vectors = [{a: _unit(by_aspect[a][i]) for a in ASPECTS} for i in range(len(groups))]
+            index = cls(groups, vectors)
+            index.tokens = tokens
+        else:
+            kept, vectors = [], []
+            for g in groups:
+                stored = (g.get('embeddings') or {}).get(embedding_key) or {}
+                if all(stored.get(a) for a in ASPECTS):
+                    kept.append(g)
+                    vectors.append({a: _unit(stored[a]) for a in ASPECTS})
+            index = cls(kept, vectors)
+        if not index.groups:
+            raise ValueError(f"No groups have '{embedding_key}' embeddings")
+        for g in index.groups:
+            g.pop('embeddings', None)
+        return index
+
+    def sample(self, count=SAMPLE_GROUP_COUNT):
+        """Fixed subset (first groups by id) for use_sample_groups runs"""
+        return GroupIndex(self.groups[:count], self.vectors[:count])
+
+    def search(self, query_vector, weights):
+        """[(score, group)] best first; score is the weighted sum of aspect cosines"""
+        q = _unit(query_vector)
+        scored = [
+            (sum(weights[a] * _dot(q, v[a]) for a in ASPECTS if weights[a]), g)
+            for g, v in zip(self.groups, self.vectors)
+        ]
+        scored.sort(key=lambda s: -s[0])
+        return scored
+
+
+def rank_result(run, group, query, intent, query_vector, ranked, weights, search_tokens, tester_tokens):
+    """embedding_test_results record for one query"""
+    candidates = [(s, g) for s, g in ranked if s >= (run.get('match_threshold') or 0)]
+    rank = next((i for i, (_, g) in enumerate(candidates, 1) if g['id'] == group['id']), 0)
+    margin = ranked[0][0] - ranked[1][0] if len(ranked) > 1 else 0.0
+    return {
+        'run_id': run['id'],
+        'source_group_id': group['id'],
+        'source_group_name': group.get('name'),
+        'generated_query': query,
+        'query_embedding': [round(x, 6) for x in query_vector],  # float32 precision, smaller JSON
+        'top_results': [{'id': g['id'], 'name': g.get('name'), 'similarity': round(s, 4)}
+                        for s, g in candidates[:TOP_K]],
+        'correct_rank': rank,
+        'query_intent': intent,
+        'search_tokens': search_tokens,
+        'tester_tokens': tester_tokens,
+        'similarity_margin': round(margin, 4),
+        'applied_weights': weights
+    }
+
+
+# -- running one entry ------------------------------------------------------
+
+def prepare_run(pb, entry):
+    """The entry's run (created from its config when the queue has none yet), marked running"""
+    if entry.get('run_id'):
+        run = pb.get_record(RUNS, entry['run_id'])
+    else:
+        queued = entry.get('config') or {}
+        config = {**RUN_DEFAULTS, **{k: v for k, v in queued.items() if k in RUN_DEFAULTS}}
+        config['embedding_key'] = config_embedding_key(queued)
+        # Named or implied by the key, so analyses and W&B names see the enrichment
+        enrichment = canonical_config(queued)['enrichment_model']
+        if enrichment != 'none' or queued.get('enrichment_model'):
+            config['enrichment_model'] = queued.get('enrichment_model') or enrichment
+        if fingerprint(config) != fingerprint(queued):
+            raise ValueError(f"Run config {describe(canonical_config(config))} does not match its queue entry "
+                             f"({describe(canonical_config(queued))})")
+        weights = 'dw' if config['use_dynamic_weights'] else 'mw'
+        name = queued.get('name') or \
+            f"{config['embedding_key']}_{config['tester_model']}_{weights}{config['difficulty_mode'][:1].upper()}"
+        run = pb.create_record(RUNS, {**config, 'name': name, 'status': 'pending', 'completed_query_count': 0,
+                                      'total_search_tokens': 0, 'total_tester_tokens': 0})
+    pb.update_record(RUNS, run['id'], {'status': 'running', 'error_message': ''})
+    pb.update_record(QUEUE, entry['id'], {'status': 'running', 'run_id': run['id'], 'started_at': now_iso()})
+    return run
+
+
+def result_id(run_id, number):
+    """Record id of a run's query `number` (PocketBase ids are 15 of [a-z0-9])"""
+    return hashlib.sha256(f'{run_id}:{number}'.encode('utf-8')).hexdigest()[:15]
+
+
+def write_results(pb, results):
+    """Create a batch of results; ones already stored under the same id (by
+    a predecessor that stopped before counting them) are kept as they are"""
+    try:
+        pb.batch_create(RESULTS, results)
+        return
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 400:
+            raise
+    for result in results:
+        try:
+            pb.create_record(RESULTS, result)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 400 or \
+                    not pb.get_page(RESULTS, per_page=1, filter=f'id="{result["id"]}"', fields='id')['items']:
+                raise
+
+
+def run_weights(run, intent):
+    if run.get('use_dynamic_weights'):
+        return INTENT_WEIGHTS.get(intent, INTENT_WEIGHTS['mixed'])
+    return {a: run.get(f'mvs_weight_{a}') or 0 for a in ASPECTS}
+
+
+def execute_run(pb, run, index, embedder, tester, claim, queue_id, batch_size):
+    """Generate, search and record queries from completed_query_count up to the target;
+    returns the final queue status ('completed', 'paused' or 'cancelled')"""
+    done = run.get('completed_query_count') or 0
+    target = run.get('target_query_count') or 0
+    search_total = run.get('total_search_tokens') or 0
+    tester_total = run.get('total_tester_tokens') or 0
+    delay = (run.get('delay_between_queries_ms') or 0) / 1000
+
+    while done < target:
+        batch = []
+        for i in range(done, min(target, done + batch_size)):
+            # Source group and result id depend only on (run, query number), so a
+            # resumed run neither skips nor repeats a query
+            group = random.Random(f"{run['id']}:{i}").choice(index.groups)
+            query, intent, tokens = tester.generate_query(
+                group, run.get('difficulty_mode') or 'medium', run.get('tester_temperature') or 0.7, seed=i
+            )
+            batch.append((group, query, intent, tokens))
+            if delay:
+                time.sleep(delay)
+
+        vectors, search_tokens = embedder.embed([query for _, query, _, _ in batch])
+        share, extra = divmod(search_tokens, len(batch))
+        results = []
+        for k, ((group, query, intent, tokens), vector) in enumerate(zip(batch, vectors)):
+            weights = run_weights(run, intent)
+            result = rank_result(run, group, query, intent, vector, index.search(vector, weights), weights,
+                                 share + (k < extra), tokens)
+            results.append({'id': result_id(run['id'], done + k), **result})
+        # Still ours? A taken-over run gets its results from the new owner only
+        heartbeat(pb, claim)
+        write_results(pb, results)
+
+        done += len(batch)
+        search_total += search_tokens
+        tester_total += sum(tokens for *_, tokens in batch)
+        pb.update_record(RUNS, run['id'], {'completed_query_count': done, 'total_search_tokens': search_total,
+                                           'total_tester_tokens': tester_total})
+        status = pb.get_record(QUEUE, queue_id).get('status')
+        if status in ('paused', 'cancelled'):
+            return status
+    return 'completed'
+
+
+_worker_pb = None
+_worker_indexes = {}
+
+
+def _queue_worker(entries, options):
+    """Run a chunk of entries (mostly one embedding_key) in a worker process;
+    returns (pid, [(entry id, outcome, detail)], request stats)"""
+    global _worker_pb
+    if _worker_pb is None:
+        _worker_pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    pb = _worker_pb
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    outcomes = []
+
+    for entry in entries:
+        claim = claim_entry(pb, entry, worker, options['claim_ttl'])
+        if claim is None:
+            outcomes.append((entry['id'], 'skipped', 'claimed by another worker'))
+            continue
+        run = None
+        lost = False
+        try:
+            # Someone else may have run it between listing and claiming
+            if pb.get_record(QUEUE, entry['id']).get('status') != entry.get('status', 'pending'):
+                outcomes.append((entry['id'], 'skipped', f"no longer {entry.get('status', 'pending')}"))
+                continue
+            run = prepare_run(pb, entry)
+            embedder = get_embedding_provider(run['embedding_model'], options['providers'])
+            tester = get_tester_provider(run['tester_model'], options['providers'])
+            key = (run.get('embedding_key') or run['embedding_model'], embedder.name)
+            if key not in _worker_indexes:
+                _worker_indexes[key] = GroupIndex.load(pb, key[0], embedder)
+            index = _worker_indexes[key]
+            if run.get('use_sample_groups'):
+                index = index.sample()
+
+            status = execute_run(pb, run, index, embedder, tester, claim, entry['id'], options['batch_size'])
+            if status == 'completed':
+                run = pb.update_record(RUNS, run['id'], {'status': 'completed'})
+                pb.update_record(QUEUE, entry['id'], {'status': 'completed', 'completed_at': now_iso()})
+                if options['summary']:
+                    pb.update_record(RUNS, run['id'], {SUMMARY_FIELD: compute_summary(pb, run)})
+            else:
+                pb.update_record(RUNS, run['id'], {'status': 'pending' if status == 'paused' else 'aborted'})
+            outcomes.append((entry['id'], status, run.get('name')))
+        except ClaimLost as e:
+            # The new owner resumes the run; leave it, its entry and the claim alone
+            lost = True
+            outcomes.append((entry['id'], 'lost', str(e)))
+        except Exception as e:
+            message = f'{type(e).__name__}: {e}'
+            if run is not None:
+                pb.update_record(RUNS, run['id'], {'status': 'failed', 'error_message': message})
+            pb.update_record(QUEUE, entry['id'], {'status': 'failed', 'error_message': message,
+                                                  'completed_at': now_iso()})
+            outcomes.append((entry['id'], 'failed', message))
+        finally:
+            if not lost:
+                release(pb, claim)
+
+    return os.getpid(), outcomes, pb.stats.snapshot()
+
+
+def schedule(entries, workers):
+    """Split entries into at most `workers` chunks, keeping an embedding_key
+    together unless it is more than a fair share of the queue; every chunk
+    stays in queue position order"""
+    by_key = defaultdict(list)
+    for entry in entries:
+        by_key[entry_key(entry)].append(entry)
+    share = max(1, math.ceil(len(entries) / workers))
+    pieces = [items[i:i + share] for items in by_key.values() for i in range(0, len(items), share)]
+
+    chunks = [[] for _ in range(min(workers, len(pieces)))]
+    # Largest pieces first onto the lightest chunk
+    for piece in sorted(pieces, key=len, reverse=True):
+        min(chunks, key=len).extend(piece)
+    for chunk in chunks:
+        chunk.sort(key=lambda e: e.get('position') or 0)
+    return chunks
+
+
+def reuse_covered(pb, pending, dry_run=False):
+    """Complete entries an existing run already covers (see config_fingerprint.py)
+    and hold back repeats of an earlier pending entry until it has run;
+    returns (entries to run now, {outcome: count})"""
+    index = FingerprintIndex.load(pb)
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    counts = defaultdict(int)
+    seen = set()
+    runnable = []
+    for entry in pending:
+        config = entry.get('config') or {}
+        covered = None if entry.get('run_id') else index.covering(config)
+        fp = fingerprint(config)
+        if covered is None:
+            if fp in seen and not entry.get('run_id'):
+                counts['deferred'] += 1
+                print(f"   ⏳ {entry['id']}: waits for an equivalent entry ahead of it")
+            else:
+                runnable.append(entry)
+            seen.add(fp)
+            continue
+        print(f"   ♻️  {entry['id']}: covered by {covered.get('name')} ({covered.get('completed_query_count')} queries)")
+        if dry_run:
+            continue
+        claim = claim_entry(pb, entry, worker)
+        if claim is None:
+            continue
+        try:
+            pb.update_record(QUEUE, entry['id'], {'status': 'completed', 'run_id': covered['id'],
+                                                  'completed_at': now_iso()})
+            counts['reused'] += 1
+        finally:
+            release(pb, claim)
+    return runnable, counts
+
+
+def drain(pb, options, workers, dry_run=False):
+    """Run every pending entry, and every running one whose worker is gone,
+    once; returns {outcome: count} and worker stats"""
+    pending = pb.fetch_all(QUEUE, filter='status="pending"', sort='position')
+    orphaned = orphaned_entries(pb, options['claim_ttl'])
+    for entry in orphaned:
+        print(f"   🔄 {entry['id']}: running without a live worker, taking it over")
+    pending = sorted(pending + orphaned, key=lambda e: e.get('position') or 0)
+    counts = defaultdict(int)
+    if pending and options['reuse']:
+        pending, counts = reuse_covered(pb, pending, dry_run)
+    if not pending:
+        return counts, {}
+    chunks = schedule(pending, workers)
+    print(f"📋 {len(pending)} pending entr{'y' if len(pending) == 1 else 'ies'}, "
+          f"{len({entry_key(e) for e in pending})} embedding key(s), {len(chunks)} process(es)")
+    for n, chunk in enumerate(chunks, 1):
+        keys = sorted({entry_key(e) for e in chunk})
+        print(f"   #{n}: {len(chunk)} entr{'y' if len(chunk) == 1 else 'ies'} ({', '.join(keys)})")
+    if dry_run:
+        return {}, {}
+
+    worker_stats = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=context) as executor:
+        futures = [executor.submit(_queue_worker, chunk, options) for chunk in chunks]
+        for future in as_completed(futures):
+            pid, outcomes, stats = future.result()
+            worker_stats[pid] = stats
+            for queue_id, outcome, detail in outcomes:
+                counts[outcome] += 1
+                icon = {'completed': '✅', 'failed': '❌', 'skipped': '⏭️ ', 'lost': '🔀'}.get(outcome, '⏸️ ')
+                print(f"   {icon} {queue_id}: {outcome} ({detail})")
+    return counts, worker_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued embedding tests in parallel')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes')
+    parser.add_argument('--providers', choices=('live', 'stub'), default=os.getenv('TEST_PROVIDERS', 'live'),
+                        help='Model providers (stub: deterministic, offline)')
+    parser.add_argument('--batch-size', type=int, default=20, help='Queries per results batch and progress update')
+    parser.add_argument('--poll', type=float, help='Keep running, checking for new entries every N seconds')
+    parser.add_argument('--claim-ttl', type=float, default=CLAIM_TTL, help='Seconds before a silent claim is taken over')
+    parser.add_argument('--reuse-covered', action='store_true',
+                        help='Complete entries an equivalent finished run already covers instead of rerunning them')
+    parser.add_argument('--no-summary', action='store_true', help=f'Do not write {SUMMARY_FIELD} on completed runs')
+    parser.add_argument('--dry-run', action='store_true', help='Show the schedule, claim and run nothing')
+    args = parser.parse_args()
+
+    print(f"🧪 Queue worker ({args.workers} process(es), {args.providers} providers)...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    if not args.dry_run:
+        if ensure_claims_collection(pb):
+            print(f"🔧 Created '{CLAIMS}' collection\n")
+        if not args.no_summary and not has_summary_field(pb):
+            print(f"⚠️  {RUNS} has no '{SUMMARY_FIELD}' field, run summaries are not written "
+                  f"(declare it as in scripts/create-pocketbase-tables.ts)\n")
+            args.no_summary = True
+
+    options = {'providers': args.providers, 'batch_size': max(1, args.batch_size),
+               'claim_ttl': args.claim_ttl, 'summary': not args.no_summary, 'reuse': args.reuse_covered}
+    totals = defaultdict(int)
+    all_stats = []
+    while True:
+        counts, worker_stats = drain(pb, options, max(1, args.workers), args.dry_run)
+        for outcome, count in counts.items():
+            if outcome != 'deferred':
+                totals[outcome] += count
+        all_stats.extend(worker_stats.values())
+        # Deferred entries can run once the equivalent entry ahead of them
+        # has; when that one was skipped (another worker has it) or lost,
+        # draining again at once would only spin
+        progressed = any(count for outcome, count in counts.items()
+                         if outcome not in ('deferred', 'skipped', 'lost'))
+        if args.dry_run or (args.poll is None and not (counts.get('deferred') and progressed)):
+            if counts.get('deferred') and not args.dry_run and not progressed:
+                print(f"⏳ {counts['deferred']} entr{'y waits' if counts['deferred'] == 1 else 'ies wait'} for "
+                      f"equivalent entries another worker is running (use --poll to wait for them)")
+            break
+        if not progressed:
+            time.sleep(args.poll)
+
+    if not totals and not args.dry_run:
+        print("✅ Queue is empty")
+    print_endpoint_stats([pb.stats.snapshot(), *all_stats])
+    if totals:
+        print("\n📊 " + ', '.join(f"{count} {outcome}" for outcome, count in sorted(totals.items())))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
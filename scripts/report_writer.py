@@ -0,0 +1,158 @@
+"""
+Streaming markdown report writer
+
+Reports are written to the output file as they are produced instead of
+being concatenated into one string. Per-run sections are rendered once,
+as soon as the run's results are fetched, and parked in a spool file (or
+in one shard file per run) so summary tables that need every run's
+metrics can still come before them. Memory stays at one run's results
+plus the small summary rows, however many runs are exported.
+
+    with ReportWriter('report.md', shard_dir='report_runs') as report:
+        report.write("# Title\\n\\n")
+        report.add_section(run['id'], render_run(run), title=run['name'])
+        ...
+        report.table(['Name', 'MRR'], rows)
+        report.write_sections()          # spooled text, or links to shards
+
+ReportCache keeps each run's rendered section and metrics next to the
+run's `updated` stamp, so a re-run only fetches results for new or
+changed runs and rebuilds the summary tables from cached metrics.
+"""
+
+import os
+import re
+import json
+import tempfile
+from tracing import traced
+
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', '.report_cache')
+
+
+def table_lines(headers, rows):
+    """Markdown table as a list of lines"""
+    lines = ['| ' + ' | '.join(headers) + ' |', '|' + '|'.join('-' * (len(h) + 2) for h in headers) + '|']
+    for row in rows:
+        lines.append('| ' + ' | '.join(str(cell) for cell in row) + ' |')
+    return lines
+
+
+def shard_filename(key):
+    """File name for a run's shard (ids are safe already, names may not be)"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(key)) + '.md'
+
+
+class ReportWriter:
+    """Markdown file written front to back, with spooled or sharded sections"""
+
+    def __init__(self, path, shard_dir=None):
+        self.path = path
+        self.shard_dir = shard_dir
+        self.chars_written = 0
+        self.sections = []  # (key, title, offset, length) or (key, title, shard path, length)
+        self._file = None
+        self._spool = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'w', encoding='utf-8')
+        if self.shard_dir:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        else:
+            self._spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+        return self
+
+    def __exit__(self, *exc):
+        if self._spool:
+            self._spool.close()
+        self._file.close()
+        return False
+
+    def write(self, text):
+        self._file.write(text)
+        self.chars_written += len(text)
+
+    def lines(self, *lines):
+        """Write lines, each followed by a newline"""
+        self.write(''.join(f'{line}\n' for line in lines))
+
+    def table(self, headers, rows):
+        self.lines(*table_lines(headers, rows))
+        self.write('\n')
+
+    def add_section(self, key, text, title=None):
+        """Park a rendered section until write_sections()"""
+        if self.shard_dir:
+            path = os.path.join(self.shard_dir, shard_filename(key))
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            self.sections.append((key, title or str(key), path, len(text)))
+        else:
+            self._spool.seek(0, os.SEEK_END)
+            self.sections.append((key, title or str(key), self._spool.tell(), len(text)))
+            self._spool.write(text)
+
+    @traced('render.write_sections')
+    def write_sections(self, order=None):
+        """Emit parked sections (all, or the given keys in that order)
+
+        Spooled sections are copied into the report; sharded ones become
+        an index of links to their files.
+        """
+        by_key = {s[0]: s for s in self.sections}
+        sections = [by_key[k] for k in order] if order is not None else self.sections
+
+        if self.shard_dir:
+            base = os.path.dirname(os.path.abspath(self.path))
+            for i, (_, title, path, _) in enumerate(sections, 1):
+                self.write(f"{i}. [{title}]({os.path.relpath(path, base)})\n")
+            self.write('\n')
+            return
+
+        self._spool.flush()
+        for _, _, offset, length in sections:
+            # Offsets from tell() are opaque cookies, lengths are characters
+            self._spool.seek(offset)
+            self.write(self._spool.read(length))
+
+
+class ReportCache:
+    """Rendered section + metrics per run, valid while the run's `updated` is unchanged
+
+    One JSON file per run under REPORT_CACHE_DIR/<report name>/. Bump
+    `version` when a report's section layout changes so old entries are
+    re-rendered.
+    """
+
+    def __init__(self, name, version=1, directory=None):
+        self.directory = os.path.join(directory or REPORT_CACHE_DIR, name)
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, run_id):
+        return os.path.join(self.directory, f'{shard_filename(run_id)[:-3]}.json')
+
+    def get(self, run):
+        """Cached entry for this run, or None when missing or out of date"""
+        try:
+            with open(self._path(run['id']), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry and entry.get('updated') == run.get('updated') and entry.get('version') == self.version:
+            return entry
+        return None
+
+    def put(self, run, metrics, section):
+        entry = {'updated': run.get('updated'), 'version': self.version, 'metrics': metrics, 'section': section}
+        path = self._path(run['id'])
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(f'{path}.tmp', path)
+        return entry
+
+    def prune(self, run_ids):
+        """Drop entries of runs that are no longer reported"""
+        keep = {os.path.basename(self._path(run_id)) for run_id in run_ids}
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(os.path.join(self.directory, name))
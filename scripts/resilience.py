@@ -0,0 +1,262 @@
+"""
+Retry, backoff, adaptive concurrency and circuit breaking for HTTP clients
+
+PocketBaseClient sends every request through a RequestPolicy:
+  - AIMDLimiter caps requests in flight across threads: +1 per window of
+    successes, halved on overload (429, 503, 504, timeouts), so bulk fetches
+    settle at what the server sustains
+  - transient failures are retried with full-jitter exponential backoff
+    (Retry-After wins when the server sends it); 429/503 are retried for
+    any method, other 5xx, read timeouts and responses cut off mid-body
+    only for idempotent ones
+  - RetryBudget caps retries at a share of recent traffic, so an overloaded
+    server is not hit with a retry storm
+  - CircuitBreaker fails fast (CircuitOpenError) after consecutive server
+    failures, then lets one probe through after a cool-down
+  - EndpointStats keeps per-endpoint count, errors, retries, latency and bytes
+
+Defaults come from the environment:
+    PB_MAX_RETRIES=5  PB_MAX_CONCURRENCY=16  PB_TIMEOUT=60  PB_BACKOFF_CAP=30
+"""
+
+import os
+import time
+import random
+import threading
+from collections import defaultdict, deque
+
+import requests
+
+RETRY_ANY_METHOD = {429, 503}
+RETRY_IDEMPOTENT = {500, 502, 504}
+OVERLOAD = {429, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+# Failures of the transport rather than the request; retried like timeouts
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+
+class CircuitOpenError(requests.RequestException):
+    """The server failed repeatedly; requests are refused until the cool-down ends"""
+
+
+def backoff_delay(attempt, base=0.25, cap=30.0, rng=random):
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)]"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after(response):
+    """Seconds from a numeric Retry-After header, None otherwise"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease"""
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease=0.5):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._last_drop = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free; returns the start time for release()"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, overloaded=False):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                # Requests already in flight at the last drop saw the same
+                # overload, they must not halve the limit again
+                if started >= self._last_drop:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_drop = time.monotonic()
+            else:
+                # +1 once a full window of requests has succeeded
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class RetryBudget:
+    """Token bucket: each request earns `ratio` retries, each retry spends one"""
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """closed → open after `threshold` consecutive failures → half-open probe after `cooldown`"""
+
+    def __init__(self, threshold=8, cooldown=15.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def before(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._probing):
+                wait = self.cooldown - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(f'PocketBase circuit open after {self.failures} failures, '
+                                       f'retry in {max(wait, 0):.0f}s')
+            if state == 'half-open':
+                self._probing = True
+
+    def record(self, success):
+        with self._lock:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()
+
+
+class EndpointStats:
+    """Per-endpoint counters and a bounded latency sample"""
+
+    SAMPLE = 2048
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'count': 0, 'errors': 0, 'retries': 0, 'bytes': 0,
+                                           'latencies': deque(maxlen=self.SAMPLE)})
+
+    def record(self, key, seconds, nbytes=0, error=False, retry=False):
+        with self._lock:
+            s = self._stats[key]
+            s['count'] += 1
+            s['errors'] += error
+            s['retries'] += retry
+            s['bytes'] += nbytes
+            s['latencies'].append(seconds)
+
+    def snapshot(self):
+        """Plain, picklable copy (worker processes send it back to the parent)"""
+        with self._lock:
+            return {key: {**s, 'latencies': list(s['latencies'])} for key, s in self._stats.items()}
+
+    @staticmethod
+    def rows(snapshots):
+        """[(endpoint, count, errors, retries, mean ms, p95 ms, MiB)] over merged snapshots"""
+        merged = defaultdict(lambda: {'count': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'latencies': []})
+        for snapshot in snapshots:
+            for key, s in snapshot.items():
+                m = merged[key]
+                for field in ('count', 'errors', 'retries', 'bytes'):
+                    m[field] += s[field]
+                m['latencies'].extend(s['latencies'])
+        rows = []
+        for key, m in sorted(merged.items(), key=lambda kv: -sum(kv[1]['latencies'])):
+            latencies = sorted(m['latencies'])
+            mean = sum(latencies) / len(latencies) if latencies else 0.0
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+            rows.append((key, m['count'], m['errors'], m['retries'], mean * 1000, p95 * 1000, m['bytes'] / 1048576))
+        return rows
+
+
+def print_endpoint_stats(snapshots, title='PocketBase requests'):
+    rows = EndpointStats.rows(snapshots)
+    if not rows:
+        return
+    print(f"\n📶 {title}")
+    print(f"{'Endpoint':<44} {'Count':>7} {'Errors':>7} {'Retries':>8} {'Mean ms':>9} {'p95 ms':>9} {'MiB':>8}")
+    print("-" * 97)
+    for key, count, errors, retries, mean_ms, p95_ms, mib in rows:
+        print(f"{key[:43]:<44} {count:>7} {errors:>7} {retries:>8} {mean_ms:>9.1f} {p95_ms:>9.1f} {mib:>8.2f}")
+
+
+class RequestPolicy:
+    """Runs one logical request: limiter slot, breaker check, retries, stats"""
+
+    def __init__(self, max_retries=None, max_concurrency=None, timeout=None, backoff_cap=None,
+                 limiter=None, budget=None, breaker=None, rng=None):
+        self.max_retries = int(os.getenv('PB_MAX_RETRIES', '5')) if max_retries is None else max_retries
+        self.timeout = float(os.getenv('PB_TIMEOUT', '60')) if timeout is None else timeout
+        self.backoff_cap = float(os.getenv('PB_BACKOFF_CAP', '30')) if backoff_cap is None else backoff_cap
+        maximum = int(os.getenv('PB_MAX_CONCURRENCY', '16')) if max_concurrency is None else max_concurrency
+        self.limiter = limiter or AIMDLimiter(initial=min(4, maximum), maximum=maximum)
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = EndpointStats()
+        self.rng = rng or random.Random()
+
+    def should_retry(self, method, status=None, error=None):
+        if error is not None:
+            # Nothing reached the server when the connection could not be opened
+            return isinstance(error, requests.ConnectTimeout) or method in IDEMPOTENT_METHODS
+        return status in RETRY_ANY_METHOD or (status in RETRY_IDEMPOTENT and method in IDEMPOTENT_METHODS)
+
+    def execute(self, key, method, send):
+        """send(timeout) -> requests.Response; returns (response, retries)"""
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            self.breaker.before()
+            started = self.limiter.acquire()
+            clock = time.perf_counter()
+            response = error = None
+            try:
+                response = send(self.timeout)
+            except TRANSIENT_ERRORS as e:
+                error = e
+            except BaseException:
+                # Not ours to retry, but the slot and a half-open probe must not leak
+                self.limiter.release(started)
+                self.breaker.record(False)
+                self.stats.record(key, time.perf_counter() - clock, error=True, retry=attempt > 0)
+                raise
+            status = response.status_code if response is not None else None
+            overloaded = status in OVERLOAD or isinstance(error, requests.Timeout)
+            self.limiter.release(started, overloaded)
+            failed = error is not None or status >= 500
+            self.breaker.record(not failed)
+            self.stats.record(key, time.perf_counter() - clock, len(response.content) if response is not None else 0,
+                              error=failed or status == 429, retry=attempt > 0)
+
+            retryable = self.should_retry(method, status, error) if (failed or status == 429) else False
+            if not retryable or attempt >= self.max_retries or not self.budget.try_spend():
+                if error is not None:
+                    raise error
+                return response, attempt
+            delay = backoff_delay(attempt, cap=self.backoff_cap, rng=self.rng)
+            hinted = retry_after(response)
+            time.sleep(min(self.backoff_cap, max(delay, hinted)) if hinted is not None else delay)
+            attempt += 1
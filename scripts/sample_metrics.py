@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Approximate run metrics from a stratified sample of results
+
+For dashboards on runs with 10k+ results: instead of downloading every
+result, pages of a run's results are sampled at random offsets and Acc@k,
+MRR and the success rate are estimated with confidence bounds.
+
+Results are listed in (source_group_id, query_intent, id) order, so every
+stretch of pages covers a narrow band of source groups and intents. The
+page range is split into contiguous zones, which are the strata: every
+group/intent band is represented in proportion to its size, and the
+variance estimate only carries the spread within a band. Each zone starts
+with two random pages, then the sample is widened round by round (evenly
+over the zones) until every estimate's half-width is within --precision,
+the --max-fraction cap is reached, or every page has been read, in which
+case the numbers are exact.
+
+Usage:
+    python3 scripts/sample_metrics.py                          # every completed run
+    python3 scripts/sample_metrics.py --run-id <id> --precision 0.01
+    python3 scripts/sample_metrics.py --confidence 0.99 --max-fraction 0.1
+"""
+
+import os
+import sys
+import math
+import json
+import random
+import argparse
+from statistics import NormalDist
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from tracing import span, traced
+
+OUTPUT_FILE = 'sampled_metrics.json'
+RESULT_ORDER = 'source_group_id,query_intent,id'
+SAMPLE_FIELDS = 'correct_rank'
+ESTIMATES = ('accuracy_at_1', 'accuracy_at_5', 'accuracy_at_10', 'mean_reciprocal_rank', 'success_rate')
+
+
+def result_values(result):
+    """Per-query value of every estimate; each metric is their mean"""
+    rank = result.get('correct_rank') or 0
+    hit = rank > 0
+    return (
+        hit and rank == 1,
+        hit and rank <= 5,
+        hit and rank <= 10,
+        1 / rank if hit else 0.0,
+        hit
+    )
+
+
+class StratifiedSample:
+    """Pages of one run's results sampled without replacement in contiguous zones
+
+    A sampled page is a cluster (its size and per-estimate totals); zone
+    means are ratio estimates over their pages and the run mean weighs
+    zones by their number of results.
+    """
+
+    def __init__(self, total, page_size, zones, rng):
+        self.total = total
+        self.page_size = page_size
+        self.pages = math.ceil(total / page_size)
+        zones = max(1, min(zones, self.pages))
+        self.zones = []
+        for h in range(zones):
+            pages = list(range(h * self.pages // zones + 1, (h + 1) * self.pages // zones + 1))
+            size = sum(self.page_length(p) for p in pages)
+            rng.shuffle(pages)
+            self.zones.append({'unsampled': pages, 'size': size, 'page_count': len(pages), 'clusters': []})
+
+    def page_length(self, page):
+        return min(self.page_size, self.total - (page - 1) * self.page_size)
+
+    @property
+    def sampled_pages(self):
+        return sum(len(z['clusters']) for z in self.zones)
+
+    @property
+    def sampled_queries(self):
+        return sum(c[0] for z in self.zones for c in z['clusters'])
+
+    @property
+    def exhausted(self):
+        return not any(z['unsampled'] for z in self.zones)
+
+    def add(self, zone, items):
+        totals = [0.0] * len(ESTIMATES)
+        for result in items:
+            for k, value in enumerate(result_values(result)):
+                totals[k] += value
+        zone['clusters'].append((len(items), totals))
+
+    def zone_estimate(self, zone, k):
+        """(mean, variance of the mean) of estimate k within one zone"""
+        clusters = zone['clusters']
+        n = len(clusters)
+        size = sum(c[0] for c in clusters)
+        mean = sum(c[1][k] for c in clusters) / size if size else 0.0
+        if n == zone['page_count']:
+            return mean, 0.0
+        if n < 2:
+            return mean, math.inf
+        s2 = sum((c[1][k] - mean * c[0]) ** 2 for c in clusters) / (n - 1)
+        mean_page = zone['size'] / zone['page_count']
+        return mean, (1 - n / zone['page_count']) * s2 / (n * mean_page ** 2)
+
+    def estimate(self, k, z):
+        """(value, half-width) of estimate k for the whole run"""
+        value = variance = 0.0
+        for zone in self.zones:
+            mean, var = self.zone_estimate(zone, k)
+            weight = zone['size'] / self.total
+            value += weight * mean
+            variance += weight * weight * var
+        return value, z * math.sqrt(variance)
+
+    def allocate(self, count):
+        """Next `count` (zone, page) draws, spread evenly over the zones that
+        still have pages. Allocation stays proportional (zones are equal
+        sized): steering pages by the observed zone variances starves zones
+        whose first pages happened to agree and biases the estimate"""
+        draws = []
+        # Least-sampled zones first, so partial rounds even out across calls
+        zones = sorted(self.zones, key=lambda z: len(z['clusters']))
+        while len(draws) < count and not self.exhausted:
+            for zone in zones:
+                if zone['unsampled'] and len(draws) < count:
+                    draws.append((zone, zone['unsampled'].pop()))
+        return draws
+
+
+def count_results(pb, run_id):
+    page = pb.get_page('embedding_test_results', per_page=1, filter=f'run_id="{run_id}"', fields='id', total=True)
+    return page['totalItems']
+
+
+@traced('metrics.sample')
+def sample_metrics(pb, run_id, precision=0.02, confidence=0.95, page_size=10, zones=20,
+                   max_fraction=1.0, growth=0.5, seed=None):
+    """Estimate a run's metrics from sampled pages of its results
+
+    Widens the sample by `growth` of its current size per round until every
+    half-width is within `precision`, `max_fraction` of the results has been
+    read, or every page has been read. Returns the estimates in
+    calculate_metrics' keys plus '<key>_half_width' bounds and sample stats.
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    total = count_results(pb, run_id)
+    budget = max(2, math.ceil(math.ceil(total / page_size) * max_fraction))
+    # Two pages per zone is the least that gives a zone variance
+    sample = StratifiedSample(total, page_size, min(zones, budget // 2), random.Random(seed))
+    requests = 1
+    draws = sample.allocate(min(2 * len(sample.zones), budget))
+
+    while draws:
+        with span('metrics.sample.round', pages=len(draws)):
+            for zone, page in draws:
+                items = pb.get_page('embedding_test_results', page, page_size, filter=f'run_id="{run_id}"',
+                                    fields=SAMPLE_FIELDS, sort=RESULT_ORDER)['items']
+                sample.add(zone, items)
+                requests += 1
+        bounds = [sample.estimate(k, z) for k in range(len(ESTIMATES))]
+        if max(half for _, half in bounds) <= precision or sample.sampled_pages >= budget:
+            break
+        grow = max(len(sample.zones), int(sample.sampled_pages * growth))
+        draws = sample.allocate(min(grow, budget - sample.sampled_pages))
+
+    metrics = {'total_queries': total, 'sampled_queries': sample.sampled_queries,
+               'sampled_pages': sample.sampled_pages, 'requests': requests,
+               'exact': sample.exhausted, 'confidence': confidence}
+    half_widths = []
+    for k, key in enumerate(ESTIMATES):
+        value, half = sample.estimate(k, z) if total else (0.0, 0.0)
+        metrics[key] = value
+        metrics[f'{key}_half_width'] = half
+        half_widths.append(half)
+    metrics['successful_queries'] = round(metrics['success_rate'] * total)
+    metrics['precision_met'] = max(half_widths) <= precision
+    return metrics
+
+
+def format_bound(metrics, key, percent=True):
+    value, half = metrics[key], metrics[f'{key}_half_width']
+    if percent:
+        return f"{value*100:.1f}±{half*100:.1f}%"
+    return f"{value:.3f}±{half:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Approximate metrics from stratified result samples')
+    parser.add_argument('--run-id', help='Only this run (default: every completed run)')
+    parser.add_argument('--precision', type=float, default=0.02, help='Target half-width of every estimate')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--page-size', type=int, default=10, help='Results per sampled page')
+    parser.add_argument('--zones', type=int, default=20, help='Strata per run (contiguous group/intent bands)')
+    parser.add_argument('--max-fraction', type=float, default=0.25, help='Never read more than this share of a run')
+    parser.add_argument('--seed', type=int, help='Make the sample reproducible')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print(f"🎲 Sampling metrics (±{args.precision:g} at {args.confidence:.0%} confidence)...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    if args.run_id:
+        runs = [pb.get_record('embedding_test_runs', args.run_id)]
+    else:
+        runs = list(pb.iter_records('embedding_test_runs', filter='status="completed"'))
+    print(f"✅ Found {len(runs)} runs\n")
+
+    print(f"{'Name':<30} {'Queries':>8} {'Sampled':>8} {'Acc@1':>14} {'Acc@5':>14} {'MRR':>14}")
+    print("-" * 93)
+    output = []
+    read = total = 0
+    for run in runs:
+        metrics = sample_metrics(pb, run['id'], args.precision, args.confidence, args.page_size,
+                                 args.zones, args.max_fraction, seed=args.seed)
+        read += metrics['sampled_queries']
+        total += metrics['total_queries']
+        output.append({'id': run['id'], 'name': run['name'], 'metrics': metrics})
+        flag = '' if metrics['precision_met'] else '  ⚠️  precision not met'
+        print(f"{run['name'][:29]:<30} {metrics['total_queries']:>8} {metrics['sampled_queries']:>8} "
+              f"{format_bound(metrics, 'accuracy_at_1'):>14} {format_bound(metrics, 'accuracy_at_5'):>14} "
+              f"{format_bound(metrics, 'mean_reciprocal_rank', percent=False):>14}{flag}")
+
+    if total:
+        print(f"\n📉 Read {read:,} of {total:,} results ({read / total:.1%})")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'precision': args.precision, 'confidence': args.confidence, 'runs': output}, f, indent=2, ensure_ascii=False)
+    print(f"💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
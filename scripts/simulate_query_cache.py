@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Simulate a semantic query cache in front of search
+
+Replays the recorded test queries in timestamp order through an LRU cache
+of query vectors. A query whose normalized text is cached is an exact
+hit, which saves the embedding call as well. Otherwise the most similar
+cached query at or above the threshold is a semantic hit, which serves
+that query's search results and saves the search. A miss runs a fresh
+search and is cached.
+
+Queries are replayed per embedding model, because vectors of different
+models cannot be compared. Recorded `query_embedding` vectors are used;
+queue_worker.py stores them with every result it writes, and the
+simulator exits with an error when no run has any.
+A served result is scored against the new query's own source group.
+
+For every cache size and threshold the simulator reports the hit rates,
+the accuracy of the served answers against fresh search (Acc@1 / MRR
+loss), how many hits made an answer worse, and the cache's memory at
+its peak entry count. Memory assumes float32 vectors plus the cached
+result payload.
+
+Candidates are shortlisted with a 128-bit sign sketch (very sparse
+random projections) and confirmed with the exact cosine. The sketch
+bound is 3 sigma wide, so a true hit is missed only rarely. Use --exact
+to scan every entry on small data.
+
+Usage:
+    python3 scripts/simulate_query_cache.py
+    python3 scripts/simulate_query_cache.py --sizes 100,1000,5000 --thresholds 0.9,0.95,0.98
+    python3 scripts/simulate_query_cache.py --run-id abc123 --exact
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import operator
+import argparse
+from array import array
+from collections import OrderedDict, defaultdict, namedtuple
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient
+from watch_test_run import StreamingMetrics
+
+OUTPUT_FILE = 'query_cache_simulation.json'
+RESULT_FIELDS = 'id,created,generated_query,query_embedding,correct_rank,source_group_id,top_results'
+DEFAULT_SIZES = (100, 500, 2000)
+DEFAULT_THRESHOLDS = (0.9, 0.95, 0.98)
+SKETCH_BITS = 128
+SKETCH_SIGMAS = 3
+MEMO_MAX_PAIRS = 1_000_000  # ~150 MB of memoized cosines at most
+
+Query = namedtuple('Query', 'text vector sketch source fresh_rank top_ids payload_bytes')
+
+
+def normalize_text(text):
+    return ' '.join((text or '').lower().split())
+
+
+def unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return array('f', (x / norm for x in vector) if norm else vector)
+
+
+def dot(a, b):
+    return sum(map(operator.mul, a, b))
+
+
+class Sketcher:
+    """Sign bits of very sparse random projections: each bit sums about
+    sqrt(dims) coordinates with random signs, so sketching costs
+    bits * sqrt(dims) additions instead of bits * dims multiplications"""
+
+    def __init__(self, dims, bits=SKETCH_BITS, seed=0):
+        rng = random.Random(seed)
+        width = max(1, math.isqrt(dims))
+        self.planes = []
+        for _ in range(bits):
+            coordinates = rng.sample(range(dims), min(width, dims))
+            self.planes.append((coordinates[::2], coordinates[1::2]))
+
+    def sketch(self, vector):
+        bits = 0
+        for plus, minus in self.planes:
+            bits = (bits << 1) | (sum(vector[i] for i in plus) - sum(vector[i] for i in minus) > 0)
+        return bits
+
+
+def hamming_limit(threshold, bits=SKETCH_BITS, sigmas=SKETCH_SIGMAS):
+    """Most differing bits a pair at cosine `threshold` shows, `sigmas` wide.
+    A random hyperplane separates vectors at angle θ with probability θ/π."""
+    p = math.acos(max(-1.0, min(1.0, threshold))) / math.pi
+    return math.ceil(bits * (p + sigmas * math.sqrt(max(p * (1 - p), 1 / bits) / bits)))
+
+
+def load_queries(results, sketcher):
+    """Query tuples in timestamp order; results without a query_embedding are skipped"""
+    queries = []
+    for r in sorted(results, key=lambda r: (r.get('created') or '', r['id'])):
+        if not r.get('query_embedding'):
+            continue
+        vector = unit(r['query_embedding'])
+        top = r.get('top_results') or []
+        queries.append(Query(
+            normalize_text(r.get('generated_query')), vector, sketcher.sketch(vector),
+            r.get('source_group_id'), r.get('correct_rank') or 0,
+            [t.get('id') for t in top], len(json.dumps(top))
+        ))
+    return queries
+
+
+def served_rank(cached, source):
+    """Rank of the new query's source group in the cached result, 0 if absent"""
+    for position, group_id in enumerate(cached.top_ids, 1):
+        if group_id == source:
+            return position
+    return 0
+
+
+def simulate(queries, size, threshold, exact=False, similarities=None):
+    """Replay `queries` through one cache configuration.
+
+    `similarities` memoizes the exact cosines of sketch-shortlisted pairs
+    across configurations, up to MEMO_MAX_PAIRS. None computes every cosine
+    afresh; --exact does, since it would memoize every (cached, query) pair."""
+    limit = None if exact else hamming_limit(threshold)
+    cache = OrderedDict()  # query index -> None, least recently used first
+    by_text = {}
+    fresh = StreamingMetrics()
+    served = StreamingMetrics()
+    exact_hits = semantic_hits = worse = peak = 0
+
+    for i, query in enumerate(queries):
+        fresh.add({'correct_rank': query.fresh_rank})
+        hit = by_text.get(query.text)
+        if hit is not None:
+            exact_hits += 1
+        else:
+            best_similarity = threshold
+            for j in cache:
+                if limit is not None and (query.sketch ^ queries[j].sketch).bit_count() > limit:
+                    continue
+                similarity = similarities.get((j, i)) if similarities is not None else None
+                if similarity is None:
+                    similarity = dot(query.vector, queries[j].vector)
+                    if similarities is not None and len(similarities) < MEMO_MAX_PAIRS:
+                        similarities[(j, i)] = similarity
+                if similarity >= best_similarity:
+                    hit, best_similarity = j, similarity
+            semantic_hits += hit is not None
+
+        if hit is None:
+            served.add({'correct_rank': query.fresh_rank})
+            cache[i] = None
+            by_text[query.text] = i
+            if len(cache) > size:
+                evicted, _ = cache.popitem(last=False)
+                if by_text.get(queries[evicted].text) == evicted:
+                    del by_text[queries[evicted].text]
+            peak = max(peak, len(cache))
+        else:
+            cache.move_to_end(hit)
+            rank = served_rank(queries[hit], query.source)
+            served.add({'correct_rank': rank})
+            fresh_rr = 1 / query.fresh_rank if query.fresh_rank > 0 else 0
+            worse += (1 / rank if rank > 0 else 0) < fresh_rr
+
+    n = len(queries)
+    hits = exact_hits + semantic_hits
+    fresh_metrics = fresh.metrics()
+    served_metrics = served.metrics()
+    entry_bytes = (4 * len(queries[0].vector) + SKETCH_BITS // 8 + sum(q.payload_bytes for q in queries) / n) if n else 0
+    return {
+        'size': size,
+        'threshold': threshold,
+        'queries': n,
+        'hit_rate': hits / n if n else 0,
+        'exact_hit_rate': exact_hits / n if n else 0,
+        'semantic_hit_rate': semantic_hits / n if n else 0,
+        'worse_answer_rate': worse / hits if hits else 0,
+        'fresh': fresh_metrics,
+        'served': served_metrics,
+        'accuracy_at_1_loss': fresh_metrics['accuracy_at_1'] - served_metrics['accuracy_at_1'],
+        'mrr_loss': fresh_metrics['mean_reciprocal_rank'] - served_metrics['mean_reciprocal_rank'],
+        'peak_entries': peak,
+        'memory_mib': peak * entry_bytes / 1048576
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Semantic query cache hit-rate simulator')
+    parser.add_argument('--run-id', help='Only this run (default: every completed run)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='Cache sizes (entries)')
+    parser.add_argument('--thresholds', default=','.join(f'{t:g}' for t in DEFAULT_THRESHOLDS),
+                        help='Cosine similarity thresholds')
+    parser.add_argument('--exact', action='store_true', help='Compare against every entry, no sketch shortlist')
+    parser.add_argument('--seed', type=int, default=0, help='Sketch projection seed')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    thresholds = [float(t) for t in args.thresholds.split(',') if t]
+
+    print("🗃️  Simulating a semantic query cache...\n")
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+    if args.run_id:
+        runs = [pb.get_record('embedding_test_runs', args.run_id)]
+    else:
+        runs = list(pb.iter_records('embedding_test_runs', filter='status="completed"'))
+
+    results_by_model = defaultdict(list)
+    for run in runs:
+        results = pb.fetch_all('embedding_test_results', filter=f'run_id="{run["id"]}"', fields=RESULT_FIELDS)
+        results_by_model[run.get('embedding_model') or 'unknown'].extend(results)
+    print(f"✅ {len(runs)} runs, {sum(map(len, results_by_model.values())):,} results, "
+          f"{len(results_by_model)} embedding model(s)\n")
+
+    output = {}
+    for model, results in sorted(results_by_model.items()):
+        dims = next((len(r['query_embedding']) for r in results if r.get('query_embedding')), 0)
+        if not dims:
+            print(f"⏭️  {model}: no stored query embeddings\n")
+            continue
+        queries = load_queries(results, Sketcher(dims, seed=args.seed))
+        del results
+        print(f"🔎 {model}: {len(queries):,} queries, {dims} dims")
+        print(f"{'Size':>7} {'Threshold':>10} {'Hits':>7} {'Exact':>7} {'Worse':>7} "
+              f"{'Acc@1 loss':>11} {'MRR loss':>9} {'Entries':>8} {'MiB':>8}")
+        print("-" * 83)
+        rows = []
+        similarities = None if args.exact else {}
+        for size in sizes:
+            for threshold in thresholds:
+                row = simulate(queries, size, threshold, args.exact, similarities)
+                rows.append(row)
+                print(f"{size:>7} {threshold:>10g} {row['hit_rate']:>7.1%} {row['exact_hit_rate']:>7.1%} "
+                      f"{row['worse_answer_rate']:>7.1%} {row['accuracy_at_1_loss']*100:>10.2f}% "
+                      f"{row['mrr_loss']:>9.4f} {row['peak_entries']:>8} {row['memory_mib']:>8.2f}")
+        print()
+        output[model] = {'queries': len(queries), 'dimensions': dims, 'configurations': rows}
+
+    if not output:
+        print("❌ No results with a stored query_embedding; record runs with scripts/queue_worker.py first")
+        sys.exit(1)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'sizes': sizes, 'thresholds': thresholds, 'exact': args.exact, 'models': output},
+                  f, indent=2, ensure_ascii=False)
+    print(f"💾 Saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
-"""Quick test of AI insights generation"""
+"""Quick test of AI insights generation
+
+Usage:
+    python3 scripts/test_ai_insights.py
+    AI_INSIGHTS_BACKEND=stub python3 scripts/test_ai_insights.py   # no API key needed
+"""
 
 import os
 import sys
@@ -7,11 +12,9 @@ from dotenv import load_dotenv
 
 load_dotenv('.env.local')
 
-# Add parent to path
-sys.path.insert(0, '/Users/kubapelka/rekwizytor/scripts')
-
-# Import the function
-exec(open('/Users/kubapelka/rekwizytor/scripts/export_to_wandb.py').read())
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import get_readable_name, generate_ai_insights
+from ai_insights import default_generator
 
 # Test data
 run_data = {
@@ -45,3 +48,8 @@ if insights:
     print(insights)
 else:
     print("❌ No insights generated")
+
+# Second call must come from the cache
+generator = default_generator()
+if generator and generate_ai_insights(run_data, metrics, total_cost) == insights:
+    print(f"\n💾 Cache: {generator.hits} hit(s), {generator.calls} model call(s)")
@@ -0,0 +1,161 @@
+"""
+Embedding and tester providers for the Python test queue worker
+
+A provider is any object with the methods below, looked up by the model
+code stored on the run (embedding_model / tester_model):
+
+    embedding provider
+        name                        e.g. 'openai:text-embedding-3-large'
+        local                       True: group vectors are computed with
+                                    embed() instead of read from
+                                    groups.embeddings[embedding_key]
+        embed(texts) -> (vectors, tokens)
+
+    tester provider
+        name
+        generate_query(group, difficulty, temperature, seed)
+            -> (query, intent, tokens)
+
+'live' providers call the model APIs (OpenAI today; codes without a live
+provider fail the queue entry with a clear message). 'stub' providers are
+deterministic and offline: hashed bag-of-words vectors and queries built
+from the group's own name and description, so the whole worker can be
+exercised against pocketbase_standin.py without keys or network.
+
+    export TEST_PROVIDERS=stub
+"""
+
+import os
+import json
+import math
+import random
+import hashlib
+
+INTENTS = ('identity', 'physical', 'context', 'mixed')
+STUB_DIMENSIONS = 256
+
+
+def _seeded(*parts):
+    """Random stable across processes (hash() of str is salted per process)"""
+    digest = hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def _words(text):
+    return [w for w in ''.join(c.lower() if c.isalnum() else ' ' for c in text or '').split() if w]
+
+
+class StubEmbeddingProvider:
+    """Signed feature hashing of words into a unit vector"""
+
+    local = True
+
+    def __init__(self, code='stub', dimensions=STUB_DIMENSIONS):
+        self.name = f'stub:{code}'
+        self.dimensions = dimensions
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        for word in _words(text):
+            digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], 'big') % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+    def embed(self, texts):
+        return [self._vector(t) for t in texts], sum(len(_words(t)) for t in texts)
+
+
+class StubTesterProvider:
+    """Queries from the group's own words; harder modes lean on the description"""
+
+    def __init__(self, code='stub'):
+        self.name = f'stub:{code}'
+
+    def generate_query(self, group, difficulty, temperature=0.7, seed=0):
+        rng = _seeded(self.name, group['id'], difficulty, temperature, seed)
+        name_words = _words(group.get('name'))
+        description_words = _words(group.get('description')) or name_words
+        if difficulty == 'easy':
+            words = name_words + rng.sample(description_words, min(2, len(description_words)))
+        elif difficulty == 'hard':
+            words = rng.sample(description_words, min(3, len(description_words))) + ['something']
+        else:
+            words = rng.sample(name_words, min(1, len(name_words))) + \
+                rng.sample(description_words, min(3, len(description_words)))
+        rng.shuffle(words)
+        query = ' '.join(words)
+        return query, rng.choice(INTENTS), len(words) * 12
+
+
+class OpenAIEmbeddingProvider:
+    local = False
+
+    def __init__(self, model):
+        from openai import OpenAI
+        self.model = model
+        self.name = f'openai:{model}'
+        self.client = OpenAI()
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        return [item.embedding for item in response.data], response.usage.total_tokens
+
+
+class OpenAITesterProvider:
+    def __init__(self, model):
+        from openai import OpenAI
+        self.model = model
+        self.name = f'openai:{model}'
+        self.client = OpenAI()
+
+    def generate_query(self, group, difficulty, temperature=0.7, seed=0):
+        prompt = (
+            "You test a search engine for theatre props. Write ONE search query a stage manager "
+            f"would type to find this group of props ({difficulty} difficulty: easy names it, "
+            "medium describes it, hard only hints at its use or look).\n\n"
+            f"Name: {group.get('name')}\nDescription: {group.get('description') or '-'}\n\n"
+            'Answer as JSON: {"query": "...", "intent": "identity|physical|context|mixed"}'
+        )
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            seed=seed
+        )
+        answer = json.loads(response.choices[0].message.content)
+        intent = answer.get('intent') if answer.get('intent') in INTENTS else 'mixed'
+        return answer['query'].strip(), intent, response.usage.total_tokens
+
+
+# Model code -> live provider factory
+EMBEDDING_PROVIDERS = {
+    'oai3l': lambda: OpenAIEmbeddingProvider('text-embedding-3-large'),
+    'oai3s': lambda: OpenAIEmbeddingProvider('text-embedding-3-small')
+}
+TESTER_PROVIDERS = {
+    'gpt4o': lambda: OpenAITesterProvider('gpt-4o'),
+    'gpt4m': lambda: OpenAITesterProvider('gpt-4o-mini')
+}
+
+
+def _lookup(registry, code, kind):
+    if code not in registry:
+        raise ValueError(f"No live {kind} provider for '{code}' "
+                         f"(available: {', '.join(registry)}); run with TEST_PROVIDERS=stub or add one")
+    return registry[code]()
+
+
+def get_embedding_provider(code, mode=None):
+    """Provider for an embedding model code; mode 'stub' or 'live' (TEST_PROVIDERS)"""
+    if (mode or os.getenv('TEST_PROVIDERS', 'live')) == 'stub':
+        return StubEmbeddingProvider(code)
+    return _lookup(EMBEDDING_PROVIDERS, code, 'embedding')
+
+
+def get_tester_provider(code, mode=None):
+    if (mode or os.getenv('TEST_PROVIDERS', 'live')) == 'stub':
+        return StubTesterProvider(code)
+    return _lookup(TESTER_PROVIDERS, code, 'tester')
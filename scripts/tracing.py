@@ -0,0 +1,236 @@
+"""
+Lightweight phase timing and tracing for the analysis scripts
+
+Off by default; when off, span() hands back one shared no-op context
+manager, so instrumented code pays a global lookup and a function call.
+Turn it on per invocation with environment variables:
+
+    TRACE=1 python3 scripts/export_full_data.py
+    TRACE=1 TRACE_PROFILE=1 python3 scripts/generate_comparison_report.py
+
+With TRACE set, every span (PocketBase requests with status, bytes and
+latency, JSON decoding, metric computation, rendering, W&B/OpenAI calls)
+is recorded and at exit:
+  - trace_<script>.json is written in Chrome trace event format (open it
+    in chrome://tracing or ui.perfetto.dev), TRACE_FILE overrides the path
+  - a per-phase summary table (count, total, mean, p95, bytes) is printed
+Worker processes (multiprocessing) inherit TRACE and write their own
+files with the pid added, trace_<script>.<pid>.json, next to the parent's.
+
+TRACE_PROFILE=1 also runs a sampling profiler (a thread that snapshots the
+main thread's stack every TRACE_PROFILE_INTERVAL ms, default 5) and writes
+profile_<script>.folded, collapsed stacks for flamegraph tools.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+from collections import Counter, defaultdict
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+_local = threading.local()
+_started = time.perf_counter()
+_profiler = None
+
+
+class _NoopSpan:
+    """Shared stand-in for span() while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        with _lock:
+            _events.append((self.name, self.start, duration, threading.get_ident(), self.parent, self.attrs))
+        return False
+
+
+def enabled():
+    return _enabled
+
+
+def span(name, **attrs):
+    """Time a phase: `with span('render.section', run=run_id) as s: ... s.set(bytes=n)`"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into collapsed stacks"""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def _script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+
+
+def _with_pid(path):
+    """`path` in the main process; with '.<pid>' before the extension in a
+    multiprocessing worker, which would otherwise overwrite the parent's file"""
+    multiprocessing = sys.modules.get('multiprocessing')
+    if multiprocessing is None or multiprocessing.parent_process() is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.{os.getpid()}{ext}'
+
+
+def summary_rows():
+    """[(phase, count, total s, mean ms, p95 ms, bytes)] sorted by total time"""
+    groups = defaultdict(list)
+    sizes = defaultdict(int)
+    with _lock:
+        events = list(_events)
+    for name, _, duration, _, _, attrs in events:
+        key = f"{name} {attrs['key']}" if 'key' in attrs else name
+        groups[key].append(duration)
+        sizes[key] += attrs.get('bytes') or 0
+    rows = []
+    for key, durations in groups.items():
+        durations.sort()
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        rows.append((key, len(durations), sum(durations), sum(durations) / len(durations) * 1000, p95 * 1000, sizes[key]))
+    return sorted(rows, key=lambda r: -r[2])
+
+
+def write_trace(path):
+    """Chrome trace event format, one complete ('X') event per span"""
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = [
+        {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - _started) * 1e6,
+            'dur': duration * 1e6,
+            'pid': pid,
+            'tid': tid,
+            'args': {**attrs, 'parent': parent} if parent else attrs
+        }
+        for name, start, duration, tid, parent, attrs in events
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+def _finish():
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    name = _script_name()
+    profile_file = _with_pid(f'profile_{name}.folded')
+    if _profiler:
+        _profiler.stop()
+        _profiler.write(profile_file)
+
+    trace_file = _with_pid(os.getenv('TRACE_FILE') or f'trace_{name}.json')
+    write_trace(trace_file)
+
+    wall = time.perf_counter() - _started
+    print(f"\n⏱️  Trace summary ({wall:.2f}s wall)  → {trace_file}")
+    print(f"{'Phase':<48} {'Count':>7} {'Total s':>9} {'Mean ms':>9} {'p95 ms':>9} {'MiB':>8}")
+    print("-" * 95)
+    for key, count, total, mean_ms, p95_ms, size in summary_rows():
+        print(f"{key[:47]:<48} {count:>7} {total:>9.3f} {mean_ms:>9.2f} {p95_ms:>9.2f} {size / 1048576:>8.2f}")
+    if _profiler:
+        print(f"🔥 Sampling profile ({sum(_profiler.samples.values())} samples) → {profile_file}")
+
+
+def enable(profile=False, profile_interval=0.005):
+    """Start recording spans (and optionally sampling); results are written at exit"""
+    global _enabled, _profiler
+    if _enabled:
+        return
+    _enabled = True
+    if profile:
+        _profiler = SamplingProfiler(profile_interval).start()
+    atexit.register(_finish)
+
+
+if os.getenv('TRACE') not in (None, '', '0'):
+    enable(
+        profile=os.getenv('TRACE_PROFILE') not in (None, '', '0'),
+        profile_interval=float(os.getenv('TRACE_PROFILE_INTERVAL', '5')) / 1000
+    )
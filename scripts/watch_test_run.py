@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Watch a running embedding test with live metrics
+
+Subscribes to PocketBase realtime (SSE) for new `embedding_test_results` of
+the run and falls back to polling when the stream is unavailable. Every new
+result updates a constant-time accumulator (Acc@1/5/10, MRR, tokens, cost),
+and a live line shows progress and ETA.
+
+Early stop: once the upper bound of the MRR confidence interval (with finite
+population correction against target_query_count) drops below the best
+completed run's MRR, the run cannot win anymore. The watcher then stops, and
+with --abort it also marks the run as 'aborted' so no more tokens are spent.
+
+Usage:
+    python3 scripts/watch_test_run.py                 # latest running test
+    python3 scripts/watch_test_run.py --run-id abc123 --abort
+    python3 scripts/watch_test_run.py --poll          # skip SSE
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import requests
+from dotenv import load_dotenv
+
+load_dotenv('.env.local')
+
+POCKETBASE_URL = os.getenv('POCKETBASE_URL', 'http://localhost:8090')
+POCKETBASE_ADMIN_EMAIL = os.getenv('POCKETBASE_ADMIN_EMAIL')
+POCKETBASE_ADMIN_PASSWORD = os.getenv('POCKETBASE_ADMIN_PASSWORD')
+
+sys.path.insert(0, os.path.dirname(__file__))
+from export_to_wandb import PocketBaseClient, token_cost
+
+RESULT_FIELDS = 'id,run_id,correct_rank,search_tokens,tester_tokens,created'
+FINISHED_STATUSES = ('completed', 'failed', 'aborted')
+
+
+class ExactSum:
+    """Running float sum, exactly rounded like math.fsum over the same values
+    (Shewchuk's non-overlapping partials; there are only a few of them)"""
+
+    def __init__(self):
+        self.partials = []
+
+    def add(self, x):
+        i = 0
+        for y in self.partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            high = x + y
+            low = y - (high - x)
+            if low:
+                self.partials[i] = low
+                i += 1
+            x = high
+        self.partials[i:] = [x]
+
+    @property
+    def value(self):
+        return math.fsum(self.partials)
+
+
+class StreamingMetrics:
+    """O(1)-per-result accumulator matching calculate_metrics definitions
+    (and its values to the last digit: the reciprocal ranks are summed exactly)"""
+
+    def __init__(self, target=0, embedding_model=None, tester_model=None):
+        self.target = target
+        self.embedding_model = embedding_model
+        self.tester_model = tester_model
+        self.n = 0
+        self.successful = 0
+        self.hit1 = 0
+        self.hit5 = 0
+        self.hit10 = 0
+        self.rr = ExactSum()
+        self.rr_sq_sum = 0.0
+        self.rank_sum = 0
+        self.search_tokens = 0
+        self.tester_tokens = 0
+        self.started = time.monotonic()
+
+    def add(self, result):
+        rank = result.get('correct_rank') or 0
+        self.n += 1
+        if rank > 0:
+            rr = 1 / rank
+            self.successful += 1
+            self.hit1 += rank == 1
+            self.hit5 += rank <= 5
+            self.hit10 += rank <= 10
+            self.rr.add(rr)
+            self.rr_sq_sum += rr * rr
+            self.rank_sum += rank
+        self.search_tokens += result.get('search_tokens') or 0
+        self.tester_tokens += result.get('tester_tokens') or 0
+
+    @property
+    def mrr(self):
+        return self.rr.value / self.n if self.n else 0
+
+    @property
+    def cost(self):
+        return token_cost(self.search_tokens, self.embedding_model, 'embedding') + \
+               token_cost(self.tester_tokens, self.tester_model, 'tester')
+
+    def mrr_interval(self, z=1.96):
+        """Normal-approximation CI of the final MRR"""
+        if self.n < 2:
+            return 0.0, 1.0
+        mean = self.mrr
+        variance = max(self.rr_sq_sum / self.n - mean * mean, 0.0) * self.n / (self.n - 1)
+        fpc = 1.0
+        if self.target and self.target > self.n:
+            fpc = math.sqrt((self.target - self.n) / (self.target - 1))
+        elif self.target and self.n >= self.target:
+            fpc = 0.0
+        half = z * math.sqrt(variance / self.n) * fpc
+        return max(mean - half, 0.0), min(mean + half, 1.0)
+
+    def eta_seconds(self, session_count):
+        """Remaining time, from the rate observed since the watcher started"""
+        elapsed = time.monotonic() - self.started
+        if not self.target or session_count <= 0 or elapsed <= 0:
+            return None
+        return max(self.target - self.n, 0) / (session_count / elapsed)
+
+    def metrics(self):
+        n = self.n
+        return {
+            'accuracy_at_1': self.hit1 / n if n else 0,
+            'accuracy_at_5': self.hit5 / n if n else 0,
+            'accuracy_at_10': self.hit10 / n if n else 0,
+            'mean_reciprocal_rank': self.mrr,
+            'average_rank': self.rank_sum / self.successful if self.successful else 0,
+            'total_queries': n,
+            'successful_queries': self.successful
+        }
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return '--:--'
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class RunWatcher:
+    """Feeds new results of one run into StreamingMetrics"""
+
+    def __init__(self, pb, run, best_mrr, args):
+        self.pb = pb
+        self.run = run
+        self.best_mrr = best_mrr
+        self.args = args
+        self.seen = set()
+        self.session_count = 0
+        self.last_created = ''
+        self.status = run.get('status')
+        self.stats = StreamingMetrics(
+            target=run.get('target_query_count') or 0,
+            embedding_model=run.get('embedding_model'),
+            tester_model=run.get('tester_model')
+        )
+
+    def ingest(self, result, live=True):
+        if result.get('run_id') != self.run['id'] or result['id'] in self.seen:
+            return
+        self.seen.add(result['id'])
+        self.stats.add(result)
+        self.last_created = max(self.last_created, result.get('created') or '')
+        if live:
+            self.session_count += 1
+            self.render()
+
+    def render(self):
+        s = self.stats
+        lo, hi = s.mrr_interval(self.args.z)
+        progress = f"{s.n}/{s.target}" if s.target else str(s.n)
+        line = (f"\r⏱️  {progress}  Acc@1 {s.hit1 / s.n * 100 if s.n else 0:5.1f}%  "
+                f"MRR {s.mrr:.3f} [{lo:.3f}-{hi:.3f}]  "
+                f"tokens {s.search_tokens + s.tester_tokens:,}  ${s.cost:.4f}  "
+                f"ETA {format_eta(s.eta_seconds(self.session_count))}")
+        sys.stdout.write(line.ljust(120))
+        sys.stdout.flush()
+
+    def cannot_win(self):
+        if self.best_mrr is None or self.stats.n < self.args.min_results:
+            return False
+        _, hi = self.stats.mrr_interval(self.args.z)
+        return hi < self.best_mrr
+
+    def done(self):
+        if self.status in FINISHED_STATUSES:
+            return True
+        return bool(self.stats.target) and self.stats.n >= self.stats.target
+
+    def backfill(self):
+        """Load results that already exist; runs once the subscription is
+        live, so nothing created meanwhile is missed (ingest skips ids it
+        has seen)"""
+        for result in self.pb.iter_records(
+            'embedding_test_results', filter=f'run_id="{self.run["id"]}"', fields=RESULT_FIELDS
+        ):
+            self.ingest(result, live=False)
+        self.render()
+
+    def poll(self):
+        """Polling fallback: fetch results newer than the last one seen"""
+        while not self.should_stop():
+            time.sleep(self.args.interval)
+            filter_ = f'run_id="{self.run["id"]}"'
+            if self.last_created:
+                filter_ += f' && created >= "{self.last_created}"'
+            for result in self.pb.iter_records('embedding_test_results', filter=filter_, fields=RESULT_FIELDS):
+                self.ingest(result)
+            self.status = self.pb.get_record('embedding_test_runs', self.run['id']).get('status')
+
+    def stream(self):
+        """Realtime SSE subscription; returns when the run ends or the stream drops"""
+        with requests.get(
+            f'{self.pb.url}/api/realtime',
+            stream=True,
+            timeout=(10, self.args.stream_timeout),
+            headers={'Accept': 'text/event-stream'}
+        ) as response:
+            response.raise_for_status()
+            event, data = None, []
+            for raw in response.iter_lines(decode_unicode=True):
+                if raw is None:
+                    continue
+                if raw.startswith('event:'):
+                    event = raw[6:].strip()
+                elif raw.startswith('data:'):
+                    data.append(raw[5:].strip())
+                elif raw == '':
+                    if event and data:
+                        self.handle_event(event, json.loads('\n'.join(data)))
+                    event, data = None, []
+                    if self.should_stop():
+                        return
+
+    def handle_event(self, event, payload):
+        if event == 'PB_CONNECT':
+            response = requests.post(
+                f'{self.pb.url}/api/realtime',
+                json={
+                    'clientId': payload['clientId'],
+                    'subscriptions': ['embedding_test_results', f'embedding_test_runs/{self.run["id"]}']
+                },
+                headers=self.pb._headers()
+            )
+            response.raise_for_status()
+            self.backfill()
+        elif event == 'embedding_test_results' and payload.get('action') == 'create':
+            self.ingest(payload['record'])
+        elif event.startswith('embedding_test_runs'):
+            self.status = payload.get('record', {}).get('status', self.status)
+
+    def should_stop(self):
+        return self.done() or self.cannot_win()
+
+    def watch(self):
+        if not self.args.poll:
+            try:
+                self.stream()
+            except (requests.RequestException, ValueError) as e:
+                if not self.should_stop():
+                    print(f"\n⚠️  Realtime stream unavailable ({e}), falling back to polling")
+        # Catch up on whatever the stream did not deliver (everything, without
+        # one) before polling picks up after the newest result seen
+        self.backfill()
+        if not self.should_stop():
+            self.poll()
+        print()
+
+
+def best_completed_mrr(pb, exclude_id):
+    """MRR of the best completed run (the bar a running test must beat);
+    stored summaries when current, otherwise each run's ranks are streamed"""
+    from finalize_test_runs import stored_metrics  # it imports this module
+    best = None
+    for run in pb.get_test_runs(limit=500):
+        if run.get('status') != 'completed' or run['id'] == exclude_id:
+            continue
+        metrics = stored_metrics(run)
+        if metrics is None:
+            stats = StreamingMetrics()
+            for result in pb.iter_records('embedding_test_results', filter=f'run_id="{run["id"]}"',
+                                          fields='correct_rank'):
+                stats.add(result)
+            metrics = stats.metrics()
+        if best is None or metrics['mean_reciprocal_rank'] > best[1]:
+            best = (run['name'], metrics['mean_reciprocal_rank'])
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live metrics for a running embedding test')
+    parser.add_argument('--run-id', help='Run to watch (default: most recent running test)')
+    parser.add_argument('--poll', action='store_true', help='Use polling instead of realtime SSE')
+    parser.add_argument('--interval', type=float, default=5.0, help='Polling interval in seconds')
+    parser.add_argument('--stream-timeout', type=float, default=60.0, help='SSE read timeout in seconds')
+    parser.add_argument('--z', type=float, default=1.96, help='z-score of the confidence interval')
+    parser.add_argument('--min-results', type=int, default=30, help='Results needed before early stop')
+    parser.add_argument('--best-mrr', type=float, help='MRR to beat (default: best completed run)')
+    parser.add_argument('--abort', action='store_true', help="Mark the run 'aborted' when it cannot win")
+    args = parser.parse_args()
+
+    pb = PocketBaseClient(POCKETBASE_URL, POCKETBASE_ADMIN_EMAIL, POCKETBASE_ADMIN_PASSWORD)
+
+    if args.run_id:
+        run = pb.get_record('embedding_test_runs', args.run_id)
+    else:
+        running = sorted(
+            pb.iter_records('embedding_test_runs', filter='status="running"'),
+            key=lambda r: r.get('created', ''), reverse=True
+        )
+        if not running:
+            print("❌ No running tests")
+            return
+        run = running[0]
+
+    print(f"👀 Watching: {run['name']} ({run['id']})")
+
+    best_mrr = args.best_mrr
+    if best_mrr is None:
+        best = best_completed_mrr(pb, run['id'])
+        if best:
+            best_mrr = best[1]
+            print(f"🏆 Current best: {best[0]} (MRR {best_mrr:.3f})")
+    print()
+
+    watcher = RunWatcher(pb, run, best_mrr, args)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+
+    stats = watcher.stats
+    if watcher.cannot_win():
+        lo, hi = stats.mrr_interval(args.z)
+        print(f"🛑 Cannot beat best MRR {best_mrr:.3f}: final MRR within [{lo:.3f}, {hi:.3f}] after {stats.n} results")
+        if args.abort:
+            pb.update_record('embedding_test_runs', run['id'], {
+                'status': 'aborted',
+                'error_message': f'Aborted by watcher: MRR upper bound {hi:.3f} < best {best_mrr:.3f}'
+            })
+            print("   Run marked as 'aborted'")
+    elif watcher.done():
+        print(f"✅ Run finished (status: {watcher.status})")
+
+    metrics = stats.metrics()
+    print(f"   Accuracy@1: {metrics['accuracy_at_1']*100:.1f}%  MRR: {metrics['mean_reciprocal_rank']:.3f}  Cost: ${stats.cost:.4f}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
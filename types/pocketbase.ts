@@ -54,10 +54,48 @@ export interface PocketBaseTestRun {
     use_dynamic_weights: boolean
     total_search_tokens: number
     total_tester_tokens: number
+    metrics_summary: PocketBaseRunSummary | null  // Written by scripts/finalize_test_runs.py
     created: string
     updated: string
 }
 
+/**
+ * Stored run summary (embedding_test_runs.metrics_summary)
+ */
+export interface PocketBaseRunSummary {
+    version: number
+    computed_at: string
+    source: {
+        result_count: number
+        total_search_tokens: number
+        total_tester_tokens: number
+    }
+    metrics: {
+        accuracy_at_1: number
+        accuracy_at_5: number
+        accuracy_at_10: number
+        mean_reciprocal_rank: number
+        average_rank: number
+        total_queries: number
+        successful_queries: number
+    }
+    cost: {
+        total_usd: number
+        per_query_usd: number
+        total_tokens: number
+        tokens_per_query: number
+    }
+    health: {
+        status: 'ok' | 'warn'
+        flags: string[]
+        completeness: number
+        unique_groups: number
+        unique_queries: number
+        duplicate_ratio: number
+        failed_ratio: number
+    }
+}
+
 /**
  * Test results - individual search query results
  */
@@ -67,6 +105,7 @@ export interface PocketBaseTestResult {
     source_group_id: string
     source_group_name: string
     generated_query: string
+    query_embedding: number[] | null  // Query vector, written by scripts/queue_worker.py
     top_results: Array<{
         id: string
         name: string